@@ -0,0 +1,2 @@
+# -*- coding: utf-8 -*-
+"""Performance benchmarks for streamlit_app.py and the fers_engine package."""
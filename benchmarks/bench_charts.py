@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+Before/after benchmark of the chart modes of streamlit_app.py.
+
+Runs each representative profile through the script in both chart modes
+(FERS_CHART_MODE=png: matplotlib PNGs rendered on the server; vega: data
+sent to the browser as Vega-Lite) and records per rerun:
+
+- server CPU time (process time of the whole rerun) and wall time,
+- bytes sent: the chart elements' messages plus the PNG files they
+  reference, and the same for every element on the page.
+
+The chart cache is cleared before every measured rerun, which is what a
+rerun with changed inputs (or a new session) costs; --warm keeps it.
+Results are written as JSON and printed side by side::
+
+    python -m benchmarks.bench_charts --output chart_modes.json
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+
+from fers_app.charts import CHART_MODES, chart_cache
+
+from .bench_rerun import _git_commit
+from .profiles import APP_PATH, WIDGET_PROFILES, apply_inputs
+
+CHART_ELEMENTS = ("imgs", "image", "vega_lite_chart", "arrow_vega_lite_chart")
+
+
+def _nodes(node):
+    yield node
+    for child in getattr(node, "children", {}).values():
+        yield from _nodes(child)
+
+
+def _media_counter():
+    """Count the bytes of every media file (chart PNG) registered by the script."""
+    sent = [0]
+    original = MemoryMediaFileStorage.load_and_get_id
+
+    def load_and_get_id(self, path_or_data, *args, **kwargs):
+        if isinstance(path_or_data, bytes):
+            sent[0] += len(path_or_data)
+        return original(self, path_or_data, *args, **kwargs)
+
+    MemoryMediaFileStorage.load_and_get_id = load_and_get_id
+    return sent, lambda: setattr(MemoryMediaFileStorage, "load_and_get_id", original)
+
+
+def bench_mode(mode, inputs, repeat, warm):
+    from streamlit.testing.v1 import AppTest
+
+    os.environ["FERS_CHART_MODE"] = mode
+    at = AppTest.from_file(APP_PATH, default_timeout=120)
+    at.run()
+    apply_inputs(at, inputs)
+    if at.exception:
+        raise RuntimeError(f"App raised: {[e.value for e in at.exception]}")
+
+    sent, restore = _media_counter()
+    cpu, wall, chart_bytes, total_bytes, charts = [], [], [], [], 0
+    try:
+        for _ in range(repeat):
+            if not warm:
+                chart_cache.clear()
+            sent[0] = 0
+            cpu_start, wall_start = time.process_time(), time.perf_counter()
+            at.run()
+            cpu.append((time.process_time() - cpu_start) * 1000)
+            wall.append((time.perf_counter() - wall_start) * 1000)
+            elements = [n for n in _nodes(at._tree) if getattr(n, "proto", None) is not None]
+            chart_elements = [n for n in elements if n.type in CHART_ELEMENTS]
+            charts = len(chart_elements)
+            chart_bytes.append(sum(n.proto.ByteSize() for n in chart_elements) + sent[0])
+            total_bytes.append(sum(n.proto.ByteSize() for n in elements) + sent[0])
+    finally:
+        restore()
+    return {
+        "charts": charts,
+        "cpu_median_ms": round(statistics.median(cpu), 3),
+        "wall_median_ms": round(statistics.median(wall), 3),
+        "chart_bytes": int(statistics.median(chart_bytes)),
+        "total_bytes": int(statistics.median(total_bytes)),
+        "runs": repeat,
+    }
+
+
+def run(profiles, repeat, warm=False):
+    report = {"meta": {"commit": _git_commit(), "repeat": repeat, "warm_chart_cache": warm}, "profiles": {}}
+    for name in profiles:
+        print(f"Benchmarking {name}...", file=sys.stderr)
+        report["profiles"][name] = {mode: bench_mode(mode, WIDGET_PROFILES[name], repeat, warm)
+                                    for mode in CHART_MODES}
+    return report
+
+
+def print_report(report):
+    header = f"{'profile':22s} {'mode':5s} {'charts':>6s} {'cpu ms':>9s} {'wall ms':>9s} {'chart KB':>9s} {'page KB':>9s}"
+    print(header)
+    for name, modes in report["profiles"].items():
+        for mode, r in modes.items():
+            print(f"{name:22s} {mode:5s} {r['charts']:>6d} {r['cpu_median_ms']:>9.1f} {r['wall_median_ms']:>9.1f} "
+                  f"{r['chart_bytes'] / 1024:>9.1f} {r['total_bytes'] / 1024:>9.1f}")
+        png, vega = modes["png"], modes["vega"]
+        print(f"{'':22s} vega vs png: cpu {vega['cpu_median_ms'] / png['cpu_median_ms'] - 1:+.0%}, "
+              f"chart bytes {vega['chart_bytes'] / png['chart_bytes'] - 1:+.0%}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare server CPU and bytes sent per rerun for each chart mode.")
+    parser.add_argument("--output", default="chart_modes.json", help="JSON file to write")
+    parser.add_argument("--profiles", nargs="+", default=list(WIDGET_PROFILES), choices=list(WIDGET_PROFILES))
+    parser.add_argument("--repeat", type=int, default=5, help="measured reruns per profile and mode")
+    parser.add_argument("--warm", action="store_true", help="keep the PNG cache between reruns")
+    args = parser.parse_args(argv)
+
+    report = run(args.profiles, args.repeat, args.warm)
+    print_report(report)
+    with open(args.output, "w", encoding="utf-8") as handle:
+        json.dump(report, handle, indent=2)
+    print(f"Wrote {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
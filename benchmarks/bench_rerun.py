@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+"""
+Rerun-latency benchmark for streamlit_app.py.
+
+Drives each representative profile through the script with Streamlit's
+headless AppTest harness and records, per profile:
+
+- full-rerun wall time (the first cold run and repeated warm reruns),
+- per-section time for the work behind each section (TSP withdrawal,
+  pension, sensitivity loop and grid, cash flow projection, age comparison and the
+  PDF build), charts rasterized without the cache,
+- peak traced memory of a full rerun and of each section.
+
+Results are written as JSON so two versions can be diffed::
+
+    python -m benchmarks.bench_rerun --output bench_main.json
+    python -m benchmarks.bench_rerun --output bench_branch.json --baseline bench_main.json
+
+With --baseline the script exits non-zero when any median time or peak
+memory grows by more than --threshold (default 20%) and by more than
+--min-delta in absolute terms, so microsecond-level noise is ignored.
+"""
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from functools import partial
+
+from fers_app.charts import ChartCache, chart_spec
+from fers_engine import (
+    build_pdf_report,
+    cash_flow_ledger,
+    compare_retirement_ages,
+    distribution_tax,
+    fers_pensions,
+    parameters,
+    sensitivity_grid,
+    sensitivity_net_cash,
+    special_retirement_supplement,
+    taxable_income,
+    tsp_withdrawal,
+)
+
+from .profiles import APP_PATH, ENGINE_PROFILES, WIDGET_PROFILES, apply_inputs
+
+# A zero-size cache renders every chart, like the app did before caching.
+_uncached = ChartCache(maxsize=0)
+
+
+def _section_tsp_withdrawal(p):
+    # The distribution is taxed on top of the pension, SRS and military pay, as in evaluate().
+    params = parameters(p.plan_year)
+    tax_on = None
+    if p.tax_rate is None:
+        tax_on = partial(distribution_tax, income=taxable_income(p, params), params=params,
+                         filing_status=p.filing_status, state=p.state, age=p.current_age)
+    return tsp_withdrawal(
+        p.current_age, p.tsp_balance, p.tsp_option, p.years_service, p.vera_elected,
+        p.public_safety_employee, p.tax_rate, p.withdrawal_rate, params,
+        p.sepp_method, p.sepp_rate, p.sepp_beneficiary_age, tax_on)
+
+
+def _section_pension(p):
+    return (fers_pensions(p.high3_salary, p.years_service, p.current_age, p.retirement_eligible),
+            special_retirement_supplement(p.current_age, p.years_service))
+
+
+def _section_sensitivity(p):
+    years = list(range(0, 51))
+    values = sensitivity_net_cash(p, 0.01, 1.0, years)
+    return _uncached.png(chart_spec("Sensitivity", lines=[{"x": years, "y": values, "marker": "o"}]))
+
+
+def _section_sensitivity_grid(p):
+    grid = sensitivity_grid(p)
+    return _uncached.png(chart_spec("Sensitivity grid", heatmap={
+        "x": grid.years_service, "y": grid.pension_multipliers, "z": grid.surface(), "label": "Net"}))
+
+
+def _section_cash_flow_projection(p):
+    table = cash_flow_ledger(p).annual()
+    return _uncached.png(chart_spec("Projection", bars={"x": table["Age"][:10], "height": table["Net Cash"][:10]}))
+
+
+def _section_age_comparison(p):
+    table = compare_retirement_ages(p, 50, 62, p.drp_elected)
+    lines = [{"x": table["Age"], "y": table[name], "label": name} for name in ("Normal", "VERA", "DRP")]
+    return _uncached.png(chart_spec("Age comparison", lines=lines, legend=True))
+
+
+def _section_pdf(p):
+    return build_pdf_report.__wrapped__(p)
+
+
+SECTIONS = {
+    "tsp_withdrawal": _section_tsp_withdrawal,
+    "pension": _section_pension,
+    "sensitivity": _section_sensitivity,
+    "sensitivity_grid": _section_sensitivity_grid,
+    "cash_flow_projection": _section_cash_flow_projection,
+    "age_comparison": _section_age_comparison,
+    "pdf": _section_pdf,
+}
+
+
+def _timings(samples):
+    samples_ms = [s * 1000 for s in samples]
+    return {
+        "median_ms": round(statistics.median(samples_ms), 3),
+        "min_ms": round(min(samples_ms), 3),
+        "max_ms": round(max(samples_ms), 3),
+        "runs": len(samples_ms),
+    }
+
+
+def _peak_mb(fn):
+    tracemalloc.start()
+    try:
+        fn()
+        return round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 3)
+    finally:
+        tracemalloc.stop()
+
+
+def _time(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def bench_full_rerun(inputs, repeat):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP_PATH, default_timeout=120)
+    cold = _time(at.run, 1)
+    apply_inputs(at, inputs)
+    if at.exception:
+        raise RuntimeError(f"App raised: {[e.value for e in at.exception]}")
+    return {
+        "cold": _timings(cold),
+        "warm": _timings(_time(at.run, repeat)),
+        "peak_memory_mb": _peak_mb(at.run),
+    }
+
+
+def bench_sections(profile, repeat):
+    results = {}
+    for name, section in SECTIONS.items():
+        section(profile)  # warm imports (reportlab, matplotlib)
+        results[name] = {
+            **_timings(_time(lambda: section(profile), repeat)),
+            "peak_memory_mb": _peak_mb(lambda: section(profile)),
+        }
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(profiles, repeat, section_repeat):
+    import streamlit
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "streamlit": streamlit.__version__,
+            "repeat": repeat,
+        },
+        "profiles": {},
+    }
+    for name in profiles:
+        print(f"Benchmarking {name}...", file=sys.stderr)
+        report["profiles"][name] = {
+            "full_rerun": bench_full_rerun(WIDGET_PROFILES[name], repeat),
+            "sections": bench_sections(ENGINE_PROFILES[name], section_repeat),
+        }
+    return report
+
+
+def _metrics(report):
+    """Flatten a report into {metric path: value} for the comparable numbers."""
+    flat = {}
+    for name, data in report["profiles"].items():
+        rerun = data["full_rerun"]
+        flat[f"{name}/full_rerun/warm_median_ms"] = rerun["warm"]["median_ms"]
+        flat[f"{name}/full_rerun/peak_memory_mb"] = rerun["peak_memory_mb"]
+        for section, timing in data["sections"].items():
+            flat[f"{name}/{section}/median_ms"] = timing["median_ms"]
+            flat[f"{name}/{section}/peak_memory_mb"] = timing["peak_memory_mb"]
+    return flat
+
+
+def compare(report, baseline, threshold, min_delta=1.0):
+    """
+    Print the change of every metric against a baseline report.
+
+    :param min_delta: Smallest absolute growth (ms or MB) that can count as a regression.
+
+    :return: List of metric paths that regressed by more than threshold.
+    """
+    current, previous = _metrics(report), _metrics(baseline)
+    regressions = []
+    for path in sorted(current):
+        if path not in previous or not previous[path]:
+            continue
+        change = (current[path] - previous[path]) / previous[path]
+        flag = ""
+        if change > threshold and current[path] - previous[path] > min_delta:
+            regressions.append(path)
+            flag = "  <-- REGRESSION"
+        print(f"{path:60s} {previous[path]:>10.3f} -> {current[path]:>10.3f} ({change:+.1%}){flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark streamlit_app.py reruns.")
+    parser.add_argument("--output", default="bench_results.json", help="JSON file to write")
+    parser.add_argument("--baseline", help="previous JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.20,
+                        help="allowed relative growth before a metric counts as a regression")
+    parser.add_argument("--min-delta", type=float, default=1.0,
+                        help="ignore regressions smaller than this many ms / MB")
+    parser.add_argument("--profiles", nargs="+", default=list(WIDGET_PROFILES),
+                        choices=list(WIDGET_PROFILES))
+    parser.add_argument("--repeat", type=int, default=5, help="warm full reruns per profile")
+    parser.add_argument("--section-repeat", type=int, default=20, help="runs per section")
+    args = parser.parse_args(argv)
+
+    report = run(args.profiles, args.repeat, args.section_repeat)
+    with open(args.output, "w", encoding="utf-8") as handle:
+        json.dump(report, handle, indent=2)
+    print(f"Wrote {args.output}", file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as handle:
+            regressions = compare(report, json.load(handle), args.threshold, args.min_delta)
+        if regressions:
+            print(f"{len(regressions)} metric(s) regressed by more than {args.threshold:.0%}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
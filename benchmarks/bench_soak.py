@@ -0,0 +1,392 @@
+# -*- coding: utf-8 -*-
+"""
+Concurrent-session load and soak test for streamlit_app.py.
+
+Starts the app with ``streamlit run`` in headless mode, exactly as one
+replica is deployed, and connects --sessions websocket clients to it. Each
+client acts like a counselor at a browser: after a random think time it
+changes one random widget on its page to a random valid value and waits
+for the rerun to finish. Widgets inside an independent section
+(st.fragment) rerun only that section, as in the browser.
+
+The report covers:
+
+- rerun latency (p50/p95/p99 and max), from sending the changed widget
+  state to the end of the script run, for full and fragment reruns,
+- throughput in reruns per second over all sessions,
+- server memory (RSS): idle, with every session open (and the share of one
+  session), sampled through the soak, and growth from the end of the
+  warm-up to the end of the run, with the trend in MB per hour,
+- scripts that raised, with their messages.
+
+Latencies and growth are measured after --warmup seconds, once the caches
+have filled. The script exits non-zero when RSS grows by more than
+--max-growth-mb over the soak, so creeping memory (unclosed figures,
+growing session_state, retained buffers) fails the run::
+
+    python -m benchmarks.bench_soak --sessions 8 --duration 3600 --max-growth-mb 64
+
+Usage counts go to a temporary database, not the app's own.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from datetime import datetime, timezone
+
+import numpy as np
+import websockets
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.Slider_pb2 import Slider
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+from .bench_rerun import _git_commit
+from .profiles import APP_PATH
+
+MAX_GROWTH_MB = 64.0
+STARTUP_TIMEOUT = 120.0
+RERUN_TIMEOUT = 300.0
+WIDGET_TYPES = ("checkbox", "number_input", "slider", "selectbox", "radio")
+_EARLY_FOR_RERUN = ForwardMsg.FINISHED_EARLY_FOR_RERUN
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def rss_mb(pid):
+    """Resident set size of a process in MB, from /proc or ps."""
+    try:
+        with open(f"/proc/{pid}/status", encoding="ascii") as handle:
+            for line in handle:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    output = subprocess.run(["ps", "-o", "rss=", "-p", str(pid)], capture_output=True, text=True).stdout
+    return int(output.strip()) / 1024
+
+
+def start_server(port, usage_db):
+    """Run the app headless on localhost:port and wait until it is healthy."""
+    command = [
+        sys.executable, "-m", "streamlit", "run", APP_PATH,
+        "--server.headless", "true",
+        "--server.address", "127.0.0.1",
+        "--server.port", str(port),
+        "--server.fileWatcherType", "none",
+        "--browser.gatherUsageStats", "false",
+    ]
+    env = {**os.environ, "FERS_USAGE_DB": usage_db}
+    server = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"streamlit run exited with code {server.returncode}")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1) as response:
+                if response.status == 200:
+                    return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError(f"The app did not become healthy within {STARTUP_TIMEOUT:.0f} s")
+
+
+class HeadlessSession:
+    """
+    One browser session, speaking Streamlit's websocket protocol.
+
+    Keeps the widgets of the last run (proto, fragment id) and the widget
+    states the client has sent, like the frontend does, so that every rerun
+    carries the full page state.
+    """
+
+    def __init__(self, url, rng):
+        self.url = url
+        self.rng = rng
+        self.widgets = {}
+        self.states = {}
+        self.exceptions = []
+        self._ws = None
+
+    async def connect(self):
+        self._ws = await websockets.connect(self.url, subprotocols=["streamlit"], max_size=None)
+
+    async def close(self):
+        if self._ws is not None:
+            await self._ws.close()
+            self._ws = None
+
+    async def rerun(self, fragment_id=""):
+        """Send the widget states and wait for the run to finish; returns the latency in ms."""
+        back = BackMsg()
+        back.rerun_script.query_string = ""
+        back.rerun_script.fragment_id = fragment_id
+        back.rerun_script.widget_states.widgets.extend(self.states.values())
+        start = time.perf_counter()
+        await self._ws.send(back.SerializeToString())
+        deltas = []
+        while True:
+            msg = ForwardMsg()
+            msg.ParseFromString(await asyncio.wait_for(self._ws.recv(), RERUN_TIMEOUT))
+            kind = msg.WhichOneof("type")
+            if kind == "delta":
+                deltas.append(msg.delta)
+            elif kind == "script_finished" and msg.script_finished != _EARLY_FOR_RERUN:
+                break
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self._read_page(deltas, fragment_id)
+        return elapsed_ms
+
+    def _read_page(self, deltas, fragment_id):
+        # A fragment rerun only resends its own elements; the rest of the page stays.
+        widgets = {w_id: w for w_id, w in self.widgets.items() if w[2] != fragment_id} if fragment_id else {}
+        for delta in deltas:
+            if delta.WhichOneof("type") != "new_element":
+                continue
+            element = delta.new_element
+            kind = element.WhichOneof("type")
+            if kind == "exception":
+                self.exceptions.append(element.exception.message)
+            elif kind in WIDGET_TYPES:
+                proto = getattr(element, kind)
+                if not proto.disabled:
+                    widgets[proto.id] = (kind, proto, delta.fragment_id)
+        self.widgets = widgets
+        self.states = {w_id: state for w_id, state in self.states.items() if w_id in widgets}
+
+    def change_widget(self):
+        """Give one random widget a new random value; returns the fragment to rerun ("" for the script)."""
+        if not self.widgets:
+            return ""
+        kind, proto, fragment_id = self.widgets[self.rng.choice(sorted(self.widgets))]
+        state = WidgetState(id=proto.id)
+        current = self.states.get(proto.id)
+        if kind == "checkbox":
+            value = current.bool_value if current else (proto.value if proto.set_value else proto.default)
+            state.bool_value = not value
+        elif kind in ("selectbox", "radio"):
+            if not proto.options:
+                return fragment_id
+            state.string_value = self.rng.choice(list(proto.options))
+        elif kind == "slider" and proto.type == Slider.SELECT_SLIDER:
+            state.string_array_value.data.append(self.rng.choice(list(proto.options)))
+        elif kind == "slider":
+            if proto.data_type not in (Slider.INT, Slider.FLOAT) or len(proto.default) != 1:
+                return fragment_id  # date and range sliders are not used by the app
+            steps = int(round((proto.max - proto.min) / proto.step))
+            state.double_array_value.data.append(proto.min + self.rng.randint(0, steps) * proto.step)
+        else:
+            state.double_value = self._number(proto, current)
+        self.states[proto.id] = state
+        return fragment_id
+
+    def _number(self, proto, current):
+        step = proto.step or 1
+        if proto.has_min and proto.has_max:
+            return proto.min + self.rng.randint(0, int(round((proto.max - proto.min) / step))) * step
+        value = current.double_value if current else (proto.value if proto.set_value else proto.default)
+        value = value * self.rng.uniform(0.5, 1.5) if value else self.rng.randint(0, 1000) * step
+        value = round(value / step) * step
+        if proto.has_min:
+            value = max(value, proto.min)
+        if proto.has_max:
+            value = min(value, proto.max)
+        return value
+
+
+def _summary(latencies):
+    if not latencies:
+        return {"count": 0}
+    values = np.array(latencies)
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "count": len(values),
+        "mean": round(float(values.mean()), 3),
+        "p50": round(float(p50), 3),
+        "p95": round(float(p95), 3),
+        "p99": round(float(p99), 3),
+        "max": round(float(values.max()), 3),
+    }
+
+
+async def _drive(session, started, end, think, reruns):
+    rng = session.rng
+    while time.monotonic() < end:
+        await asyncio.sleep(rng.uniform(0, think))
+        fragment_id = session.change_widget()
+        elapsed_ms = await session.rerun(fragment_id)
+        reruns.append((time.monotonic() - started, "fragment" if fragment_id else "full", elapsed_ms))
+
+
+async def _sample_memory(pid, started, end, interval, samples):
+    while time.monotonic() < end:
+        samples.append((round(time.monotonic() - started, 1), round(rss_mb(pid), 2)))
+        await asyncio.sleep(interval)
+    samples.append((round(time.monotonic() - started, 1), round(rss_mb(pid), 2)))
+
+
+async def soak(url, pid, sessions, duration, warmup, think, sample_seconds, seed):
+    """Drive the sessions against a running app and return the raw measurements."""
+    memory = {}
+    probe = HeadlessSession(url, random.Random(seed))
+    await probe.connect()
+    await probe.rerun()  # first run: imports and caches, not counted
+    await probe.close()
+    await asyncio.sleep(1)
+    memory["idle_mb"] = rss_mb(pid)
+
+    clients = [HeadlessSession(url, random.Random(seed + i + 1)) for i in range(sessions)]
+    first_runs = []
+    for client in clients:
+        await client.connect()
+        first_runs.append(await client.rerun())
+    memory["loaded_mb"] = rss_mb(pid)
+
+    started = time.monotonic()
+    end = started + duration
+    reruns = [[] for _ in clients]
+    samples = []
+    try:
+        await asyncio.gather(
+            _sample_memory(pid, started, end, sample_seconds, samples),
+            *(_drive(client, started, end, think, runs) for client, runs in zip(clients, reruns)),
+        )
+    finally:
+        for client in clients:
+            await client.close()
+    elapsed = time.monotonic() - started
+    return {"memory": memory, "first_runs": first_runs, "reruns": reruns, "samples": samples,
+            "elapsed": elapsed, "warmup": min(warmup, duration / 2), "clients": clients}
+
+
+def _memory_report(raw, sessions):
+    memory, samples, warmup = raw["memory"], raw["samples"], raw["warmup"]
+    soaked = [(t, mb) for t, mb in samples if t >= warmup] or samples[-1:]
+    window = max(1, len(soaked) // 10)
+    baseline = float(np.median([mb for _, mb in soaked[:window]]))
+    final = float(np.median([mb for _, mb in soaked[-window:]]))
+    slope = 0.0
+    if len(soaked) >= 3 and soaked[-1][0] > soaked[0][0]:
+        slope = float(np.polyfit([t for t, _ in soaked], [mb for _, mb in soaked], 1)[0]) * 3600
+    return {
+        "idle_mb": round(memory["idle_mb"], 2),
+        "loaded_mb": round(memory["loaded_mb"], 2),
+        "per_session_mb": round((memory["loaded_mb"] - memory["idle_mb"]) / sessions, 2),
+        "baseline_mb": round(baseline, 2),
+        "final_mb": round(final, 2),
+        "peak_mb": round(max(mb for _, mb in samples), 2),
+        "growth_mb": round(final - baseline, 2),
+        "growth_mb_per_hour": round(slope, 2),
+        "samples": samples,
+    }
+
+
+def run(sessions, duration, warmup=60.0, think=1.0, sample_seconds=5.0, seed=0, port=None):
+    import streamlit
+
+    port = port or _free_port()
+    with tempfile.TemporaryDirectory() as tmp:
+        server = start_server(port, os.path.join(tmp, "usage.db"))
+        try:
+            raw = asyncio.run(soak(f"ws://127.0.0.1:{port}/_stcore/stream", server.pid, sessions,
+                                   duration, warmup, think, sample_seconds, seed))
+            raw["memory"]["after_close_mb"] = rss_mb(server.pid)
+        finally:
+            server.terminate()
+            server.wait()
+
+    measured = [[r for r in runs if r[0] >= raw["warmup"]] for runs in raw["reruns"]]
+    every = [r for runs in measured for r in runs]
+    measured_seconds = max(raw["elapsed"] - raw["warmup"], 1e-9)
+    exceptions = [message for client in raw["clients"] for message in client.exceptions]
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "streamlit": streamlit.__version__,
+            "sessions": sessions,
+            "duration_s": duration,
+            "warmup_s": raw["warmup"],
+            "think_s": think,
+            "seed": seed,
+        },
+        "first_run_ms": _summary(raw["first_runs"]),
+        "latency_ms": {
+            "all": _summary([ms for _, _, ms in every]),
+            "full": _summary([ms for _, kind, ms in every if kind == "full"]),
+            "fragment": _summary([ms for _, kind, ms in every if kind == "fragment"]),
+        },
+        "throughput_rps": round(len(every) / measured_seconds, 3),
+        "per_session": [{"reruns": len(runs), "p95_ms": _summary([ms for _, _, ms in runs]).get("p95")}
+                        for runs in measured],
+        "memory": {**_memory_report(raw, sessions), "after_close_mb": round(raw["memory"]["after_close_mb"], 2)},
+        "exceptions": {"count": len(exceptions), "messages": sorted(set(exceptions))[:10]},
+    }
+
+
+def print_report(report, max_growth_mb):
+    meta = report["meta"]
+    print(f"{meta['sessions']} sessions for {meta['duration_s']:,.0f} s "
+          f"(first {meta['warmup_s']:,.0f} s warm-up), think time up to {meta['think_s']} s")
+    print(f"{'reruns':10s} {'count':>7s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s} {'max ms':>9s}")
+    for kind, s in report["latency_ms"].items():
+        if s["count"]:
+            print(f"{kind:10s} {s['count']:>7d} {s['p50']:>9.1f} {s['p95']:>9.1f} {s['p99']:>9.1f} {s['max']:>9.1f}")
+    print(f"Throughput: {report['throughput_rps']:.2f} reruns/s")
+    m = report["memory"]
+    print(f"RSS: idle {m['idle_mb']:.1f} MB, all sessions open {m['loaded_mb']:.1f} MB "
+          f"({m['per_session_mb']:.2f} MB per session), peak {m['peak_mb']:.1f} MB, "
+          f"after closing {m['after_close_mb']:.1f} MB")
+    print(f"Growth after warm-up: {m['growth_mb']:+.1f} MB ({m['growth_mb_per_hour']:+.1f} MB/hour), "
+          f"limit {max_growth_mb:.0f} MB")
+    if report["exceptions"]["count"]:
+        print(f"Scripts raised {report['exceptions']['count']} times:")
+        for message in report["exceptions"]["messages"]:
+            print(f"  {message}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load and soak test streamlit_app.py with concurrent sessions.")
+    parser.add_argument("--output", default="soak_results.json", help="JSON file to write")
+    parser.add_argument("--sessions", type=int, default=8, help="concurrent browser sessions")
+    parser.add_argument("--duration", type=float, default=300.0, help="seconds to keep the sessions busy")
+    parser.add_argument("--warmup", type=float, default=60.0,
+                        help="seconds excluded from latency and memory growth (at most half the duration)")
+    parser.add_argument("--think", type=float, default=1.0, help="maximum random pause between changes, in seconds")
+    parser.add_argument("--sample-seconds", type=float, default=5.0, help="interval between RSS samples")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the widget changes")
+    parser.add_argument("--port", type=int, help="port for the app (default: a free one)")
+    parser.add_argument("--max-growth-mb", type=float, default=MAX_GROWTH_MB,
+                        help="maximum allowed RSS growth after warm-up")
+    args = parser.parse_args(argv)
+
+    report = run(args.sessions, args.duration, args.warmup, args.think, args.sample_seconds, args.seed, args.port)
+    report["max_growth_mb"] = args.max_growth_mb
+    print_report(report, args.max_growth_mb)
+    with open(args.output, "w", encoding="utf-8") as handle:
+        json.dump(report, handle, indent=2)
+    print(f"Wrote {args.output}", file=sys.stderr)
+
+    if report["memory"]["growth_mb"] > args.max_growth_mb:
+        print(f"RSS grew by {report['memory']['growth_mb']:,.1f} MB after warm-up, over the "
+              f"{args.max_growth_mb:,.0f} MB limit", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
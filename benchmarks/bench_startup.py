@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+Cold-start report for streamlit_app.py.
+
+Every measurement runs in a fresh interpreter, like the first request on a
+new replica:
+
+- startup imports: the modules streamlit_app.py imports at top level, read
+  from its source, timed with ``python -X importtime`` after Streamlit
+  itself is loaded (the server has it before the first request),
+- deferred imports: modules the app loads only when a section first needs
+  them (pandas for the first table, matplotlib for the first chart,
+  reportlab for the PDF), each timed on top of the startup imports,
+- first run: one complete headless run of the script.
+
+Medians over --repeat processes are printed per module and written as
+JSON. The script exits non-zero when the startup imports exceed
+--budget-ms, so cold start can be tracked against a budget::
+
+    python -m benchmarks.bench_startup --budget-ms 400
+"""
+import argparse
+import ast
+import json
+import platform
+import statistics
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+from .bench_rerun import _git_commit
+from .profiles import APP_PATH
+
+DEFERRED_MODULES = ("pandas", "matplotlib.figure", "reportlab.pdfgen.canvas")
+STARTUP_BUDGET_MS = 400.0
+_MARKER = "--fers-startup--"
+
+
+def startup_modules(path=APP_PATH):
+    """Modules imported at the top level of a script, in source order."""
+    with open(path, encoding="utf-8") as handle:
+        tree = ast.parse(handle.read())
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0:
+            modules.append(node.module)
+    return list(dict.fromkeys(modules))
+
+
+def _import_times(preload, modules):
+    """
+    Import modules in a fresh interpreter after preload.
+
+    :return: {top-level module: cumulative ms} for modules first loaded by
+        the measured imports, in load order.
+    """
+    code = "".join(f"import {m}\n" for m in preload)
+    code += f"import sys\nsys.stderr.write({_MARKER!r} + '\\n')\n"
+    code += "".join(f"import {m}\n" for m in modules)
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, check=True
+    ).stderr
+    times = {}
+    for line in stderr.split(_MARKER, 1)[1].splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit() or name[1:2] == " ":
+            continue  # header, or a nested import already counted by its parent
+        times[name.strip()] = int(cumulative) / 1000
+    return times
+
+
+def _first_run_ms():
+    code = (
+        "import time\n"
+        "from streamlit.testing.v1 import AppTest\n"
+        f"at = AppTest.from_file({APP_PATH!r}, default_timeout=300)\n"
+        "start = time.perf_counter()\n"
+        "at.run()\n"
+        "print((time.perf_counter() - start) * 1000)\n"
+    )
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def _medians(samples):
+    names = list(dict.fromkeys(name for sample in samples for name in sample))
+    return {name: round(statistics.median(s.get(name, 0.0) for s in samples), 3) for name in names}
+
+
+def run(repeat, first_run=True):
+    import streamlit
+
+    modules = startup_modules()
+    startup = _medians([_import_times(["streamlit"], modules) for _ in range(repeat)])
+    deferred = {}
+    for module in DEFERRED_MODULES:
+        samples = [_import_times(["streamlit"] + modules, [module]) for _ in range(repeat)]
+        deferred[module] = round(statistics.median(sum(s.values()) for s in samples), 3)
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "streamlit": streamlit.__version__,
+            "repeat": repeat,
+        },
+        "startup_modules": modules,
+        "startup_imports_ms": startup,
+        "startup_total_ms": round(sum(startup.values()), 3),
+        "deferred_imports_ms": deferred,
+    }
+    if first_run:
+        report["first_run_ms"] = round(statistics.median(_first_run_ms() for _ in range(repeat)), 3)
+    return report
+
+
+def print_report(report, budget_ms):
+    print("Startup imports (loaded before the first widget):")
+    for name, ms in sorted(report["startup_imports_ms"].items(), key=lambda item: -item[1]):
+        print(f"  {name:40s} {ms:>10.1f} ms")
+    total = report["startup_total_ms"]
+    print(f"  {'total':40s} {total:>10.1f} ms (budget {budget_ms:,.0f} ms)")
+    print("Deferred imports (loaded by the first section that needs them):")
+    for name, ms in report["deferred_imports_ms"].items():
+        print(f"  {name:40s} {ms:>10.1f} ms")
+    if "first_run_ms" in report:
+        print(f"First complete script run: {report['first_run_ms']:,.1f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report cold-start import time of streamlit_app.py.")
+    parser.add_argument("--output", default="startup_results.json", help="JSON file to write")
+    parser.add_argument("--repeat", type=int, default=5, help="fresh interpreters per measurement")
+    parser.add_argument("--budget-ms", type=float, default=STARTUP_BUDGET_MS,
+                        help="maximum allowed startup import time")
+    parser.add_argument("--skip-first-run", action="store_true", help="do not time a full first script run")
+    args = parser.parse_args(argv)
+
+    report = run(args.repeat, first_run=not args.skip_first_run)
+    report["budget_ms"] = args.budget_ms
+    print_report(report, args.budget_ms)
+    with open(args.output, "w", encoding="utf-8") as handle:
+        json.dump(report, handle, indent=2)
+    print(f"Wrote {args.output}", file=sys.stderr)
+
+    if report["startup_total_ms"] > args.budget_ms:
+        print(f"Startup imports take {report['startup_total_ms']:,.1f} ms, over the "
+              f"{args.budget_ms:,.0f} ms budget", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+Representative input profiles shared by the benchmark scripts.
+
+Each profile is a mapping of widget label -> value, applied to a headless
+AppTest session with apply_inputs(), plus the matching RetirementProfile
+for timing engine sections outside Streamlit.
+"""
+import os
+
+from fers_engine import TSP_SEPP, TSP_WITHDRAW_NOW, RetirementProfile
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "streamlit_app.py")
+
+WIDGET_PROFILES = {
+    "defaults": {},
+    "vera_55_fehb": {
+        "Current Age": 55,
+        "Years of Federal Service": 27,
+        "High-3 Average Salary ($)": 105000,
+        "Current TSP Balance ($)": 420000,
+        "I am retiring under a VERA (Voluntary Early Retirement Authority)": True,
+        "Select your primary health coverage:": "FEHB",
+        "FEHB Plan Type": "Self + One",
+        "FEGLI Option": "Basic",
+    },
+    "drp_contractor": {
+        "Current Age": 52,
+        "Years of Federal Service": 24,
+        "High-3 Average Salary ($)": 92000,
+        "Current TSP Balance ($)": 310000,
+        "Participating in DoD Deferred Resignation Program (DRP)?": True,
+        "Months of Paid Leave Before Separation": 5,
+        "VSIP Offer Amount ($, if applicable)": 25000,
+        "Apply FERS SRS earnings test to contractor income?": True,
+    },
+    "disability_military": {
+        "Add Military Benefits (TRICARE / Military Retirement)?": True,
+        "Covered under TRICARE (instead of FEHB/CHAMPVA)?": True,
+        "Annual Military Retirement Pay ($)": 24000,
+        "Current Age": 47,
+        "Years of Federal Service": 15,
+        "High-3 Average Salary ($)": 78000,
+        "Current TSP Balance ($)": 150000,
+        "Select TSP Withdrawal Option (Note: Early withdrawals may incur penalties and tax withholdings):": TSP_SEPP,
+        "Monthly VA Disability Payment ($)": 1800,
+        "Apply FERS Disability Retirement Calculation Instead?": True,
+    },
+}
+
+ENGINE_PROFILES = {
+    "defaults": RetirementProfile(),
+    "vera_55_fehb": RetirementProfile(
+        current_age=55, years_service=27, high3_salary=105000, tsp_balance=420000,
+        vera_elected=True, health_coverage="FEHB", fehb_plan="Self + One", fegli_option="Basic"),
+    "drp_contractor": RetirementProfile(
+        current_age=52, years_service=24, high3_salary=92000, tsp_balance=310000,
+        tsp_option=TSP_WITHDRAW_NOW, drp_elected=True, drp_leave_months=5, vsip_amount=25000,
+        apply_srs_earnings_test=True),
+    "disability_military": RetirementProfile(
+        current_age=47, years_service=15, high3_salary=78000, tsp_balance=150000,
+        tsp_option=TSP_SEPP, tricare=True, military_retirement_pay=24000, va_monthly=1800,
+        disability_retirement=True),
+}
+
+
+def _widgets(at):
+    for kind in ("checkbox", "number_input", "slider", "select_slider", "radio", "selectbox", "text_input"):
+        for widget in getattr(at, kind):
+            yield widget
+
+
+def apply_inputs(at, inputs):
+    """
+    Set widgets by label on an AppTest session and rerun.
+
+    Conditional widgets (the DRP slider, FEHB plan, military inputs) only
+    exist after their parent is set, so inputs are applied in passes until
+    nothing is left or no more widgets appear.
+    """
+    remaining = dict(inputs)
+    while remaining:
+        applied = False
+        for widget in _widgets(at):
+            if widget.label in remaining:
+                widget.set_value(remaining.pop(widget.label))
+                applied = True
+        at.run()
+        if not applied:
+            raise KeyError(f"No widgets found for: {sorted(remaining)}")
+    return at
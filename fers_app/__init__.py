@@ -0,0 +1,2 @@
+# -*- coding: utf-8 -*-
+"""Streamlit-side helpers for streamlit_app.py (rendering, session state)."""
@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+"""
+Cached chart rendering for the Streamlit app.
+
+Charts are described as plain data (a "spec" built with chart_spec()) and
+rendered to PNG bytes. The bytes are kept in a bounded, process-wide LRU
+keyed on a hash of the spec, so an unchanged chart is never rasterized
+twice, whichever session asks for it. Figures are created with the
+object-oriented Figure API and closed right after rendering, so nothing
+accumulates in pyplot's global figure registry.
+"""
+import hashlib
+import io
+import json
+import os
+import threading
+import weakref
+from collections import OrderedDict
+
+from .lazy import load
+
+CHART_CACHE_SIZE = 128
+CHART_DPI = 200
+CHART_MODES = ("png", "vega")
+# Figures _draw() has created and that have not been garbage collected yet.
+_FIGURES = weakref.WeakSet()
+
+
+def _plain(values):
+    """Convert arrays / Series into JSON-friendly lists."""
+    if hasattr(values, "tolist"):
+        values = values.tolist()
+    return [v if isinstance(v, str) else float(v) for v in values]
+
+
+def chart_spec(title, xlabel=None, ylabel=None, bars=None, lines=(), bands=(), vlines=(), legend=False,
+               heatmap=None):
+    """
+    Describe a chart as data.
+
+    :param bars: Dict with x, height and optional color.
+    :param heatmap: Dict with x, y, z (rows follow y) and optional cmap/label. The
+        colour scale is centred on zero and the break-even contour is drawn.
+    :param lines: Dicts with x, y and optional label/marker/linestyle/color.
+    :param bands: Dicts with x, low, high and optional color/alpha/label.
+    :param vlines: Dicts with x and optional color/linestyle/label.
+    """
+    spec = {"title": title, "xlabel": xlabel, "ylabel": ylabel, "legend": legend}
+    if bars is not None:
+        spec["bars"] = {**bars, "x": _plain(bars["x"]), "height": _plain(bars["height"])}
+    spec["lines"] = [{**line, "x": _plain(line["x"]), "y": _plain(line["y"])} for line in lines]
+    spec["bands"] = [
+        {**band, "x": _plain(band["x"]), "low": _plain(band["low"]), "high": _plain(band["high"])}
+        for band in bands]
+    spec["vlines"] = [dict(vline) for vline in vlines]
+    if heatmap is not None:
+        spec["heatmap"] = {**heatmap, "x": _plain(heatmap["x"]), "y": _plain(heatmap["y"]),
+                           "z": [_plain(row) for row in heatmap["z"]]}
+    return spec
+
+
+def _draw(spec):
+    fig = load("matplotlib.figure").Figure()
+    _FIGURES.add(fig)
+    try:
+        ax = fig.subplots()
+        if "bars" in spec:
+            bars = spec["bars"]
+            ax.bar(bars["x"], bars["height"], color=bars.get("color"))
+        if "heatmap" in spec:
+            _draw_heatmap(fig, ax, spec["heatmap"])
+        for band in spec["bands"]:
+            ax.fill_between(band["x"], band["low"], band["high"], color=band.get("color"),
+                            alpha=band.get("alpha", 0.2), label=band.get("label"))
+        for line in spec["lines"]:
+            ax.plot(line["x"], line["y"], label=line.get("label"), marker=line.get("marker"),
+                    linestyle=line.get("linestyle", "-"), color=line.get("color"))
+        for vline in spec["vlines"]:
+            ax.axvline(vline["x"], color=vline.get("color"), linestyle=vline.get("linestyle"),
+                       label=vline.get("label"))
+        ax.set_title(spec["title"])
+        if spec["xlabel"]:
+            ax.set_xlabel(spec["xlabel"])
+        if spec["ylabel"]:
+            ax.set_ylabel(spec["ylabel"])
+        if spec["legend"]:
+            ax.legend()
+
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format="png", dpi=CHART_DPI, bbox_inches="tight")
+        return buffer.getvalue()
+    finally:
+        fig.clear()
+
+
+def _draw_heatmap(fig, ax, heatmap):
+    z = heatmap["z"]
+    limit = max((abs(v) for row in z for v in row), default=0) or 1
+    mesh = ax.pcolormesh(heatmap["x"], heatmap["y"], z, cmap=heatmap.get("cmap", "RdYlGn"),
+                         vmin=-limit, vmax=limit, shading="nearest")
+    fig.colorbar(mesh, ax=ax, label=heatmap.get("label"))
+    if min(min(row) for row in z) < 0 < max(max(row) for row in z):
+        ax.contour(heatmap["x"], heatmap["y"], z, levels=[0], colors="black", linewidths=1)
+
+
+class ChartCache:
+    """Thread-safe bounded LRU of rendered chart PNGs."""
+
+    def __init__(self, maxsize=CHART_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(spec):
+        payload = json.dumps(spec, sort_keys=True, default=str).encode("utf-8")
+        return hashlib.sha256(payload).hexdigest()
+
+    def png(self, spec):
+        """Return PNG bytes for a spec, rendering it only on a cache miss."""
+        key = self.key(spec)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        png = _draw(spec)
+        with self._lock:
+            self._entries[key] = png
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return png
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Hit/miss counters, cache size and rendered figures still in memory."""
+        with self._lock:
+            size = len(self._entries)
+            cached_bytes = sum(len(png) for png in self._entries.values())
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": size,
+            "bytes": cached_bytes,
+            "live_figures": len(_FIGURES),
+        }
+
+
+# --- Client-side rendering ---
+# matplotlib colour names used in specs that browsers do not know.
+_CSS_COLORS = {
+    "tab:blue": "#1f77b4", "tab:orange": "#ff7f0e", "tab:green": "#2ca02c", "tab:red": "#d62728",
+    "tab:purple": "#9467bd", "tab:brown": "#8c564b", "tab:pink": "#e377c2", "tab:gray": "#7f7f7f",
+    "tab:olive": "#bcbd22", "tab:cyan": "#17becf",
+}
+# matplotlib's default colour cycle, for lines without a colour.
+_DEFAULT_CYCLE = tuple(_CSS_COLORS.values())
+_DASHES = {"-": None, "--": [6, 4], ":": [2, 2], "-.": [6, 3, 2, 3]}
+_SCHEMES = {"RdYlGn": "redyellowgreen", "RdBu": "redblue", "viridis": "viridis"}
+
+
+def chart_mode(query_params=None):
+    """
+    "vega" (client-side, the default) or "png" (server-side matplotlib).
+
+    Set with FERS_CHART_MODE or ?charts=png|vega; the query string wins.
+    """
+    mode = (query_params or {}).get("charts") or os.environ.get("FERS_CHART_MODE", "vega")
+    return mode if mode in CHART_MODES else "vega"
+
+
+def _css(color):
+    return _CSS_COLORS.get(color, color)
+
+
+def _round(values):
+    return [v if isinstance(v, str) else round(v, 4) for v in values]
+
+
+def vega_lite(spec):
+    """
+    Translate a chart spec into a Vega-Lite spec with the data inlined.
+
+    Bars, lines, bands, vertical lines and heatmaps map onto bar, line, area,
+    rule and rect layers. Labelled series share one colour scale so the
+    legend matches the PNG. Vega-Lite has no contour mark, so heatmaps show
+    break-even as the midpoint of a diverging scale centred on zero.
+    """
+    bars = spec.get("bars")
+    discrete_x = bars is not None
+    x_type = "nominal" if bars and any(isinstance(v, str) for v in bars["x"]) else (
+        "ordinal" if discrete_x else "quantitative")
+    x_axis = {"field": "x", "type": x_type, "title": spec["xlabel"]}
+    y_axis = {"field": "y", "type": "quantitative", "title": spec["ylabel"]}
+
+    domain, palette = [], []
+    cycle = iter(_DEFAULT_CYCLE)
+    for item in spec["bands"] + spec["lines"] + spec["vlines"]:
+        if item.get("label") and item["label"] not in domain:
+            domain.append(item["label"])
+            palette.append(_css(item.get("color")) if item.get("color") else next(cycle))
+    series = {"field": "series", "type": "nominal", "title": None,
+              "scale": {"domain": domain, "range": palette}}
+    if not spec["legend"]:
+        series["legend"] = None
+
+    def colour(item, mark):
+        if item.get("label"):
+            return {"color": series}
+        mark["color"] = _css(item["color"]) if item.get("color") else _DEFAULT_CYCLE[0]
+        return {}
+
+    layers = []
+    if bars is not None:
+        colors = bars.get("color")
+        values = [{"x": x, "y": round(h, 4)} for x, h in zip(bars["x"], bars["height"])]
+        encoding = {"x": x_axis, "y": y_axis}
+        if isinstance(colors, (list, tuple)):
+            for value, color in zip(values, colors):
+                value["color"] = _css(color)
+            # fill, not color, so per-bar colours stay off the shared series colour scale.
+            encoding["fill"] = {"field": "color", "type": "nominal", "scale": None, "legend": None}
+        mark = {"type": "bar"}
+        if isinstance(colors, str):
+            mark["color"] = _css(colors)
+        layers.append({"data": {"values": values}, "mark": mark, "encoding": encoding})
+    if "heatmap" in spec:
+        heatmap = spec["heatmap"]
+        limit = max((abs(v) for row in heatmap["z"] for v in row), default=0) or 1
+        values = [{"x": round(x, 4), "y": round(y, 4), "z": round(z)}
+                  for y, row in zip(heatmap["y"], heatmap["z"]) for x, z in zip(heatmap["x"], row)]
+        layers.append({
+            "data": {"values": values},
+            "mark": {"type": "rect", "tooltip": True},
+            "encoding": {
+                "x": {"field": "x", "type": "ordinal", "title": spec["xlabel"]},
+                "y": {"field": "y", "type": "ordinal", "title": spec["ylabel"], "sort": "descending"},
+                "color": {"field": "z", "type": "quantitative", "title": heatmap.get("label"),
+                          "scale": {"scheme": _SCHEMES.get(heatmap.get("cmap", "RdYlGn"), "redyellowgreen"),
+                                    "domain": [-limit, limit], "domainMid": 0}},
+            },
+        })
+    for band in spec["bands"]:
+        mark = {"type": "area", "opacity": band.get("alpha", 0.2)}
+        values = [{"x": x, "y": round(lo, 4), "y2": round(hi, 4), "series": band.get("label")}
+                  for x, lo, hi in zip(band["x"], band["low"], band["high"])]
+        layers.append({"data": {"values": values}, "mark": mark, "encoding": {
+            "x": x_axis, "y": y_axis, "y2": {"field": "y2"}, **colour(band, mark)}})
+    for line in spec["lines"]:
+        mark = {"type": "line", "point": bool(line.get("marker")), "tooltip": True}
+        dash = _DASHES.get(line.get("linestyle", "-"))
+        if dash:
+            mark["strokeDash"] = dash
+        values = [{"x": x, "y": y, "series": line.get("label")} for x, y in zip(line["x"], _round(line["y"]))]
+        layers.append({"data": {"values": values}, "mark": mark, "encoding": {
+            "x": x_axis, "y": y_axis, **colour(line, mark)}})
+    for vline in spec["vlines"]:
+        mark = {"type": "rule"}
+        dash = _DASHES.get(vline.get("linestyle") or "-")
+        if dash:
+            mark["strokeDash"] = dash
+        layers.append({"data": {"values": [{"x": vline["x"], "series": vline.get("label")}]}, "mark": mark,
+                       "encoding": {"x": x_axis, **colour(vline, mark)}})
+
+    return {"$schema": "https://vega.github.io/schema/vega-lite/v5.json", "title": spec["title"], "layer": layers}
+
+
+chart_cache = ChartCache()
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""
+Deferred imports for heavy dependencies.
+
+lazy_import("pandas") returns a stand-in that imports pandas the first time
+one of its attributes is used, so a fresh process draws the input widgets
+before paying for pandas. Imports go through importlib.import_module, which
+holds the import lock, so concurrent sessions are safe. The time each
+deferred module took to load is kept in import_times for the debug panel
+and benchmarks/bench_startup.py.
+"""
+import importlib
+import sys
+import threading
+import time
+
+import_times = {}  # module name -> first import time in ms, in load order
+_lock = threading.Lock()
+
+
+def load(name):
+    """Import a module, recording how long it took if it was not loaded yet."""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    elapsed = (time.perf_counter() - start) * 1000
+    with _lock:
+        import_times.setdefault(name, elapsed)
+    return module
+
+
+class LazyModule:
+    """Module stand-in that imports the real module on first attribute access."""
+
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, attr):
+        return getattr(load(self._name), attr)
+
+    def __repr__(self):
+        state = "loaded" if self._name in sys.modules else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def lazy_import(name):
+    """The module itself if it is already imported, else a LazyModule."""
+    return sys.modules.get(name) or LazyModule(name)
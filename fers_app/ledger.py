@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+Keyed income ledger kept in st.session_state.
+
+Each income source is stored once under its name, so re-running the script
+any number of times upserts the same entries instead of appending new ones;
+the ledger never grows beyond the number of distinct sources. The total is
+maintained incrementally as entries change.
+"""
+
+
+class IncomeLedger:
+    """Ordered mapping of income source name -> annual amount with a running total."""
+
+    def __init__(self):
+        self._entries = {}
+        self._total = 0.0
+
+    def upsert(self, name, amount):
+        """Insert or update a source, adjusting the total by the difference."""
+        self._total += amount - self._entries.get(name, 0)
+        self._entries[name] = amount
+
+    def remove(self, name):
+        """Drop a source if present."""
+        self._total -= self._entries.pop(name, 0)
+
+    def sync(self, items):
+        """
+        Make the ledger hold exactly the given (name, amount) items.
+
+        Existing sources are upserted in place, new ones are added and sources
+        that no longer apply are removed.
+        """
+        items = dict(items)
+        for name in [name for name in self._entries if name not in items]:
+            self.remove(name)
+        for name, amount in items.items():
+            if self._entries.get(name) != amount:
+                self.upsert(name, amount)
+
+    def clear(self):
+        self._entries.clear()
+        self._total = 0.0
+
+    @property
+    def total(self):
+        return self._total
+
+    def items(self):
+        return list(self._entries.items())
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, name):
+        return name in self._entries
@@ -0,0 +1,326 @@
+# -*- coding: utf-8 -*-
+"""
+Shareable scenario links and the server-side result cache.
+
+Every input widget that shapes a scenario has a key listed in SHARED_INPUTS.
+Their values are packed positionally into one compact token (JSON array,
+zlib, URL-safe base64) kept in the ``s`` query parameter, so the address bar
+always holds a link that reopens the same scenario. On the first run of a
+session the token is decoded back into st.session_state before any widget
+is created, which hydrates every widget.
+
+Engine results are kept in a process-wide LRU keyed by a canonical hash of
+the call's inputs and the plan-year parameter version, bounded by the
+estimated bytes its results hold as well as by their number. Opening a
+shared link therefore reuses the sharer's results, and together with the
+chart and PDF caches the page renders without recomputing anything.
+Cached results are shared between sessions and must be treated as read-only.
+"""
+import base64
+import dataclasses
+import hashlib
+import json
+import math
+import sys
+import threading
+import zlib
+from collections import OrderedDict
+from datetime import date
+from typing import NamedTuple, Optional
+
+from fers_engine import FILING_STATUSES, OBJECTIVES, SEPP_METHODS, TSP_OPTIONS
+from fers_engine.sensitivity import DEFAULT_EXPENSE_FACTORS
+
+QUERY_PARAM = "s"
+TOKEN_VERSION = "1"
+RESULT_CACHE_SIZE = 256
+RESULT_CACHE_BYTES = 64 * 1024 * 1024
+
+# Widget keys in token order. Append new inputs at the end so older links keep working, and keep
+# the keys of retired widgets (tax_rate) in place.
+SHARED_INPUTS = (
+    "show_military_benefits", "tricare_selected", "military_retirement_pay", "military_retirement_start_year",
+    "plan_year", "current_age", "years_service", "high3_salary", "tsp_balance", "tsp_contribution_pct",
+    "retirement_eligibility", "tsp_option", "public_safety_employee", "vera_elected", "tax_rate",
+    "withdrawal_rate", "health_coverage_choice", "fehb_plan", "fegli_option", "monthly_expenses",
+    "va_monthly", "disability_retirement", "vera_incentive_elected", "vsip_amount", "drp_elected",
+    "months_of_leave", "show_diff", "priority_income", "priority_security", "priority_flexibility",
+    "current_grade", "current_step", "local_wage", "show_retirement_wage_section",
+    "expected_retirement_multiplier", "debt_payments", "healthcare_expenses", "additional_taxes",
+    "currency_symbol", "contractor_role", "hourly_rate", "hours_per_week", "weekly_overhead",
+    "apply_srs_earnings_test", "pension_multiplier", "expense_factor", "vary_high3", "heatmap_factor",
+    "heatmap_high3", "min_grid_net_cash", "inflation_rate", "fehb_growth_rate", "tsp_return_rate",
+    "system_type", "min_compare_age", "max_compare_age", "use_monte_carlo", "mc_paths", "mc_volatility",
+    "mc_depletion_age", "mc_seed", "optimizer_ages", "optimizer_objective", "optimizer_no_deficit",
+    "optimizer_tsp_must_last", "optimizer_include_drp", "optimizer_top_n", "sepp_method", "sepp_rate",
+    "sepp_joint", "sepp_beneficiary_age", "filing_status", "state_tax",
+)
+
+RETIRED_INPUTS = ("tax_rate",)  # still in the token order, never restored
+
+
+class Number(NamedTuple):
+    """A numeric widget's type and range; None leaves a bound open."""
+
+    kind: type
+    low: Optional[float] = None
+    high: Optional[float] = None
+
+
+class AgeRange(NamedTuple):
+    """A range slider's (low, high) pair of whole numbers."""
+
+    low: int
+    high: int
+
+
+# What each widget accepts: bool, str, a Number, an AgeRange, a tuple of options, or the name of a
+# runtime option list passed to decode_inputs (plan years, FEGLI options, state tax tables).
+INPUT_RULES = {
+    "show_military_benefits": bool,
+    "tricare_selected": bool,
+    "military_retirement_pay": Number(int, 0),
+    "military_retirement_start_year": Number(int, 1900, date.today().year + 20),
+    "plan_year": "plan_year",
+    "current_age": Number(int, 18, 80),
+    "years_service": Number(int, 0, 50),
+    "high3_salary": Number(int, 0),
+    "tsp_balance": Number(int, 0),
+    "tsp_contribution_pct": Number(int, 0, 100),
+    "retirement_eligibility": ("Eligible", "Not Eligible"),
+    "tsp_option": TSP_OPTIONS,
+    "public_safety_employee": bool,
+    "vera_elected": bool,
+    "withdrawal_rate": Number(int, 1, 10),
+    "health_coverage_choice": ("None", "FEHB", "CHAMPVA"),
+    "fehb_plan": ("Self Only", "Self + One", "Family"),
+    "fegli_option": "fegli_option",
+    "monthly_expenses": Number(int, 0),
+    "va_monthly": Number(int, 0),
+    "disability_retirement": bool,
+    "vera_incentive_elected": bool,
+    "vsip_amount": Number(int, 0),
+    "drp_elected": bool,
+    "months_of_leave": Number(int, 1, 5),
+    "show_diff": bool,
+    "priority_income": Number(int, 1, 10),
+    "priority_security": Number(int, 1, 10),
+    "priority_flexibility": Number(int, 1, 10),
+    "current_grade": Number(int, 1, 20),
+    "current_step": Number(int, 1, 10),
+    "local_wage": Number(int, 0),
+    "show_retirement_wage_section": bool,
+    "expected_retirement_multiplier": Number(float, 0.0, 2.0),
+    "debt_payments": Number(int, 0),
+    "healthcare_expenses": Number(int, 0),
+    "additional_taxes": Number(int, 0),
+    "currency_symbol": ("$", "€", "£", "¥"),
+    "contractor_role": str,
+    "hourly_rate": Number(int, 0),
+    "hours_per_week": Number(int, 0),
+    "weekly_overhead": Number(int, 0),
+    "apply_srs_earnings_test": bool,
+    "pension_multiplier": Number(float, 0.005, 0.02),
+    "expense_factor": Number(float, 0.8, 1.2),
+    "vary_high3": bool,
+    "heatmap_factor": tuple(DEFAULT_EXPENSE_FACTORS.tolist()),
+    "heatmap_high3": Number(float, 0.0),  # options depend on High-3; checked again where the slider is drawn
+    "min_grid_net_cash": Number(int),
+    "inflation_rate": Number(float, 0.0, 8.0),
+    "fehb_growth_rate": Number(float, 0.0, 12.0),
+    "tsp_return_rate": Number(float, 0.0, 10.0),
+    "system_type": ("FERS", "CSRS"),
+    "min_compare_age": Number(int, 40, 80),
+    "max_compare_age": Number(int, 40, 80),
+    "use_monte_carlo": bool,
+    "mc_paths": (10_000, 25_000, 50_000, 100_000),
+    "mc_volatility": Number(float, 0.0, 30.0),
+    "mc_depletion_age": Number(int, 60, 100),
+    "mc_seed": Number(int, 0),
+    "optimizer_ages": AgeRange(18, 81),
+    "optimizer_objective": tuple(OBJECTIVES),
+    "optimizer_no_deficit": bool,
+    "optimizer_tsp_must_last": bool,
+    "optimizer_include_drp": bool,
+    "optimizer_top_n": Number(int, 3, 25),
+    "sepp_method": SEPP_METHODS,
+    "sepp_rate": Number(float, 0.0, 10.0),
+    "sepp_joint": bool,
+    "sepp_beneficiary_age": Number(int, 0, 120),
+    "filing_status": FILING_STATUSES,
+    "state_tax": "state_tax",
+}
+
+
+class ShareTokenError(ValueError):
+    """A scenario token could not be decoded."""
+
+
+def _plain(value):
+    """JSON-friendly copy of a widget value (numpy scalars, tuples)."""
+    if hasattr(value, "item"):
+        return value.item()
+    if isinstance(value, (tuple, list)):
+        return [_plain(v) for v in value]
+    return value
+
+
+def encode_inputs(state) -> str:
+    """
+    Pack the shared widget values of a session state into a URL-safe token.
+
+    Widgets that were not rendered in this run are stored as null.
+    """
+    values = [_plain(state[key]) if key in state else None for key in SHARED_INPUTS]
+    while values and values[-1] is None:
+        values.pop()
+    payload = json.dumps(values, separators=(",", ":")).encode("utf-8")
+    return TOKEN_VERSION + base64.urlsafe_b64encode(zlib.compress(payload, 9)).decode("ascii").rstrip("=")
+
+
+def _check(value, rule, options):
+    """The value as its widget expects it, or None if the widget would reject it."""
+    if isinstance(rule, str) and rule in options:
+        return value if value in options[rule] else None
+    if rule is bool:
+        return value if isinstance(value, bool) else None
+    if rule is str:
+        return value if isinstance(value, str) else None
+    if isinstance(rule, Number):
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+            return None
+        if rule.kind is int:
+            if value != int(value):
+                return None
+            value = int(value)
+        else:
+            value = float(value)
+        if (rule.low is not None and value < rule.low) or (rule.high is not None and value > rule.high):
+            return None
+        return value
+    if isinstance(rule, AgeRange):
+        if (isinstance(value, (list, tuple)) and len(value) == 2
+                and all(isinstance(v, int) and not isinstance(v, bool) for v in value)
+                and rule.low <= value[0] <= value[1] <= rule.high):
+            return tuple(value)
+        return None
+    if isinstance(rule, tuple):
+        return value if not isinstance(value, (bool, list)) and value in rule else None
+    return None
+
+
+def decode_inputs(token, options=None, rejected=None) -> dict:
+    """
+    Unpack a token into {widget key: value}, skipping widgets stored as null.
+
+    Every value is checked against its widget's type and range or options
+    (INPUT_RULES); values a widget would reject are dropped, so that widget
+    starts from its default.
+
+    :param options: {rule name: allowed values} for the option lists only
+        known at run time ("plan_year", "fegli_option", "state_tax"); keys
+        with no list given are dropped.
+    :param rejected: A list that receives the keys of dropped values.
+    :raises ShareTokenError: If the token is not one produced by encode_inputs().
+    """
+    if not token or token[0] != TOKEN_VERSION:
+        raise ShareTokenError("Unknown scenario link format")
+    body = token[1:]
+    try:
+        payload = zlib.decompress(base64.urlsafe_b64decode(body + "=" * (-len(body) % 4)))
+        values = json.loads(payload)
+    except (ValueError, zlib.error):
+        raise ShareTokenError("Scenario link is damaged") from None
+    if not isinstance(values, list) or len(values) > len(SHARED_INPUTS):
+        raise ShareTokenError("Scenario link is damaged")
+    options = options or {}
+    decoded = {}
+    for key, value in zip(SHARED_INPUTS, values):
+        if value is None or key in RETIRED_INPUTS:
+            continue
+        checked = _check(value, INPUT_RULES[key], options)
+        if checked is None:
+            if rejected is not None:
+                rejected.append(key)
+            continue
+        decoded[key] = checked
+    return decoded
+
+
+def _canonical(value):
+    if dataclasses.is_dataclass(value):
+        return {f.name: getattr(value, f.name) for f in dataclasses.fields(value)}
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"Cannot hash {type(value).__name__} for the result cache")
+
+
+def canonical_hash(*parts) -> str:
+    """sha256 of a canonical JSON encoding (sorted keys, dataclasses as dicts)."""
+    payload = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=_canonical)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def estimated_size(value) -> int:
+    """Rough bytes held by an engine result: array buffers plus the containers around them."""
+    if hasattr(value, "nbytes"):
+        return int(value.nbytes)
+    if hasattr(value, "memory_usage"):
+        return int(value.memory_usage(deep=True).sum())
+    if dataclasses.is_dataclass(value):
+        return sys.getsizeof(value) + sum(estimated_size(getattr(value, f.name)) for f in dataclasses.fields(value))
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimated_size(k) + estimated_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(estimated_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class ResultCache:
+    """Thread-safe LRU of engine results keyed by a canonical input hash, bounded by count and bytes."""
+
+    def __init__(self, maxsize=RESULT_CACHE_SIZE, maxbytes=RESULT_CACHE_BYTES):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self._entries = OrderedDict()  # key -> (value, estimated bytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, version, function, *args, **kwargs):
+        """
+        Return function(*args, **kwargs), computing it only on a cache miss.
+
+        A result larger than the whole byte budget is returned but not kept.
+
+        :param version: Anything else the result depends on, e.g. the plan-year
+            parameter version.
+        """
+        key = canonical_hash(version, function.__module__, function.__qualname__, args, kwargs)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            self.misses += 1
+
+        value = function(*args, **kwargs)
+        size = estimated_size(value)
+        if size > self.maxbytes:
+            return value
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while len(self._entries) > self.maxsize or self._bytes > self.maxbytes:
+                self._bytes -= self._entries.popitem(last=False)[1][1]
+        return value
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries), "bytes": self._bytes}
+
+
+result_cache = ResultCache()
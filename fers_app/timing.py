@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+Per-section timing spans for streamlit_app.py.
+
+The script is a long, linear sequence of sections, so a SectionTimer marks
+where each one starts: start("pension") closes whatever section was open
+and opens the next, and stop() closes the last one. Finished reruns are
+added to the process-wide section_stats, which keeps running totals per
+section plus the most recent reruns, and can export them as Prometheus
+text or JSON lines.
+
+Instrumentation is off unless FERS_DEBUG_TIMING=1 is set or the page is
+opened with ?debug=timing. When off, start() and stop() return after a
+single attribute check and nothing is recorded.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+
+RECENT_RUNS = 200
+
+
+def timing_enabled(query_params=None):
+    """True when section timing is switched on by environment or query string."""
+    if os.environ.get("FERS_DEBUG_TIMING", "").lower() in ("1", "true", "yes"):
+        return True
+    return bool(query_params) and query_params.get("debug") == "timing"
+
+
+class SectionTimer:
+    """Sequential section spans for a single rerun."""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.spans = []
+        self._current = None
+        self._started = None
+
+    def start(self, name):
+        """Close the open section (if any) and start timing the next one."""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if self._current is not None:
+            self.spans.append((self._current, now - self._started))
+        self._current, self._started = name, now
+
+    def stop(self):
+        """Close the open section."""
+        if not self.enabled or self._current is None:
+            return
+        self.spans.append((self._current, time.perf_counter() - self._started))
+        self._current = None
+
+    def totals(self):
+        """Seconds per section for this rerun, summed where a name repeats."""
+        totals = {}
+        for name, seconds in self.spans:
+            totals[name] = totals.get(name, 0.0) + seconds
+        return totals
+
+
+class SectionStats:
+    """Thread-safe running totals per section across all sessions."""
+
+    def __init__(self, recent_runs=RECENT_RUNS):
+        self._lock = threading.Lock()
+        self._sections = {}
+        self._recent = deque(maxlen=recent_runs)
+        self.runs = 0
+
+    def record(self, timer):
+        """Add a finished rerun's spans to the totals."""
+        if not timer.enabled:
+            return
+        totals = timer.totals()
+        with self._lock:
+            self.runs += 1
+            for name, seconds in totals.items():
+                count, total, worst = self._sections.get(name, (0, 0.0, 0.0))
+                self._sections[name] = (count + 1, total + seconds, max(worst, seconds))
+            self._recent.append((time.time(), self.runs, totals))
+
+    def summary(self):
+        """List of {section, count, mean_ms, max_ms, total_ms} rows."""
+        with self._lock:
+            sections = dict(self._sections)
+        return [
+            {
+                "section": name,
+                "count": count,
+                "mean_ms": total / count * 1000,
+                "max_ms": worst * 1000,
+                "total_ms": total * 1000,
+            }
+            for name, (count, total, worst) in sections.items()
+        ]
+
+    def prometheus(self):
+        """Totals in the Prometheus text exposition format."""
+        with self._lock:
+            sections = dict(self._sections)
+            runs = self.runs
+        lines = [
+            "# HELP fers_reruns_total Instrumented reruns of the app script.",
+            "# TYPE fers_reruns_total counter",
+            f"fers_reruns_total {runs}",
+            "# HELP fers_section_seconds Time spent in each app section per rerun.",
+            "# TYPE fers_section_seconds summary",
+        ]
+        for name, (count, total, _) in sections.items():
+            lines.append(f'fers_section_seconds_sum{{section="{name}"}} {total:.6f}')
+            lines.append(f'fers_section_seconds_count{{section="{name}"}} {count}')
+        lines.append("# HELP fers_section_seconds_max Slowest rerun of each app section.")
+        lines.append("# TYPE fers_section_seconds_max gauge")
+        for name, (_, _, worst) in sections.items():
+            lines.append(f'fers_section_seconds_max{{section="{name}"}} {worst:.6f}')
+        return "\n".join(lines) + "\n"
+
+    def json_lines(self):
+        """Recent reruns as JSON lines, one object per section span."""
+        with self._lock:
+            recent = list(self._recent)
+        return "".join(
+            json.dumps({"ts": round(ts, 3), "run": run, "section": name, "seconds": round(seconds, 6)}) + "\n"
+            for ts, run, totals in recent
+            for name, seconds in totals.items()
+        )
+
+    def clear(self):
+        with self._lock:
+            self._sections.clear()
+            self._recent.clear()
+            self.runs = 0
+
+
+section_stats = SectionStats()
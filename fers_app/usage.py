@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+Process-wide usage counters with batched SQLite persistence.
+
+The app keeps one UsageCounters per process (through st.cache_resource)
+and counts page visits, reruns, fragment reruns per section and downloads
+on it. hit() only adds to an in-memory dict under a lock, so counting adds
+no I/O to a rerun. A background thread flushes the pending increments to a
+local SQLite file in WAL mode every flush_interval seconds, and once more
+when the process exits.
+
+Each flush adds the pending deltas to the stored totals in one transaction
+(an upsert per counter), so several app processes can share the file, and
+then re-reads the totals, so every process sees the others' counts after
+its next flush.
+"""
+import atexit
+import os
+import sqlite3
+import threading
+
+USAGE_DB_PATH = os.environ.get("FERS_USAGE_DB", "fers_usage.db")
+FLUSH_SECONDS = 10.0
+
+_SCHEMA = "CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, count INTEGER NOT NULL)"
+_UPSERT = "INSERT INTO counters (name, count) VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET count = count + excluded.count"
+
+
+class UsageCounters:
+    """Thread-safe named counters, persisted to SQLite in batches."""
+
+    def __init__(self, path=USAGE_DB_PATH, flush_interval=FLUSH_SECONDS):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = {}
+        self._stored = {}
+        self._stop = threading.Event()
+        self._thread = None
+        self.flushes = 0
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(_SCHEMA)
+        self._stored = self._read()
+
+    def hit(self, name, count=1):
+        with self._lock:
+            self._pending[name] = self._pending.get(name, 0) + count
+
+    def count(self, name):
+        with self._lock:
+            return self._stored.get(name, 0) + self._pending.get(name, 0)
+
+    def totals(self):
+        """{name: count} including increments not flushed yet."""
+        with self._lock:
+            totals = dict(self._stored)
+            for name, count in self._pending.items():
+                totals[name] = totals.get(name, 0) + count
+        return totals
+
+    def pending(self):
+        with self._lock:
+            return sum(self._pending.values())
+
+    def _read(self):
+        return dict(self._connection.execute("SELECT name, count FROM counters").fetchall())
+
+    def flush(self):
+        """Write the pending increments in one transaction and reload the stored totals."""
+        with self._flush_lock:
+            if self._connection is None:
+                return
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            try:
+                if batch:
+                    with self._connection:
+                        self._connection.execute("BEGIN")
+                        self._connection.executemany(_UPSERT, batch.items())
+                stored = self._read()
+            except sqlite3.Error:
+                with self._lock:  # keep the increments for the next flush
+                    for name, count in batch.items():
+                        self._pending[name] = self._pending.get(name, 0) + count
+                raise
+            with self._lock:
+                self._stored = stored
+            self.flushes += 1
+
+    def start(self):
+        """Flush on a background thread every flush_interval seconds, and at exit."""
+        if self._thread is not None:
+            return self
+        self._thread = threading.Thread(target=self._run, name="fers-usage-flush", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except sqlite3.Error:
+                pass  # retried with the next batch
+
+    def close(self):
+        """Stop the flush thread, write what is pending and close the database."""
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        if self._connection is None:
+            return
+        self.flush()
+        with self._flush_lock:
+            self._connection.close()
+            self._connection = None
+
+    def prometheus(self):
+        """Counters in the Prometheus text exposition format."""
+        lines = [
+            "# HELP fers_usage_total App usage events across all sessions.",
+            "# TYPE fers_usage_total counter",
+        ]
+        for name, count in sorted(self.totals().items()):
+            lines.append(f'fers_usage_total{{event="{name}"}} {count}')
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+Named scenario workspace kept in st.session_state.
+
+A scenario stores only what is needed to restore and compare it: the
+shared-link token of its inputs (a few hundred bytes, see share.py), a hash
+of the inputs that drive its outputs, and a tuple of headline outputs.
+Profiles, ledgers and charts are not kept, so a saved scenario costs about
+a kilobyte and the workspace holds at most MAX_SCENARIOS of them.
+
+Saving under an existing name updates that scenario in place; its outputs
+are recomputed only when its input hash changed, and no other scenario is
+touched.
+"""
+import math
+import sys
+from dataclasses import dataclass
+from typing import Tuple
+
+from fers_engine import cash_flow_ledger, evaluate
+
+from .share import canonical_hash, result_cache
+
+MAX_SCENARIOS = 8
+RESERVED_NAMES = ("Output", "Change", "Change (%)")  # column names of table() / diff()
+OUTPUTS = (
+    "Annual Pension",
+    "SRS (Annual)",
+    "TSP Income (Annual)",
+    "Total Income",
+    "Total Expenses",
+    "Net Cash Flow",
+    "10-Year Net Cash",
+    "Lifetime Net Cash to 95",
+    "TSP Balance at 95",
+    "First Deficit Age",
+)
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    token: str  # shared-link token of the scenario's inputs
+    key: str  # hash of the profile, assumptions and parameter version
+    outputs: Tuple[float, ...]  # aligned with OUTPUTS
+
+
+def scenario_outputs(profile, version, inflation, fehb_growth, tsp_return):
+    """Headline outputs of a profile, aligned with OUTPUTS."""
+    result = result_cache.get(version, evaluate, profile)
+    ledger = result_cache.get(
+        version, cash_flow_ledger, profile, inflation=inflation, fehb_growth=fehb_growth, tsp_return=tsp_return)
+    annual = ledger.annual()
+    net = annual["Net Cash"]
+    deficits = annual["Age"][net < 0]
+    return (
+        float(result.selected_fers_income),
+        float(result.srs_annual),
+        float(result.tsp.annual_income),
+        float(result.total_preretirement_income),
+        float(result.total_expenses),
+        float(result.net_cash),
+        float(net[:10].sum()),
+        float(net.sum()),
+        float(annual["TSP Balance"][-1]) if len(net) else 0.0,
+        float(deficits[0]) if len(deficits) else math.nan,
+    )
+
+
+class ScenarioWorkspace:
+    """Ordered mapping of scenario name -> Scenario, bounded to max_scenarios."""
+
+    def __init__(self, max_scenarios=MAX_SCENARIOS):
+        self.max_scenarios = max_scenarios
+        self._scenarios = {}
+        self.recomputed = 0
+
+    def save(self, name, token, profile, version, inflation, fehb_growth, tsp_return):
+        """
+        Insert or update a scenario.
+
+        :return: True if the outputs were recomputed, False if the scenario
+            already held outputs for these inputs.
+        :raises ValueError: If the name is reserved, or new while the workspace is full.
+        """
+        if not name or name in RESERVED_NAMES:
+            raise ValueError(f"{name!r} cannot be used as a scenario name.")
+        key = canonical_hash(profile, version, inflation, fehb_growth, tsp_return)
+        existing = self._scenarios.get(name)
+        if existing is None and self.full:
+            raise ValueError(f"The workspace holds at most {self.max_scenarios} scenarios; delete one first.")
+        if existing is not None and existing.key == key:
+            self._scenarios[name] = Scenario(name, token, key, existing.outputs)
+            return False
+        outputs = scenario_outputs(profile, version, inflation, fehb_growth, tsp_return)
+        self._scenarios[name] = Scenario(name, token, key, outputs)
+        self.recomputed += 1
+        return True
+
+    def remove(self, name):
+        self._scenarios.pop(name, None)
+
+    def get(self, name) -> Scenario:
+        return self._scenarios[name]
+
+    @property
+    def full(self):
+        return len(self._scenarios) >= self.max_scenarios
+
+    def names(self):
+        return list(self._scenarios)
+
+    def table(self):
+        """Outputs side by side: one row per output, one column per scenario."""
+        table = {"Output": list(OUTPUTS)}
+        for scenario in self._scenarios.values():
+            table[scenario.name] = list(scenario.outputs)
+        return table
+
+    def diff(self, base, other, tolerance=0.005):
+        """
+        Outputs that differ between two differently named scenarios.
+
+        :return: Dict of Output, both values, Change and Change (%) columns,
+            one row per output that changed by more than tolerance.
+        """
+        rows = {"Output": [], base: [], other: [], "Change": [], "Change (%)": []}
+        columns = list(rows)
+        for label, a, b in zip(OUTPUTS, self.get(base).outputs, self.get(other).outputs):
+            if (math.isnan(a) and math.isnan(b)) or abs(b - a) <= tolerance:
+                continue
+            change = b - a
+            for column, value in zip(columns, (label, a, b, change, change / abs(a) * 100 if a else math.nan)):
+                rows[column].append(value)
+        return rows
+
+    def memory_bytes(self):
+        """Approximate memory held by the saved scenarios."""
+        return sum(
+            sys.getsizeof(s.name) + sys.getsizeof(s.token) + sys.getsizeof(s.key)
+            + sys.getsizeof(s.outputs) + sum(sys.getsizeof(v) for v in s.outputs)
+            for s in self._scenarios.values())
+
+    def __len__(self):
+        return len(self._scenarios)
+
+    def __contains__(self, name):
+        return name in self._scenarios
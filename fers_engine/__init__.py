@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+Headless FERS / CSRS retirement calculation engine.
+
+Importing this package never pulls in Streamlit, matplotlib or reportlab, so
+the calculations can be cached, batched and benchmarked on their own::
+
+    from fers_engine import RetirementProfile, evaluate
+
+    result = evaluate(RetirementProfile(current_age=55, years_service=30, high3_salary=100000))
+    print(result.net_cash)
+"""
+from .cashflow import CashFlowLedger, cash_flow_ledger
+from .calculator import (
+    calc_retirement_income,
+    evaluate,
+    project_cash_flow,
+    sensitivity_net_cash,
+    taxable_income,
+)
+from .export import EXPORT_FORMATS, EXPORT_TABLES, export_file, stream_export, table_chunks
+from .montecarlo import TspMonteCarlo, monte_carlo_age_comparison, simulate_tsp
+from .optimizer import OBJECTIVES, PlanSearch, optimize_plans
+from .parameters import (
+    PARAMETERS_PATH,
+    ParameterError,
+    PlanYearParameters,
+    PlanYearRegistry,
+    load_registry,
+    parameters,
+    registry,
+    use_registry,
+)
+from .penalty_table import REASONS as TSP_PENALTY_REASONS
+from .penalty_table import penalty_lookup
+from .profile import (
+    SEPP_AMORTIZATION,
+    SEPP_ANNUITIZATION,
+    SEPP_METHOD_LABELS,
+    SEPP_METHODS,
+    SEPP_RMD,
+    TSP_DELAY,
+    TSP_OPTION_LABELS,
+    TSP_OPTIONS,
+    TSP_SEPP,
+    TSP_WITHDRAW_NOW,
+    ContractorResult,
+    RetirementProfile,
+    RetirementResult,
+    TspWithdrawal,
+)
+from .report import build_pdf_report
+from .sensitivity import SensitivityGrid, sensitivity_grid
+from .sepp import (
+    LIFE_TABLES_PATH,
+    SEPP_END_AGE,
+    SEPP_RATE,
+    LifeTables,
+    SeppSchedule,
+    check_life_tables,
+    life_tables,
+    load_life_tables,
+    sepp_payment,
+    sepp_payments,
+    sepp_schedule,
+    sepp_years,
+)
+from .tax import (
+    FILING_STATUS_LABELS,
+    FILING_STATUSES,
+    INCOME_KINDS,
+    NO_STATE,
+    IncomeTax,
+    TaxSchedule,
+    compile_schedule,
+    distribution_tax,
+    income_tax,
+)
+from .rules import (
+    admin_leave_income,
+    calculate_tsp_penalty_status,
+    career_wages,
+    contractor_income,
+    csrs_pension,
+    fers_cola,
+    fers_pensions,
+    health_premiums,
+    special_retirement_supplement,
+    srs_earnings_test,
+    tsp_withdrawal,
+)
+from .vectorized import (
+    annuity_start_age,
+    compare_ages_surface,
+    compare_retirement_ages,
+    profile_arrays,
+    retirement_income_surface,
+    tsp_penalty_applies,
+)
+
+__all__ = [
+    "CashFlowLedger",
+    "ContractorResult",
+    "EXPORT_FORMATS",
+    "EXPORT_TABLES",
+    "FILING_STATUSES",
+    "FILING_STATUS_LABELS",
+    "INCOME_KINDS",
+    "IncomeTax",
+    "LIFE_TABLES_PATH",
+    "LifeTables",
+    "NO_STATE",
+    "OBJECTIVES",
+    "PARAMETERS_PATH",
+    "ParameterError",
+    "PlanSearch",
+    "PlanYearParameters",
+    "PlanYearRegistry",
+    "RetirementProfile",
+    "RetirementResult",
+    "SEPP_AMORTIZATION",
+    "SEPP_ANNUITIZATION",
+    "SEPP_END_AGE",
+    "SEPP_METHOD_LABELS",
+    "SEPP_METHODS",
+    "SEPP_RATE",
+    "SEPP_RMD",
+    "SensitivityGrid",
+    "SeppSchedule",
+    "TSP_DELAY",
+    "TSP_OPTION_LABELS",
+    "TSP_PENALTY_REASONS",
+    "TSP_OPTIONS",
+    "TSP_SEPP",
+    "TSP_WITHDRAW_NOW",
+    "TaxSchedule",
+    "TspMonteCarlo",
+    "TspWithdrawal",
+    "admin_leave_income",
+    "annuity_start_age",
+    "build_pdf_report",
+    "calc_retirement_income",
+    "calculate_tsp_penalty_status",
+    "check_life_tables",
+    "career_wages",
+    "cash_flow_ledger",
+    "compare_ages_surface",
+    "compare_retirement_ages",
+    "compile_schedule",
+    "contractor_income",
+    "csrs_pension",
+    "distribution_tax",
+    "evaluate",
+    "export_file",
+    "fers_cola",
+    "fers_pensions",
+    "health_premiums",
+    "income_tax",
+    "life_tables",
+    "load_life_tables",
+    "load_registry",
+    "monte_carlo_age_comparison",
+    "optimize_plans",
+    "parameters",
+    "penalty_lookup",
+    "profile_arrays",
+    "project_cash_flow",
+    "registry",
+    "retirement_income_surface",
+    "sensitivity_grid",
+    "sensitivity_net_cash",
+    "sepp_payment",
+    "sepp_payments",
+    "sepp_schedule",
+    "sepp_years",
+    "simulate_tsp",
+    "special_retirement_supplement",
+    "srs_earnings_test",
+    "stream_export",
+    "table_chunks",
+    "taxable_income",
+    "tsp_penalty_applies",
+    "tsp_withdrawal",
+    "use_registry",
+]
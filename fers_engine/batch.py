@@ -0,0 +1,368 @@
+# -*- coding: utf-8 -*-
+"""
+Batch cohort mode: evaluate a CSV or Parquet file of employee profiles.
+
+Rows are read in chunks, evaluated on a process pool and written to the
+output file as soon as each chunk finishes, in input order. Only a bounded
+number of chunks is in flight at any time, so memory stays flat however
+large the cohort is.
+
+Usage::
+
+    python -m fers_engine.batch cohort.csv results.csv --workers 8
+
+Column headers are RetirementProfile field names (current_age,
+years_service, high3_salary, ...) or one of the short aliases in
+COLUMN_ALIASES; missing columns fall back to the profile defaults and
+unknown columns are copied through to the output unchanged. A row that
+cannot be evaluated is written with empty results and the reason in the
+"error" column; the rest of the cohort carries on.
+"""
+import argparse
+import csv
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import fields
+from itertools import islice
+from typing import Optional
+
+from .calculator import evaluate
+from .parameters import registry
+from .profile import SEPP_METHODS, TSP_OPTIONS, RetirementProfile
+from .tax import FILING_STATUSES
+from .vectorized import compare_ages_surface
+
+COLUMN_ALIASES = {
+    "age": "current_age",
+    "service": "years_service",
+    "high3": "high3_salary",
+    "tsp": "tsp_balance",
+    "fehb": "fehb_plan",
+    "fegli": "fegli_option",
+    "va": "va_monthly",
+    "vsip": "vsip_amount",
+    "drp_months": "drp_leave_months",
+}
+COMPARE_AGES = (55, 57, 60, 62)
+CHUNK_SIZE = 1000
+# Result columns after the input columns, with their types; then the comparison ages and "error".
+RESULT_COLUMNS = (
+    ("tsp_penalty_applies", "bool"),
+    ("tsp_penalty_note", "str"),
+    ("tsp_withdrawal_balance", "float"),
+    ("tsp_annual_income", "float"),
+    ("sepp_payment", "float"),
+    ("tsp_tax", "float"),
+    ("fers_regular", "float"),
+    ("fers_disability", "float"),
+    ("srs_annual", "float"),
+    ("admin_leave_income", "float"),
+    ("total_preretirement_income", "float"),
+    ("federal_tax", "float"),
+    ("state_tax", "float"),
+    ("total_expenses", "float"),
+    ("net_cash", "float"),
+    ("srs_offset", "float"),
+    ("adjusted_net_cash", "float"),
+)
+SCENARIOS = ("Normal", "VERA", "DRP")
+
+_FIELD_TYPES = {f.name: f.type for f in fields(RetirementProfile)}
+_TRUE = {"1", "true", "t", "yes", "y"}
+# Every column profile_from_row() reads; anything else is copied through unchanged.
+PROFILE_COLUMNS = frozenset(_FIELD_TYPES) | frozenset(COLUMN_ALIASES) | {"contractor_income"}
+
+
+def _number(value):
+    number = float(value)
+    if not math.isfinite(number):
+        raise ValueError(f"{value!r} is not a finite number")
+    return number
+
+
+def _coerce(value, kind):
+    if kind in (bool, "bool"):
+        return str(value).strip().lower() in _TRUE
+    if kind in (int, "int", Optional[int], "Optional[int]"):
+        return int(_number(value))
+    if kind in (float, "float", Optional[float], "Optional[float]"):
+        return _number(value)
+    return str(value)
+
+
+def profile_from_row(row) -> RetirementProfile:
+    """
+    Build a RetirementProfile from one input row.
+
+    A non-empty fehb_plan implies FEHB coverage, drp_leave_months > 0 implies
+    DRP participation, and a contractor_income column stands in for the
+    hourly rate x hours x 52 weeks of the contractor toolkit.
+    """
+    values = {}
+    for column, raw in row.items():
+        if raw is None or raw == "":
+            continue
+        name = COLUMN_ALIASES.get(column, column)
+        if name in _FIELD_TYPES:
+            try:
+                values[name] = _coerce(raw, _FIELD_TYPES[name])
+            except ValueError as exc:
+                raise ValueError(f"{column}: {exc}") from None
+
+    if values.get("fehb_plan") in ("None", "none"):
+        del values["fehb_plan"]
+    elif "fehb_plan" in values:
+        values.setdefault("health_coverage", "FEHB")
+    if values.get("drp_leave_months", 0) > 0:
+        values.setdefault("drp_elected", True)
+    contractor_income = row.get("contractor_income")
+    if contractor_income not in (None, ""):
+        try:
+            hourly_rate = _number(contractor_income) / 52
+        except ValueError as exc:
+            raise ValueError(f"contractor_income: {exc}") from None
+        values.update(hourly_rate=hourly_rate, hours_per_week=1, weekly_overhead=0)
+    return RetirementProfile(**values)
+
+
+def check_profile(profile):
+    """
+    Reject values the engine would only fail on deep inside a rule.
+
+    :raises ValueError: If the plan year, FEHB plan, FEGLI option, TSP
+        option, SEPP method, filing status or state is unknown.
+    """
+    try:
+        params = registry().get(profile.plan_year)
+    except KeyError as exc:
+        raise ValueError(exc.args[0]) from None
+    if profile.fehb_plan not in params.fehb_costs:
+        raise ValueError(f"unknown fehb_plan {profile.fehb_plan!r}; expected one of {sorted(params.fehb_costs)}")
+    if profile.fegli_option not in params.fegli_costs:
+        raise ValueError(
+            f"unknown fegli_option {profile.fegli_option!r}; expected one of {sorted(params.fegli_costs)}")
+    if profile.tsp_option not in TSP_OPTIONS:
+        raise ValueError(f"unknown tsp_option {profile.tsp_option!r}; expected one of {list(TSP_OPTIONS)}")
+    if profile.sepp_method not in SEPP_METHODS:
+        raise ValueError(f"unknown sepp_method {profile.sepp_method!r}; expected one of {list(SEPP_METHODS)}")
+    if profile.filing_status not in FILING_STATUSES:
+        raise ValueError(
+            f"unknown filing_status {profile.filing_status!r}; expected one of {list(FILING_STATUSES)}")
+    if profile.state not in params.state_taxes:
+        raise ValueError(f"unknown state {profile.state!r}; expected one of {sorted(params.state_taxes)}")
+
+
+def result_columns(compare_ages=COMPARE_AGES):
+    """Names and types ("bool", "str", "float") of every column evaluate_rows() adds."""
+    ages = tuple((f"{scenario.lower()}_income_at_{age}", "float") for age in compare_ages for scenario in SCENARIOS)
+    return RESULT_COLUMNS + ages + (("error", "str"),)
+
+
+def _results(result, surface, i, compare_ages):
+    values = {
+        "tsp_penalty_applies": result.tsp.penalty_applies,
+        "tsp_penalty_note": result.tsp.note,
+        "tsp_withdrawal_balance": result.tsp.balance,
+        "tsp_annual_income": result.tsp.annual_income,
+        "sepp_payment": result.tsp.sepp_payment,
+        "tsp_tax": result.tsp.tax,
+        "fers_regular": result.fers_regular,
+        "fers_disability": result.fers_disability,
+        "srs_annual": result.srs_annual,
+        "admin_leave_income": result.total_admin_leave_income,
+        "total_preretirement_income": result.total_preretirement_income,
+        "federal_tax": result.federal_tax,
+        "state_tax": result.state_tax,
+        "total_expenses": result.total_expenses,
+        "net_cash": result.net_cash,
+        "srs_offset": result.contractor.srs_offset,
+        "adjusted_net_cash": result.contractor.adjusted_net_cash,
+    }
+    for j, age in enumerate(compare_ages):
+        for scenario, surface_values in surface.items():
+            values[f"{scenario.lower()}_income_at_{age}"] = surface_values[i, j]
+    types = dict(result_columns(compare_ages))
+    return {name: round(float(value), 2) if types[name] == "float" else value for name, value in values.items()}
+
+
+def evaluate_rows(rows, compare_ages=COMPARE_AGES, profiles=None):
+    """
+    Evaluate a chunk of input rows.
+
+    A row that cannot be evaluated (an unknown plan year, FEGLI option,
+    state, ...) gets empty result columns and the reason in "error", so one
+    bad row never stops the rest of the batch.
+
+    :param rows: A list of dicts, one per employee.
+    :param profiles: The rows' profiles, already built and checked by the
+        caller, so that no row is parsed twice.
+    :return: A list of output dicts: the input columns followed by result_columns().
+    """
+    columns = result_columns(compare_ages)
+    if profiles is not None:
+        errors = [None] * len(rows)
+    else:
+        profiles, errors = [], []
+        for row in rows:
+            try:
+                profile = profile_from_row(row)
+                check_profile(profile)
+            except (TypeError, ValueError) as exc:
+                profile, error = None, str(exc)
+            else:
+                error = None
+            profiles.append(profile)
+            errors.append(error)
+    valid = [profile for profile in profiles if profile is not None]
+    surface = compare_ages_surface(valid, compare_ages, simulate_drp=True) if valid else {}
+
+    output = []
+    i = 0
+    for row, profile, error in zip(rows, profiles, errors):
+        out = dict(row)
+        out.update({name: None for name, _ in columns})
+        if profile is not None:
+            try:
+                out.update(_results(evaluate(profile), surface, i, compare_ages))
+            except (ArithmeticError, KeyError, TypeError, ValueError) as exc:
+                error = f"{type(exc).__name__}: {exc}"
+            i += 1
+        out["error"] = error
+        output.append(out)
+    return output
+
+
+def read_rows(path, chunk_size=CHUNK_SIZE):
+    """Yield lists of row dicts from a CSV or Parquet file, chunk by chunk."""
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pylist()
+        return
+
+    with open(path, newline="", encoding="utf-8") as handle:
+        reader = csv.DictReader(handle)
+        while True:
+            chunk = list(islice(reader, chunk_size))
+            if not chunk:
+                return
+            yield chunk
+
+
+class _CsvSink:
+    def __init__(self, path):
+        self.handle = open(path, "w", newline="", encoding="utf-8")
+        self.writer = None
+
+    def write(self, rows):
+        if self.writer is None:
+            self.writer = csv.DictWriter(self.handle, fieldnames=list(rows[0]))
+            self.writer.writeheader()
+        self.writer.writerows(rows)
+        self.handle.flush()
+
+    def close(self):
+        self.handle.close()
+
+
+def output_schema(input_path, compare_ages=COMPARE_AGES):
+    """
+    Arrow schema of the run_batch() output: the input columns, then result_columns().
+
+    Declared up front rather than inferred from the first chunk, where a
+    column can be entirely null (e.g. "error", or an optional input).
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if input_path.endswith(".parquet"):
+        inputs = list(pq.ParquetFile(input_path).schema_arrow)
+    else:
+        with open(input_path, newline="", encoding="utf-8") as handle:
+            header = next(csv.reader(handle), [])
+        inputs = [pa.field(name, pa.string()) for name in header]
+    types = {"bool": pa.bool_(), "str": pa.string(), "float": pa.float64()}
+    results = [pa.field(name, types[kind]) for name, kind in result_columns(compare_ages)]
+    names = {field.name for field in results}
+    return pa.schema([field for field in inputs if field.name not in names] + results)
+
+
+class _ParquetSink:
+    def __init__(self, path, schema):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.pa, self.schema = pa, schema
+        self.writer = pq.ParquetWriter(path, schema)
+
+    def write(self, rows):
+        self.writer.write_table(self.pa.Table.from_pylist(rows, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+def run_batch(input_path, output_path, workers=None, chunk_size=CHUNK_SIZE, compare_ages=COMPARE_AGES):
+    """
+    Evaluate every profile in input_path and stream the results to output_path.
+
+    :param workers: Process count (defaults to os.cpu_count()); 0 runs inline.
+    :param chunk_size: Rows per work unit.
+    :return: Number of rows written.
+    """
+    if output_path.endswith(".parquet"):
+        sink = _ParquetSink(output_path, output_schema(input_path, compare_ages))
+    else:
+        sink = _CsvSink(output_path)
+    chunks = read_rows(input_path, chunk_size)
+    written = 0
+    try:
+        if workers == 0:
+            for rows in chunks:
+                sink.write(evaluate_rows(rows, compare_ages))
+                written += len(rows)
+            return written
+
+        workers = workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # Keep at most 2 chunks per worker in flight so memory stays flat.
+            pending = []
+            for rows in chunks:
+                pending.append(pool.submit(evaluate_rows, rows, compare_ages))
+                if len(pending) >= workers * 2:
+                    results = pending.pop(0).result()
+                    sink.write(results)
+                    written += len(results)
+            for future in pending:
+                results = future.result()
+                sink.write(results)
+                written += len(results)
+        return written
+    finally:
+        sink.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Evaluate DRP / VERA / VSIP outcomes for a cohort of employee profiles.")
+    parser.add_argument("input", help="CSV or .parquet file of profiles")
+    parser.add_argument("output", help="CSV or .parquet file to write results to")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes (default: CPU count, 0 = no pool)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="rows per work unit")
+    parser.add_argument("--ages", type=int, nargs="+", default=list(COMPARE_AGES),
+                        help="retirement ages for the Normal/VERA/DRP income columns")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    count = run_batch(args.input, args.output, args.workers, args.chunk_size, tuple(args.ages))
+    elapsed = time.perf_counter() - start
+    print(f"Evaluated {count:,} profiles in {elapsed:.1f}s -> {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+"""
+Compose the benefit rules into a full RetirementResult.
+
+evaluate() is the single entry point the Streamlit app, exports and the PDF
+report read from; the remaining helpers back the comparison, sensitivity and
+projection sections. calc_retirement_income() is the scalar reference for
+the vectorized age comparison in vectorized.py.
+"""
+from functools import partial
+
+from .parameters import parameters
+from .profile import ContractorResult, RetirementProfile, RetirementResult
+from .rules import (
+    admin_leave_income,
+    calculate_tsp_penalty_status,
+    career_wages,
+    contractor_income,
+    csrs_pension,
+    fers_pensions,
+    health_premiums,
+    special_retirement_supplement,
+    srs_earnings_test,
+    tsp_withdrawal,
+)
+from .tax import distribution_tax, income_tax
+
+
+def taxable_income(profile: RetirementProfile, params=None):
+    """
+    The profile's income by kind (see tax.INCOME_KINDS) before any TSP distribution.
+
+    This is what evaluate() taxes, and the income a TSP distribution is
+    stacked on for tsp_withdrawal()'s tax_on.
+    """
+    params = params or parameters(profile.plan_year)
+    srs_annual = special_retirement_supplement(profile.current_age, profile.years_service, params)
+    fers_regular, fers_disability = fers_pensions(
+        profile.high3_salary, profile.years_service, profile.current_age, profile.retirement_eligible, params)
+    if profile.disability_retirement:
+        pension = fers_disability
+    else:
+        pension = fers_regular + (srs_annual if profile.current_age < 62 else 0)
+    return {
+        "wages": profile.vsip_amount,
+        "pension": pension,
+        "military": profile.military_retirement_pay,
+        "va": profile.va_monthly * 12,
+    }
+
+
+def evaluate(profile: RetirementProfile) -> RetirementResult:
+    """Run every calculation the app shows for a single profile."""
+    params = parameters(profile.plan_year)
+    fehb_premium, fegli_premium = health_premiums(
+        profile.health_coverage, profile.fehb_plan, profile.fegli_option, profile.tricare, params
+    )
+
+    srs = special_retirement_supplement(profile.current_age, profile.years_service, params)
+    srs_annual = srs if profile.current_age < 62 else 0
+    total_admin_leave_income = admin_leave_income(
+        profile.high3_salary, profile.drp_elected, profile.drp_leave_months
+    )
+
+    fers_regular, fers_disability = fers_pensions(
+        profile.high3_salary,
+        profile.years_service,
+        profile.current_age,
+        profile.retirement_eligible,
+        params,
+    )
+    monthly_regular = round(fers_regular / 12, 2)
+    monthly_disability = round(fers_disability / 12, 2)
+
+    if profile.disability_retirement:
+        selected_fers_income = fers_disability
+        selected_monthly_income = monthly_disability
+        pension_label = "Disability Retirement"
+    else:
+        selected_fers_income = fers_regular
+        selected_monthly_income = monthly_regular
+        pension_label = "Regular FERS Retirement"
+
+    # --- Income summary ---
+    income_items = [("VSIP Lump Sum", profile.vsip_amount)]
+    if profile.disability_retirement:
+        income_items.append(("Annual FERS Pension (Disability Retirement)", fers_disability))
+    else:
+        income_items.append(("Annual FERS Pension (Regular FERS Retirement)", fers_regular))
+        if srs_annual > 0:
+            income_items.append(("Special Retirement Supplement (SRS)", srs_annual))
+    if profile.va_monthly > 0:
+        income_items.append(("Annual VA Disability", profile.va_monthly * 12))
+    if profile.military_retirement_pay > 0:
+        income_items.append(("Military Retirement Pay", profile.military_retirement_pay))
+    total_preretirement_income = sum(value for _, value in income_items)
+
+    # --- Income tax ---
+    income = taxable_income(profile, params)
+    taxes = income_tax(income, params, profile.filing_status, profile.state, profile.current_age)
+    tax_on = None
+    if profile.tax_rate is None:
+        tax_on = partial(distribution_tax, income=income, params=params, filing_status=profile.filing_status,
+                         state=profile.state, age=profile.current_age)
+
+    tsp = tsp_withdrawal(
+        profile.current_age,
+        profile.tsp_balance,
+        profile.tsp_option,
+        profile.years_service,
+        profile.vera_elected,
+        profile.public_safety_employee,
+        profile.tax_rate,
+        profile.withdrawal_rate,
+        params,
+        profile.sepp_method,
+        profile.sepp_rate,
+        profile.sepp_beneficiary_age,
+        tax_on,
+    )
+
+    # --- Expenses & net cash ---
+    base_expenses = (fegli_premium + fehb_premium + profile.monthly_expenses) * 12
+    total_expenses = (
+        base_expenses
+        + profile.debt_payments * 12
+        + profile.healthcare_expenses * 12
+        + profile.additional_taxes
+        + float(taxes.total)
+    )
+    net_cash = total_preretirement_income - total_expenses
+
+    # --- Contractor toolkit ---
+    annual_gross, annual_overhead, contractor_net_income = contractor_income(
+        profile.hourly_rate, profile.hours_per_week, profile.weekly_overhead
+    )
+    srs_offset, adjusted_srs = srs_earnings_test(
+        srs_annual, contractor_net_income, profile.apply_srs_earnings_test, params
+    )
+    adjusted_retirement_income = total_preretirement_income + (adjusted_srs - srs_annual)
+    contractor = ContractorResult(
+        annual_gross=annual_gross,
+        annual_overhead=annual_overhead,
+        net_income=contractor_net_income,
+        srs_offset=srs_offset,
+        adjusted_srs=adjusted_srs,
+        adjusted_retirement_income=adjusted_retirement_income,
+        adjusted_net_cash=adjusted_retirement_income - total_expenses,
+    )
+
+    estimated_retirement_wage, projected_career_wage = career_wages(
+        profile.local_wage,
+        profile.retirement_wage_multiplier,
+        profile.current_grade,
+        profile.current_step,
+    )
+
+    return RetirementResult(
+        tsp=tsp,
+        fehb_premium=fehb_premium,
+        fegli_premium=fegli_premium,
+        srs=srs,
+        srs_annual=srs_annual,
+        total_admin_leave_income=total_admin_leave_income,
+        fers_regular=fers_regular,
+        fers_disability=fers_disability,
+        monthly_regular=monthly_regular,
+        monthly_disability=monthly_disability,
+        selected_fers_income=selected_fers_income,
+        selected_monthly_income=selected_monthly_income,
+        pension_label=pension_label,
+        income_items=tuple(income_items),
+        total_preretirement_income=total_preretirement_income,
+        base_expenses=base_expenses,
+        total_expenses=total_expenses,
+        net_cash=net_cash,
+        contractor=contractor,
+        estimated_retirement_wage=estimated_retirement_wage,
+        projected_career_wage=projected_career_wage,
+        federal_tax=float(taxes.federal),
+        state_tax=float(taxes.state),
+        income_tax=float(taxes.total),
+        marginal_tax_rate=float(taxes.marginal_rate),
+    )
+
+
+def calc_retirement_income(
+        profile: RetirementProfile,
+        age: int,
+        with_vera=False,
+        with_drp=False,
+        separation_age=50) -> float:
+    """
+    Calculate annual retirement income for a given age, base service,
+    and scenario (VERA, DRP).
+
+    :param profile: The user's inputs.
+    :param age: The retirement age to calculate for.
+    :param with_vera: Whether VERA is applied.
+    :param with_drp: Whether DRP is applied.
+    :param separation_age: The age at which DRP lump sum is applied.
+    :return: The annual retirement income for the given scenario.
+    """
+    params = parameters(profile.plan_year)
+    base_service = profile.years_service
+    current_age = profile.current_age
+
+    # Determine hypothetical service based on scenario
+    if with_vera:
+        hypothetical_service = base_service  # VERA = fixed service at separation
+    else:
+        hypothetical_service = base_service + max(0, age - current_age)
+
+    # Basic pension
+    if profile.system_type == "CSRS":
+        pension = csrs_pension(profile.high3_salary, hypothetical_service, params)
+    else:
+        pension = (profile.high3_salary * params.fers_multiplier * hypothetical_service
+                   * params.fers_reduction_factor)
+
+    # SRS (FERS only if <62 & service >= 20)
+    srs_amt = 0
+    if profile.system_type == "FERS" and age < 62 and hypothetical_service >= 20:
+        srs_amt = special_retirement_supplement(current_age, base_service, params)
+
+    # --- TSP Approximate ---
+    withdrawal_rate = 0.04
+    annual_growth_rate = 0.05
+
+    if with_vera:
+        years_until_retirement = 0
+    else:
+        years_until_retirement = max(0, age - current_age)
+
+    projected_tsp_balance = profile.tsp_balance * ((1 + annual_growth_rate) ** years_until_retirement)
+    estimated_tsp_withdrawal = projected_tsp_balance * withdrawal_rate
+
+    penalty_applies, _ = calculate_tsp_penalty_status(
+        age,
+        base_service,
+        vera_elected=with_vera,
+        public_safety_employee=False
+    )
+
+    if penalty_applies:
+        estimated_tsp_withdrawal *= 1 - params.tsp_early_withdrawal_penalty
+
+    # DRP lump sum
+    lumpsum_drp = 0
+    if with_drp and age >= separation_age:
+        lumpsum_drp = admin_leave_income(
+            profile.high3_salary, profile.drp_elected, profile.drp_leave_months
+        )
+
+    # VA disability income
+    va_annual = profile.va_monthly * 12
+
+    # Total annual income
+    return pension + srs_amt + estimated_tsp_withdrawal + lumpsum_drp + va_annual
+
+
+def sensitivity_net_cash(
+        profile: RetirementProfile,
+        pension_multiplier=None,
+        expense_factor=1.0,
+        years_range=range(0, 51)):
+    """
+    Net cash flow for each number of service years (simplified pension).
+
+    :param pension_multiplier: Defaults to the plan year's FERS multiplier.
+    """
+    params = parameters(profile.plan_year)
+    if pension_multiplier is None:
+        pension_multiplier = params.fers_multiplier
+    fehb_premium, fegli_premium = health_premiums(
+        profile.health_coverage, profile.fehb_plan, profile.fegli_option, profile.tricare, params
+    )
+    base_expenses = (fegli_premium + fehb_premium + profile.monthly_expenses) * 12
+    total_exp = base_expenses * expense_factor
+    net_cash_sensitivity = []
+    for y in years_range:
+        # Recalculate pension using the adjustable multiplier.
+        # The reduction factor remains constant.
+        pension_value = profile.high3_salary * pension_multiplier * y * params.fers_reduction_factor
+        total_income = profile.vsip_amount + pension_value
+        net_cash_sensitivity.append(total_income - total_exp)
+    return net_cash_sensitivity
+
+
+def project_cash_flow(net_cash, growth_rate, years=21):
+    """Compound today's net cash flow by a fixed annual growth rate."""
+    return [net_cash * ((1 + growth_rate) ** i) for i in range(years)]
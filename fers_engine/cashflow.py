@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+"""
+Month-by-month cash flow ledger from separation to a final age.
+
+Built from the same components evaluate() shows in the income summary
+(pension, SRS, VA, military pay, premiums, TSP income, VSIP, DRP leave),
+but laid out over time:
+
+- DRP administrative leave is paid first and the pension starts after it,
+- the VSIP lump sum lands in the first month,
+- the SRS stops at 62,
+- the FERS pension gets the diet COLA (from 62 for regular retirements),
+  VA and military pay get the full CPI COLA,
+- FEHB premiums grow at their own rate and living costs with CPI,
+- income tax is charged on each year's pension, SRS, military pay and
+  leave/VSIP, with the brackets indexed to CPI (TSP withdrawals are
+  already net of their own tax),
+- the TSP is drawn down at a fixed monthly amount until it runs out,
+  starting at 59½ when the withdrawal is delayed.
+
+Every column is computed for all months at once (the TSP drawdown uses the
+closed-form annuity balance), and the ledger is stored as a single float32
+matrix of months x columns.
+"""
+from dataclasses import dataclass
+from typing import Tuple
+
+import numpy as np
+
+from .calculator import evaluate
+from .parameters import parameters
+from .profile import TSP_DELAY, RetirementProfile
+from .rules import fers_cola
+from .tax import income_tax
+from .vectorized import ANNUAL_GROWTH_RATE
+
+# --- Default ledger assumptions ---
+END_AGE = 95
+INFLATION = 0.025
+FEHB_GROWTH = 0.06
+TSP_ACCESS_AGE = 59.5
+
+INCOME_COLUMNS = (
+    "Admin Leave", "VSIP", "FERS Pension", "SRS", "VA Disability", "Military Retirement",
+    "TSP Withdrawal")
+EXPENSE_COLUMNS = ("FEHB", "FEGLI", "Living & Other Expenses", "Income Tax")
+LEDGER_COLUMNS = INCOME_COLUMNS + ("Total Income",) + EXPENSE_COLUMNS + (
+    "Total Expenses", "Net Cash", "TSP Balance")
+# Balances are read at year end; every other column is a monthly flow.
+STOCK_COLUMNS = ("TSP Balance",)
+
+
+@dataclass(frozen=True)
+class CashFlowLedger:
+    """Monthly cash flows, one float32 row per month from start_age."""
+
+    start_age: int
+    columns: Tuple[str, ...]
+    values: np.ndarray  # (months, len(columns)), float32
+
+    @property
+    def months(self):
+        return self.values.shape[0]
+
+    def column(self, name):
+        return self.values[:, self.columns.index(name)]
+
+    def ages(self):
+        """Age at the start of each month."""
+        return self.start_age + np.arange(self.months) / 12
+
+    def annual(self, years=None):
+        """
+        Roll the ledger up into years.
+
+        Flows are summed in float64, balances take the last month of each year.
+
+        :param years: Only the first N years; defaults to the whole ledger.
+        :return: Dict of Year, Age and one array per column, ready for pd.DataFrame.
+        """
+        n_years = -(-self.months // 12)
+        if years is not None:
+            n_years = min(n_years, years)
+        values = self.values[:n_years * 12].astype(np.float64)
+        padded = np.zeros((n_years * 12, len(self.columns)))
+        padded[:len(values)] = values
+        by_year = padded.reshape(n_years, 12, len(self.columns))
+
+        last_month = np.minimum(np.arange(1, n_years + 1) * 12, len(values)) - 1
+        table = {"Year": np.arange(1, n_years + 1), "Age": self.start_age + np.arange(n_years)}
+        for i, name in enumerate(self.columns):
+            table[name] = values[last_month, i] if name in STOCK_COLUMNS else by_year[:, :, i].sum(axis=1)
+        return table
+
+
+def _tsp_drawdown(months, start_month, opening_balance, monthly_withdrawal, monthly_return, pre_start_balance):
+    """
+    Fixed monthly TSP withdrawals from start_month until the balance runs out.
+
+    The balance before withdrawal k is B0*g^k - W*g*(g^k - 1)/(g - 1); once it
+    drops below W the last partial withdrawal empties the account.
+
+    :return: Tuple of (withdrawal, end-of-month balance) arrays.
+    """
+    k = np.arange(months) - start_month
+    g = 1 + monthly_return
+    active = k >= 0
+    k = np.maximum(k, 0)
+    growth = g ** k
+    if monthly_return:
+        paid_in = monthly_withdrawal * g * (growth - 1) / monthly_return
+    else:
+        paid_in = monthly_withdrawal * k
+    before = np.maximum(opening_balance * growth - paid_in, 0.0)
+    withdrawal = np.where(active, np.minimum(before, monthly_withdrawal), 0.0)
+    balance = np.where(
+        active,
+        (before - withdrawal) * g,
+        pre_start_balance * g ** (np.arange(months) + 1))
+    return withdrawal, balance
+
+
+def cash_flow_ledger(
+        profile: RetirementProfile,
+        end_age=END_AGE,
+        inflation=INFLATION,
+        fehb_growth=FEHB_GROWTH,
+        tsp_return=ANNUAL_GROWTH_RATE) -> CashFlowLedger:
+    """
+    Project a profile's cash flows month by month until end_age.
+
+    :param inflation: Annual CPI increase, used for COLAs and living costs.
+    :param fehb_growth: Annual FEHB premium growth.
+    :param tsp_return: Annual TSP return during drawdown.
+    """
+    result = evaluate(profile)
+    months = max(0, (int(end_age) - int(profile.current_age)) * 12)
+    if not months:
+        return CashFlowLedger(int(profile.current_age), LEDGER_COLUMNS,
+                              np.empty((0, len(LEDGER_COLUMNS)), dtype=np.float32))
+    month = np.arange(months)
+    year = month // 12
+    age = profile.current_age + month / 12
+
+    # DRP leave is paid first; the annuity starts after separation.
+    leave_months = profile.drp_leave_months if profile.drp_elected else 0
+    retired = month >= leave_months
+    admin_leave = np.where(month < leave_months, profile.high3_salary / 12, 0.0)
+
+    vsip = np.zeros(months)
+    vsip[0] = profile.vsip_amount
+
+    # COLAs step up once per projection year; regular FERS retirees only get them from 62.
+    cpi_factor = (1 + inflation) ** year
+    if profile.system_type == "CSRS":
+        pension_factor = cpi_factor
+    else:
+        year_start_age = profile.current_age + np.arange(year[-1] + 1)
+        cola_years = year_start_age >= 62
+        if profile.disability_retirement:
+            cola_years[:] = True
+        cola_years[0] = False
+        pension_factor = ((1 + fers_cola(inflation)) ** np.cumsum(cola_years))[year]
+    pension = np.where(retired, result.selected_fers_income / 12 * pension_factor, 0.0)
+
+    srs_annual = 0 if profile.disability_retirement else result.srs_annual
+    srs = np.where(retired & (age < 62), srs_annual / 12, 0.0)
+    va = np.full(months, profile.va_monthly) * cpi_factor
+    military = profile.military_retirement_pay / 12 * cpi_factor
+
+    # --- TSP drawdown ---
+    monthly_return = (1 + tsp_return) ** (1 / 12) - 1
+    if profile.tsp_option == TSP_DELAY and profile.current_age < TSP_ACCESS_AGE:
+        start_month = int(np.ceil((TSP_ACCESS_AGE - profile.current_age) * 12))
+        opening = profile.tsp_balance * (1 + monthly_return) ** start_month * (1 - result.tsp.tax_rate)
+        monthly_withdrawal = opening * profile.withdrawal_rate / 12
+        pre_start_balance = profile.tsp_balance
+    else:
+        start_month = 0
+        opening = result.tsp.balance
+        monthly_withdrawal = result.tsp.annual_income / 12
+        pre_start_balance = 0.0
+    tsp_withdrawal, tsp_balance = _tsp_drawdown(
+        months, start_month, opening, monthly_withdrawal, monthly_return, pre_start_balance)
+
+    # --- Expenses ---
+    fehb = result.fehb_premium * (1 + fehb_growth) ** year
+    fegli = np.full(months, float(result.fegli_premium))
+    living = ((profile.monthly_expenses + profile.healthcare_expenses) * cpi_factor
+              + profile.debt_payments + profile.additional_taxes / 12)
+
+    # One call over every projection year; the brackets move with CPI like the IRS indexing.
+    n_years = year[-1] + 1
+    taxes = income_tax(
+        {
+            "wages": np.bincount(year, admin_leave + vsip, n_years),
+            "pension": np.bincount(year, pension + srs, n_years),
+            "military": np.bincount(year, military, n_years),
+            "va": np.bincount(year, va, n_years),
+        },
+        parameters(profile.plan_year), profile.filing_status, profile.state,
+        age=profile.current_age + np.arange(n_years), index=(1 + inflation) ** np.arange(n_years))
+    tax = taxes.total[year] / 12
+
+    income = [admin_leave, vsip, pension, srs, va, military, tsp_withdrawal]
+    expenses = [fehb, fegli, living, tax]
+    total_income = np.sum(income, axis=0)
+    total_expenses = np.sum(expenses, axis=0)
+
+    values = np.empty((months, len(LEDGER_COLUMNS)), dtype=np.float32)
+    for i, column in enumerate(income + [total_income] + expenses + [
+            total_expenses, total_income - total_expenses, tsp_balance]):
+        values[:, i] = column
+    return CashFlowLedger(int(profile.current_age), LEDGER_COLUMNS, values)
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""
+Self-checks for the engine's precompiled tables.
+
+Run with ``python -m fers_engine.checks``; exits non-zero on any mismatch.
+"""
+import sys
+
+import numpy as np
+
+from .penalty_table import PENALTY_CODES, REASONS, check_equivalence, penalty_codes
+from .sepp import check_life_tables, life_tables
+
+# Published IRS values (2022 tables): single life by age, and joint and last survivor by
+# (owner, beneficiary) from the Uniform Lifetime Table, whose beneficiary is 10 years younger.
+KNOWN_LIFE_EXPECTANCIES = {
+    (50,): 36.2, (55,): 31.6, (60,): 27.1, (72,): 17.2, (80,): 11.2,
+    (72, 62): 27.4, (75, 65): 24.6, (80, 70): 20.2, (90, 80): 12.2, (100, 90): 6.4,
+}
+
+
+def main():
+    status = 0
+    checked, failures = check_equivalence()
+    if failures:
+        print(f"Penalty table: {len(failures)} of {checked} queries differ, e.g. {failures[:5]}")
+        status = 1
+    else:
+        print(f"Penalty table matches calculate_tsp_penalty_status on all {checked} queries "
+              f"({len(REASONS)} reason codes, table {PENALTY_CODES.nbytes} bytes).")
+    for query in ((np.nan, 20), ([55, np.nan], 20), (60, np.nan)):
+        try:
+            codes = penalty_codes(*query)
+        except ValueError:
+            continue
+        print(f"Penalty table: a NaN query {query} got codes {codes} instead of an error")
+        status = 1
+
+    tables = life_tables()
+    checked, failures = check_life_tables(tables)
+    for ages, expected in KNOWN_LIFE_EXPECTANCIES.items():
+        value = float(tables.life_expectancy(*ages))
+        if value != expected:
+            failures.append(("known value", ages, value, expected))
+    if failures:
+        print(f"Life tables: {len(failures)} entries differ, e.g. {failures[:5]}")
+        status = 1
+    else:
+        print(f"Life tables agree on all {checked} entries and {len(KNOWN_LIFE_EXPECTANCIES)} published values.")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+Chunked exports of the full projections.
+
+Each table is produced as a sequence of column chunks (dicts of typed NumPy
+arrays, at most chunk_rows rows each) rather than one DataFrame:
+
+- ``age_comparison``: Normal / VERA / DRP income for every retirement age,
+- ``sensitivity``: the whole sensitivity grid (High-3 x multiplier x
+  expense factor x service years), unravelled chunk by chunk so the flat
+  grid is never materialized,
+- ``cash_flow``: the monthly cash flow schedule to age 95.
+
+stream_export() encodes the chunks as CSV, Parquet (one row group per
+chunk) or an Arrow IPC stream and yields the encoded bytes as each chunk is
+written, so a caller can send them on without holding the whole file.
+export_file() collects them in a spooled temporary file that moves to disk
+past SPOOL_BYTES. pyarrow is imported only for the Parquet and Arrow formats.
+"""
+import csv
+import io
+import tempfile
+
+import numpy as np
+
+from .cashflow import cash_flow_ledger
+from .profile import RetirementProfile
+from .sensitivity import sensitivity_grid
+from .vectorized import compare_ages_surface
+
+CHUNK_ROWS = 50_000
+SPOOL_BYTES = 8 * 1024 * 1024
+COMPARE_AGE_RANGE = (40, 80)
+HIGH3_STEPS = np.linspace(0.8, 1.2, 5)
+
+EXPORT_TABLES = {
+    "age_comparison": "Retirement Income by Age (Normal / VERA / DRP)",
+    "sensitivity": "Sensitivity Grid (every combination)",
+    "cash_flow": "Monthly Cash Flow Schedule to 95",
+}
+# format -> (MIME type, file extension)
+EXPORT_FORMATS = {
+    "csv": ("text/csv", ".csv"),
+    "parquet": ("application/vnd.apache.parquet", ".parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", ".arrows"),
+}
+
+
+def age_comparison_chunks(profile: RetirementProfile, ages=None, chunk_rows=CHUNK_ROWS):
+    """Normal / VERA / DRP income at each age (defaults to every age in COMPARE_AGE_RANGE)."""
+    if ages is None:
+        ages = np.arange(COMPARE_AGE_RANGE[0], COMPARE_AGE_RANGE[1] + 1)
+    ages = np.asarray(ages, dtype=np.int64)
+    surface = compare_ages_surface([profile], ages, simulate_drp=profile.drp_elected)
+    for start in range(0, len(ages), chunk_rows):
+        window = slice(start, start + chunk_rows)
+        yield {"Age": ages[window], **{name: values[0, window] for name, values in surface.items()}}
+
+
+def sensitivity_chunks(profile: RetirementProfile, chunk_rows=CHUNK_ROWS):
+    """The grid the app shows, with High-3 salary varied ±20%, one row per combination."""
+    grid = sensitivity_grid(profile, high3_salaries=np.round(profile.high3_salary * HIGH3_STEPS, -2))
+    net_cash = grid.net_cash.ravel()
+    for start in range(0, len(net_cash), chunk_rows):
+        index = np.arange(start, min(start + chunk_rows, len(net_cash)))
+        high3, multiplier, factor, years = np.unravel_index(index, grid.net_cash.shape)
+        yield {
+            "High-3 Salary": grid.high3_salaries[high3],
+            "Pension Multiplier": grid.pension_multipliers[multiplier],
+            "Expense Factor": grid.expense_factors[factor],
+            "Years of Service": grid.years_service[years],
+            "Net Cash Flow": net_cash[index],
+        }
+
+
+def cash_flow_chunks(profile: RetirementProfile, chunk_rows=CHUNK_ROWS, **assumptions):
+    """
+    Monthly ledger rows: Month, Age and every ledger column (float32).
+
+    :param assumptions: inflation, fehb_growth and tsp_return, as for cash_flow_ledger().
+    """
+    ledger = cash_flow_ledger(profile, **assumptions)
+    ages = ledger.ages()
+    for start in range(0, ledger.months, chunk_rows):
+        window = slice(start, start + chunk_rows)
+        chunk = {"Month": np.arange(start, min(start + chunk_rows, ledger.months), dtype=np.int64) + 1,
+                 "Age": np.round(ages[window], 3)}
+        for i, name in enumerate(ledger.columns):
+            chunk[name] = ledger.values[window, i]
+        yield chunk
+
+
+def table_chunks(table, profile: RetirementProfile, chunk_rows=CHUNK_ROWS, **assumptions):
+    """
+    Column chunks of one of EXPORT_TABLES.
+
+    :param assumptions: Cash flow assumptions; ignored by the other tables.
+    :raises KeyError: If table is not in EXPORT_TABLES.
+    """
+    if table == "age_comparison":
+        return age_comparison_chunks(profile, chunk_rows=chunk_rows)
+    if table == "sensitivity":
+        return sensitivity_chunks(profile, chunk_rows=chunk_rows)
+    if table == "cash_flow":
+        return cash_flow_chunks(profile, chunk_rows=chunk_rows, **assumptions)
+    raise KeyError(f"Unknown export table {table!r}; expected one of {list(EXPORT_TABLES)}")
+
+
+class _ChunkSink:
+    """Write-only file that hands back what was written since the last take()."""
+
+    closed = False
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position  # Parquet footers record absolute offsets
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def _csv_blocks(chunks):
+    header = True
+    for chunk in chunks:
+        text = io.StringIO()
+        writer = csv.writer(text, lineterminator="\n")
+        if header:
+            writer.writerow(chunk)
+            header = False
+        writer.writerows(zip(*(np.asarray(values).astype(str) for values in chunk.values())))
+        yield text.getvalue().encode("utf-8")
+
+
+def _arrow_blocks(chunks, fmt):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    sink, writer = _ChunkSink(), None
+    try:
+        for chunk in chunks:
+            batch = pa.RecordBatch.from_pydict(chunk)
+            if writer is None:
+                writer = (pq.ParquetWriter(sink, batch.schema) if fmt == "parquet"
+                          else pa.ipc.new_stream(sink, batch.schema))
+            if fmt == "parquet":
+                writer.write_batch(batch, row_group_size=len(batch))
+            else:
+                writer.write_batch(batch)
+            yield sink.take()
+    finally:
+        if writer is not None:
+            writer.close()
+    yield sink.take()
+
+
+def stream_export(chunks, fmt):
+    """
+    Encode column chunks, yielding the bytes written for each chunk.
+
+    :param fmt: One of EXPORT_FORMATS.
+    :raises KeyError: If fmt is not in EXPORT_FORMATS.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise KeyError(f"Unknown export format {fmt!r}; expected one of {list(EXPORT_FORMATS)}")
+    blocks = _csv_blocks(chunks) if fmt == "csv" else _arrow_blocks(chunks, fmt)
+    return (block for block in blocks if block)
+
+
+def export_file(chunks, fmt, spool_bytes=SPOOL_BYTES):
+    """Encode column chunks into a rewound file object (in memory until spool_bytes)."""
+    handle = tempfile.SpooledTemporaryFile(max_size=spool_bytes)
+    for block in stream_export(chunks, fmt):
+        handle.write(block)
+    handle.seek(0)
+    return handle
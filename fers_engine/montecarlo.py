@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+Seeded Monte Carlo projection of the TSP balance.
+
+Replaces the fixed 5% growth assumption of the age comparison with random
+annual returns. Paths are simulated in chunks, so the return arrays stay
+bounded by chunk_size x years no matter how many paths are requested; only
+each path's balance at every start age (n_paths x start ages) is kept for
+the exact percentiles. Every chunk is vectorized across paths, years and
+retirement ages.
+"""
+from dataclasses import dataclass
+from typing import Tuple
+
+import numpy as np
+
+from .parameters import parameters
+from .profile import RetirementProfile
+from .vectorized import (
+    ANNUAL_GROWTH_RATE,
+    WITHDRAWAL_RATE,
+    profile_arrays,
+    retirement_income_surface,
+    tsp_penalty_applies,
+)
+
+# --- Default market assumptions ---
+RETURN_VOLATILITY = 0.12
+DEFAULT_PATHS = 10_000
+CHUNK_SIZE = 10_000
+DEPLETION_AGE = 90
+PERCENTILES = (10, 50, 90)
+
+
+@dataclass(frozen=True)
+class TspMonteCarlo:
+    """Distribution of TSP outcomes for each retirement start offset."""
+
+    start_offsets: np.ndarray  # years from today until withdrawals start
+    percentiles: Tuple[int, ...]
+    balance_percentiles: np.ndarray  # (len(percentiles), len(start_offsets))
+    depletion_probability: np.ndarray  # (len(start_offsets),)
+    depletion_age: int
+    n_paths: int
+    seed: int
+
+
+def _log_return_params(mean_return, volatility):
+    """Lognormal parameters whose arithmetic mean/stdev match the inputs."""
+    sigma2 = np.log(1 + volatility ** 2 / (1 + mean_return) ** 2)
+    mu = np.log(1 + mean_return) - sigma2 / 2
+    return mu, np.sqrt(sigma2)
+
+
+def simulate_tsp(
+        tsp_balance,
+        current_age,
+        start_offsets,
+        withdrawal_rate=WITHDRAWAL_RATE,
+        mean_return=ANNUAL_GROWTH_RATE,
+        volatility=RETURN_VOLATILITY,
+        depletion_age=DEPLETION_AGE,
+        n_paths=DEFAULT_PATHS,
+        seed=0,
+        chunk_size=CHUNK_SIZE,
+        percentiles=PERCENTILES) -> TspMonteCarlo:
+    """
+    Simulate TSP growth until each start offset, then a fixed withdrawal.
+
+    The balance grows untouched until withdrawals start. From then on the
+    same dollar amount (withdrawal_rate x the balance at the start) is taken
+    at the beginning of every year and the remainder keeps earning returns.
+    The TSP "runs out" when a withdrawal can no longer be covered in full
+    before depletion_age.
+
+    :param start_offsets: Years from today until withdrawals start.
+    :param n_paths: Number of return paths to simulate.
+    :param seed: Seed for numpy's default_rng; equal seeds give equal results.
+    :param chunk_size: Paths simulated per chunk; bounds the chunk_size x years
+        return arrays. The balances at each start age are kept for every path,
+        so memory also grows as n_paths x len(start_offsets).
+    """
+    start_offsets = np.asarray(start_offsets, dtype=int)
+    n_years = max(int(depletion_age - current_age), int(start_offsets.max(initial=0)), 0)
+    mu, sigma = _log_return_params(mean_return, volatility)
+    rng = np.random.default_rng(seed)
+
+    balances = np.empty((n_paths, start_offsets.size))
+    depleted_count = np.zeros(start_offsets.size)
+    for first in range(0, n_paths, chunk_size):
+        size = min(chunk_size, n_paths - first)
+        log_returns = rng.normal(mu, sigma, size=(size, n_years))
+        cumulative = np.zeros((size, n_years + 1))
+        np.cumsum(log_returns, axis=1, out=cumulative[:, 1:])
+        growth = np.exp(log_returns)
+
+        at_start = tsp_balance * np.exp(cumulative[:, start_offsets])
+        balances[first:first + size] = at_start
+
+        withdrawal = at_start * withdrawal_rate
+        balance = at_start.copy()
+        depleted = np.zeros_like(balance, dtype=bool)
+        for year in range(int(start_offsets.min(initial=0)), n_years):
+            active = start_offsets <= year
+            balance = np.where(active, balance - withdrawal, balance)
+            depleted |= active & (balance < 0)
+            balance = np.where(active, np.maximum(balance, 0) * growth[:, year, None], balance)
+        depleted_count += depleted.sum(axis=0)
+
+    return TspMonteCarlo(
+        start_offsets=start_offsets,
+        percentiles=tuple(percentiles),
+        balance_percentiles=np.percentile(balances, percentiles, axis=0),
+        depletion_probability=depleted_count / n_paths,
+        depletion_age=depletion_age,
+        n_paths=n_paths,
+        seed=seed,
+    )
+
+
+def monte_carlo_age_comparison(
+        profile: RetirementProfile,
+        min_age,
+        max_age,
+        depletion_age=DEPLETION_AGE,
+        n_paths=DEFAULT_PATHS,
+        seed=0,
+        mean_return=ANNUAL_GROWTH_RATE,
+        volatility=RETURN_VOLATILITY,
+        chunk_size=CHUNK_SIZE):
+    """
+    Age comparison with P10/P50/P90 income bands instead of a fixed 5% growth.
+
+    Pension, SRS and VA income are deterministic; only the TSP withdrawal
+    varies by path. Normal retirement starts withdrawals at each age, VERA
+    starts them today, matching calc_retirement_income.
+
+    :return: Dict of DataFrame-ready columns keyed like "Normal P50" and
+        "Normal P(depleted)".
+    """
+    ages = np.arange(int(min_age), int(max_age) + 1)
+    columns = profile_arrays([profile])
+    columns["tsp_balance"] = 0.0
+    years_until = np.maximum(0, ages - profile.current_age)
+    simulation = simulate_tsp(
+        profile.tsp_balance,
+        profile.current_age,
+        np.unique(np.append(years_until, 0)),
+        depletion_age=depletion_age,
+        n_paths=n_paths,
+        seed=seed,
+        mean_return=mean_return,
+        volatility=volatility,
+        chunk_size=chunk_size,
+    )
+    offsets = simulation.start_offsets.tolist()
+    penalty_rate = parameters(profile.plan_year).tsp_early_withdrawal_penalty
+
+    table = {"Age": ages}
+    for scenario, with_vera in (("Normal", False), ("VERA", True)):
+        other_income = retirement_income_surface(ages, with_vera=with_vera, **columns)[0]
+        index = np.zeros_like(ages) if with_vera else np.array([offsets.index(y) for y in years_until])
+        penalty = tsp_penalty_applies(ages, profile.years_service, with_vera)
+        for pct, balance in zip(simulation.percentiles, simulation.balance_percentiles):
+            tsp_income = balance[index] * WITHDRAWAL_RATE * np.where(penalty, 1 - penalty_rate, 1.0)
+            table[f"{scenario} P{pct}"] = other_income + tsp_income
+        table[f"{scenario} P(depleted)"] = simulation.depletion_probability[index]
+    return table
@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+"""
+Search for the best retirement plan.
+
+A plan is a separation age, a separation type (Normal, VERA or DRP), a TSP
+option (withdraw now, delay to 59½, SEPP) and a withdrawal rate. Every
+candidate is evaluated at once by a batched annual model of shape
+(plans, years) from the current age to end_age:
+
+- the profile keeps working (take-home pay, TSP growth and contributions)
+  until the separation age; under DRP it stops working at that age and
+  stays on paid administrative leave, still earning pay, service and TSP
+  contributions, for drp_leave_months before it separates,
+- the pension starts when annuity_start_age() allows at separation, with
+  the diet COLA from 62, and the SRS is paid until 62 on an immediate
+  annuity with 20+ years; the year of a mid-year separation pays a share,
+- VSIP lands in the separation year,
+- the TSP follows the calculator (rules.tsp_withdrawal): withdrawing now
+  before 59½ takes the whole balance as a lump sum at separation, with the
+  early-withdrawal penalty when it applies; otherwise it pays a fixed
+  withdrawal from its start age until it runs out, and a SEPP plan pays
+  the profile's 72(t) payment (sepp.py),
+- income tax comes from the plan year's brackets (tax.py) indexed to CPI,
+  or the profile's flat tax_rate when one is set,
+- expenses grow with CPI and FEHB premium growth as in cash_flow_ledger().
+
+Plans are scored on the years from the separation age (the age work stops)
+only: a plan still working in a year earns nothing toward lifetime income
+or the worst-year surplus, so working longer only counts through the larger
+pension and TSP it leads to, and separation ages stay comparable. DRP leave
+pay falls in the scored years, since no work is done for it.
+
+Branches that cannot change the answer are pruned before evaluation: VERA
+where the profile is not VERA-eligible or already has an immediate annuity
+(same as Normal), "delay" when separating at 60 or
+later (same as withdrawing), SEPP when no penalty applies (same as
+withdrawing), SEPP and lump-sum withdrawals at every withdrawal rate but
+the first (neither depends on it), and DRP when include_drp is off or the
+profile has no leave months (same as Normal). After
+evaluation, constraint violators are dropped and only plans that are not
+Pareto-dominated on lifetime income, worst-year surplus and ending TSP
+balance are ranked.
+"""
+from dataclasses import dataclass
+from typing import Dict
+
+import numpy as np
+
+from .cashflow import END_AGE, FEHB_GROWTH, INFLATION
+from .parameters import parameters
+from .profile import TSP_DELAY, TSP_OPTION_LABELS, TSP_SEPP, TSP_WITHDRAW_NOW, RetirementProfile
+from .rules import fers_cola, health_premiums
+from .sepp import sepp_payments
+from .tax import income_tax
+from .vectorized import ANNUAL_GROWTH_RATE, annuity_start_age, tsp_penalty_applies
+
+SCENARIOS = ("Normal", "VERA", "DRP")
+TSP_CHOICES = (TSP_WITHDRAW_NOW, TSP_DELAY, TSP_SEPP)
+WITHDRAWAL_RATES = np.round(np.arange(0.03, 0.0801, 0.005), 3)
+OBJECTIVES = {
+    "lifetime_income": "Lifetime After-Tax Retirement Income",
+    "min_surplus": "Worst Retired-Year Surplus",
+    "end_balance": "TSP Balance at End",
+}
+TSP_START_AGE_DELAYED = 60  # 59½ at annual resolution
+# Withdrawing now without the penalty (separating at 55+, or 59½+): the option label's warning does not apply.
+PENALTY_FREE_LABELS = {TSP_WITHDRAW_NOW: "Withdraw now (no penalty)"}
+
+
+@dataclass(frozen=True)
+class PlanSearch:
+    """Outcome of optimize_plans()."""
+
+    plans: Dict[str, np.ndarray]  # top-N plans as columns, best first
+    candidates: int  # every combination of the decision variables
+    evaluated: int  # after pruning equivalent / ineligible branches
+    feasible: int  # meeting the constraints
+    efficient: int  # not Pareto-dominated
+
+
+def _candidates(profile, ages, withdrawal_rates, include_drp):
+    """Enumerate the plan grid and drop branches that cannot change the answer."""
+    scenarios = SCENARIOS if include_drp else SCENARIOS[:2]
+    age, scenario, option, rate = (a.ravel() for a in np.meshgrid(
+        ages, np.arange(len(scenarios)), np.arange(len(TSP_CHOICES)), withdrawal_rates, indexing="ij"))
+    total = age.size
+
+    service = profile.years_service + (age - profile.current_age)
+    vera = scenario == SCENARIOS.index("VERA")
+    drp = scenario == SCENARIOS.index("DRP")
+    vera_eligible = annuity_start_age(age, service, True) == age
+    immediate = annuity_start_age(age, service, False) == age
+    # DRP separates once the paid leave ends, with the leave counted as service.
+    separation = age + np.where(drp, profile.drp_leave_months / 12, 0.0)
+    service = service + (separation - age)
+    penalty = tsp_penalty_applies(separation, service, vera, profile.public_safety_employee)
+    withdraw_now = option == TSP_CHOICES.index(TSP_WITHDRAW_NOW)
+    lump_sum = withdraw_now & (separation < 59.5)
+    keep = (
+        (~vera | (vera_eligible & ~immediate))
+        & ~(drp & (profile.drp_leave_months <= 0))
+        & ~((option == TSP_CHOICES.index(TSP_DELAY)) & (age >= TSP_START_AGE_DELAYED))
+        & ~((option == TSP_CHOICES.index(TSP_SEPP)) & (~penalty | (rate != withdrawal_rates[0])))
+        & ~(lump_sum & (rate != withdrawal_rates[0]))
+    )
+    plans = {
+        "age": age[keep].astype(float),
+        "separation": separation[keep],
+        "scenario": scenario[keep],
+        "option": option[keep],
+        "rate": rate[keep],
+        "service": service[keep],
+        "lump_sum": lump_sum[keep],
+        # Only the lump sum pays the penalty; SEPP avoids it and the other withdrawals start at 59½ or later.
+        "penalty": penalty[keep] & lump_sum[keep],
+    }
+    return plans, total, scenarios
+
+
+def _evaluate(profile, plans, end_age, inflation, fehb_growth, tsp_return):
+    """Batched annual model: (plans, years) income, expenses and TSP balance."""
+    params = parameters(profile.plan_year)
+    current_age = profile.current_age
+    years = np.arange(int(end_age) - int(current_age))[None, :]
+    age_y = current_age + years
+    stop = plans["age"][:, None]  # last day of work
+    sep = plans["separation"][:, None]  # after DRP leave, if any
+    service = plans["service"][:, None]
+    vera = plans["scenario"][:, None] == SCENARIOS.index("VERA")
+    on_payroll = np.clip(sep - age_y, 0.0, 1.0)  # share of each year paid as an employee
+    separation_year = age_y == np.floor(sep)
+    cpi = (1 + inflation) ** years
+
+    # --- Earned income (and DRP leave pay) and TSP accumulation until separation ---
+    contribution = profile.high3_salary * profile.tsp_contribution_pct / 100
+    wages = (profile.high3_salary - contribution) * on_payroll  # contributions are pre-tax
+    g = 1 + tsp_return
+    n = sep - current_age
+    if tsp_return:
+        balance_at_sep = profile.tsp_balance * g ** n + contribution * (g ** n - 1) / tsp_return
+    else:
+        balance_at_sep = profile.tsp_balance + contribution * n
+
+    # --- Pension, SRS and COLA ---
+    start = annuity_start_age(sep, service, vera)
+    if profile.system_type == "CSRS":
+        annual_pension = profile.high3_salary * params.csrs_multiplier * service
+        cola = (1 + inflation) ** np.maximum(age_y - start, 0)
+    else:
+        annual_pension = profile.high3_salary * params.fers_multiplier * service * params.fers_reduction_factor
+        cola = (1 + fers_cola(inflation)) ** np.maximum(age_y - np.maximum(start, 62), 0)
+    pension = annual_pension * cola * np.clip(age_y + 1 - start, 0.0, 1.0)
+    srs_eligible = (profile.system_type != "CSRS") & (start == sep) & (service >= 20)
+    srs = np.where(srs_eligible & (age_y < 62),
+                   service / 40 * params.srs_monthly_base * 12 * np.clip(age_y + 1 - sep, 0.0, 1.0), 0.0)
+
+    lump_sums = np.where(separation_year, profile.vsip_amount, 0.0)
+
+    # --- TSP lump sum or drawdown from its start age ---
+    delayed = plans["option"][:, None] == TSP_CHOICES.index(TSP_DELAY)
+    tsp_start = np.where(delayed, np.maximum(np.ceil(sep), TSP_START_AGE_DELAYED), np.ceil(sep))
+    opening = balance_at_sep * g ** (tsp_start - sep)
+    sepp = plans["option"][:, None] == TSP_CHOICES.index(TSP_SEPP)
+    sepp_payment = sepp_payments(
+        balance_at_sep, sep, profile.sepp_rate, profile.sepp_beneficiary_age)[profile.sepp_method]
+    lump_sum = plans["lump_sum"][:, None]
+    withdrawal_amount = np.where(lump_sum, opening, np.where(sepp, sepp_payment, opening * plans["rate"][:, None]))
+    k = age_y - tsp_start
+    growth = g ** np.maximum(k, 0)
+    if tsp_return:
+        paid_out = withdrawal_amount * g * (growth - 1) / tsp_return
+    else:
+        paid_out = withdrawal_amount * np.maximum(k, 0)
+    before = np.maximum(opening * growth - paid_out, 0.0)
+    tsp_gross = np.where(k >= 0, np.minimum(before, withdrawal_amount), 0.0)
+    tsp_balance = (before - tsp_gross) * g  # year-end balance once withdrawals have started
+    penalty = plans["penalty"][:, None] & (age_y < 59.5)
+    tsp_penalty = tsp_gross * np.where(penalty, params.tsp_early_withdrawal_penalty, 0.0)
+
+    # --- Income tax ---
+    taxable = {
+        "wages": wages + lump_sums,
+        "pension": pension + srs,
+        "military": profile.military_retirement_pay * cpi,
+        "va": profile.va_monthly * 12 * cpi,
+    }
+    if profile.tax_rate is None:
+        # Every (plan, year) in one call, brackets indexed to CPI; the TSP pays the tax it adds on top.
+        tax_args = (params, profile.filing_status, profile.state, age_y, cpi)
+        other_tax = income_tax(taxable, *tax_args).total
+        tsp_tax = income_tax({**taxable, "tsp": tsp_gross}, *tax_args).total - other_tax
+    else:
+        other_tax = (taxable["wages"] + taxable["pension"] + taxable["military"]) * profile.tax_rate
+        tsp_tax = tsp_gross * profile.tax_rate
+    tsp_tax_rate = np.where(tsp_gross > 0, tsp_tax / np.maximum(tsp_gross, 1e-9), 0.0)
+    first_year = np.clip((tsp_start - current_age).astype(int), 0, years.shape[1] - 1)
+    first_tsp_tax_rate = np.take_along_axis(tsp_tax_rate, first_year, axis=1)[:, 0]
+
+    # --- After-tax income, expenses and net cash ---
+    tsp_net = tsp_gross - tsp_tax - tsp_penalty
+    income = sum(taxable.values()) - other_tax + tsp_net
+    fehb_premium, fegli_premium = health_premiums(
+        profile.health_coverage, profile.fehb_plan, profile.fegli_option, profile.tricare, params)
+    expenses = (fehb_premium * 12 * (1 + fehb_growth) ** years
+                + fegli_premium * 12
+                + (profile.monthly_expenses + profile.healthcare_expenses) * 12 * cpi
+                + profile.debt_payments * 12
+                + profile.additional_taxes)
+    net = income - expenses
+    retired = age_y >= stop
+
+    depleted = (k >= 0) & (tsp_balance <= 0.5) & (opening > 0)
+    deficit = net < 0
+    age_row = np.broadcast_to(age_y, net.shape)
+    return {
+        "lifetime_income": np.where(retired, income, 0.0).sum(axis=1),
+        "min_surplus": np.where(retired, net, np.inf).min(axis=1),
+        "end_balance": tsp_balance[:, -1],
+        "depleted_age": np.where(depleted.any(axis=1), np.where(depleted, age_row, np.inf).min(axis=1), np.nan),
+        "first_deficit_age": np.where(deficit.any(axis=1), np.where(deficit, age_row, np.inf).min(axis=1), np.nan),
+        "lump_sum": np.where(plans["lump_sum"], np.take_along_axis(tsp_net, first_year, axis=1)[:, 0], np.nan),
+        "annual_tsp_income": np.where(plans["lump_sum"], np.nan, withdrawal_amount[:, 0] * (1 - first_tsp_tax_rate)),
+        "withdrawal_rate": np.where(
+            plans["lump_sum"], np.nan,
+            np.where(opening[:, 0] > 0, withdrawal_amount[:, 0] / np.maximum(opening[:, 0], 1e-9), plans["rate"])),
+        "pension_start": start[:, 0],
+    }
+
+
+def _pareto_efficient(metrics):
+    """Mask of rows not dominated by any other row (all metrics maximized)."""
+    values = np.column_stack(metrics)
+    efficient = np.ones(len(values), dtype=bool)
+    for i in range(len(values)):
+        if not efficient[i]:
+            continue
+        dominated = np.all(values <= values[i], axis=1) & np.any(values < values[i], axis=1)
+        efficient &= ~dominated
+    return efficient
+
+
+def optimize_plans(
+        profile: RetirementProfile,
+        min_age=None,
+        max_age=62,
+        objective="lifetime_income",
+        no_deficit=False,
+        tsp_must_last=False,
+        withdrawal_rates=WITHDRAWAL_RATES,
+        include_drp=True,
+        top_n=10,
+        end_age=END_AGE,
+        inflation=INFLATION,
+        fehb_growth=FEHB_GROWTH,
+        tsp_return=ANNUAL_GROWTH_RATE) -> PlanSearch:
+    """
+    Rank separation plans for a profile.
+
+    :param min_age: Earliest separation age; defaults to the current age.
+    :param objective: A key of OBJECTIVES to maximize.
+    :param no_deficit: Require net cash >= 0 in every year.
+    :param tsp_must_last: Require the TSP to last until end_age.
+    :param top_n: Number of plans to return.
+    :return: PlanSearch with the best plans first.
+    """
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Unknown objective {objective!r}; expected one of {sorted(OBJECTIVES)}")
+    min_age = profile.current_age if min_age is None else max(min_age, profile.current_age)
+    ages = np.arange(int(min_age), int(min(max_age, end_age - 1)) + 1)
+    plans, total, scenarios = _candidates(profile, ages, withdrawal_rates, include_drp)
+    metrics = _evaluate(profile, plans, end_age, inflation, fehb_growth, tsp_return)
+
+    feasible = np.ones(len(plans["age"]), dtype=bool)
+    if no_deficit:
+        feasible &= np.isnan(metrics["first_deficit_age"])
+    if tsp_must_last:
+        feasible &= np.isnan(metrics["depleted_age"])
+    index = np.flatnonzero(feasible)
+    efficient = _pareto_efficient(
+        [metrics[name][index] for name in ("lifetime_income", "min_surplus", "end_balance")])
+    index = index[efficient]
+    index = index[np.argsort(-metrics[objective][index], kind="stable")][:top_n]
+
+    top = {
+        "Separation Age": plans["age"][index].astype(int),
+        "Scenario": np.array(scenarios)[plans["scenario"][index]],
+        "TSP Option": np.where(
+            plans["penalty"][index],
+            np.array([TSP_OPTION_LABELS[o] for o in TSP_CHOICES])[plans["option"][index]],
+            np.array([PENALTY_FREE_LABELS.get(o, TSP_OPTION_LABELS[o]) for o in TSP_CHOICES])[plans["option"][index]]),
+        "Withdrawal Rate": metrics["withdrawal_rate"][index],
+        "Pension Starts At": metrics["pension_start"][index],
+        "Annual TSP Income (After Tax)": metrics["annual_tsp_income"][index],
+        "TSP Lump Sum (After Tax)": metrics["lump_sum"][index],
+        OBJECTIVES["lifetime_income"]: metrics["lifetime_income"][index],
+        OBJECTIVES["min_surplus"]: metrics["min_surplus"][index],
+        OBJECTIVES["end_balance"]: metrics["end_balance"][index],
+        "TSP Runs Out At": metrics["depleted_age"][index],
+        "First Deficit At": metrics["first_deficit_age"][index],
+    }
+    return PlanSearch(top, total, len(plans["age"]), int(feasible.sum()), int(efficient.sum()))
@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+"""
+Versioned plan-year parameters.
+
+Premiums, thresholds and pension factors live in data/plan_years.json,
+keyed by plan year, instead of in code. The file is read and validated
+once per process; updating a year's values, or adding a year, is a data
+change only. Every rule takes a PlanYearParameters (params=None means the
+default year), and RetirementProfile.plan_year selects the year for
+evaluate() and the vectorized paths, so two years can be compared side by
+side.
+
+The Streamlit app loads the registry through st.cache_resource and hands
+it over with use_registry(); headless callers (batch runs, benchmarks)
+load the bundled file on first use.
+"""
+import hashlib
+import json
+import os
+import threading
+from dataclasses import dataclass, fields
+from datetime import date
+from types import MappingProxyType
+from typing import Mapping, NamedTuple
+
+import numpy as np
+
+from .tax import NO_STATE, TaxSchedule, compile_schedule
+
+PARAMETERS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "plan_years.json")
+
+
+class ParameterError(ValueError):
+    """The plan-year parameter file is missing values or has invalid ones."""
+
+
+@dataclass(frozen=True)
+class PlanYearParameters:
+    """Every rule parameter for a single plan year."""
+
+    year: int
+    fehb_costs: Mapping[str, float]  # monthly premium per plan type
+    fegli_costs: Mapping[str, float]  # monthly premium per option
+    earnings_test_threshold: float  # SRS earnings test, annual
+    srs_monthly_base: float  # estimated Social Security at 62 used for the SRS
+    fers_multiplier: float
+    fers_reduction_factor: float
+    csrs_multiplier: float
+    disability_rate_under_62: float
+    disability_rate_62_plus: float
+    tsp_early_withdrawal_penalty: float
+    drp_leave_start: date
+    drp_separation_deadline: date
+    federal_tax: TaxSchedule
+    state_taxes: Mapping[str, TaxSchedule]  # state name -> schedule; "None" for no state income tax
+    notes: str = ""
+
+
+_COST_TABLES = ("fehb_costs", "fegli_costs")
+_DATES = ("drp_leave_start", "drp_separation_deadline")
+_RATES = ("fers_multiplier", "fers_reduction_factor", "csrs_multiplier", "disability_rate_under_62",
+          "disability_rate_62_plus", "tsp_early_withdrawal_penalty")
+_AMOUNTS = ("earnings_test_threshold", "srs_monthly_base")
+_TAXES = ("federal_tax", "state_taxes")
+_REQUIRED = _COST_TABLES + _DATES + _RATES + _AMOUNTS + _TAXES
+
+
+class ParameterArrays(NamedTuple):
+    """Numeric parameters stacked into (N, 1) columns, one row per profile."""
+
+    srs_monthly_base: np.ndarray
+    fers_multiplier: np.ndarray
+    fers_reduction_factor: np.ndarray
+    csrs_multiplier: np.ndarray
+    tsp_early_withdrawal_penalty: np.ndarray
+
+
+@dataclass(frozen=True)
+class PlanYearRegistry:
+    """All plan years from one parameter file."""
+
+    years: Mapping[int, PlanYearParameters]
+    default_year: int
+    version: str  # sha256 of the file contents
+
+    def get(self, year=None) -> PlanYearParameters:
+        year = self.default_year if year is None else int(year)
+        try:
+            return self.years[year]
+        except KeyError:
+            raise KeyError(f"No parameters for plan year {year}; available: {sorted(self.years)}") from None
+
+    def stack(self, years) -> ParameterArrays:
+        """Column arrays of the numeric parameters for a sequence of plan years."""
+        params = [self.get(year) for year in years]
+        return ParameterArrays(*(
+            np.fromiter((getattr(p, name) for p in params), dtype=float, count=len(params))[:, None]
+            for name in ParameterArrays._fields))
+
+
+def _parse_year(year, values):
+    where = f"plan year {year}"
+    if not isinstance(values, dict):
+        raise ParameterError(f"{where}: expected an object")
+    known = {f.name for f in fields(PlanYearParameters)} - {"year"}
+    missing = sorted(set(_REQUIRED) - set(values))
+    unknown = sorted(set(values) - known)
+    if missing:
+        raise ParameterError(f"{where}: missing {', '.join(missing)}")
+    if unknown:
+        raise ParameterError(f"{where}: unknown keys {', '.join(unknown)}")
+
+    parsed = {"year": year, "notes": str(values.get("notes", ""))}
+    for name in _COST_TABLES:
+        table = values[name]
+        if not isinstance(table, dict) or not table:
+            raise ParameterError(f"{where}: {name} must be a non-empty object")
+        for key, cost in table.items():
+            if not isinstance(cost, (int, float)) or isinstance(cost, bool) or cost < 0:
+                raise ParameterError(f"{where}: {name}[{key!r}] must be a non-negative number")
+        parsed[name] = MappingProxyType(dict(table))
+    for name in _RATES + _AMOUNTS:
+        value = values[name]
+        if not isinstance(value, (int, float)) or isinstance(value, bool) or value < 0:
+            raise ParameterError(f"{where}: {name} must be a non-negative number")
+        if name in _RATES and value > 1:
+            raise ParameterError(f"{where}: {name} is a rate and must be between 0 and 1")
+        parsed[name] = float(value)
+    for name in _DATES:
+        try:
+            parsed[name] = date.fromisoformat(values[name])
+        except (TypeError, ValueError):
+            raise ParameterError(f"{where}: {name} must be an ISO date (YYYY-MM-DD)") from None
+    if parsed["drp_leave_start"] > parsed["drp_separation_deadline"]:
+        raise ParameterError(f"{where}: drp_leave_start is after drp_separation_deadline")
+    states = values["state_taxes"]
+    if not isinstance(states, dict) or NO_STATE not in states:
+        raise ParameterError(f"{where}: state_taxes must be an object with a {NO_STATE!r} entry")
+    try:
+        parsed["federal_tax"] = compile_schedule(values["federal_tax"])
+    except ValueError as exc:
+        raise ParameterError(f"{where}: federal_tax: {exc}") from None
+    schedules = {}
+    for state, table in states.items():
+        try:
+            schedules[state] = compile_schedule(table)
+        except ValueError as exc:
+            raise ParameterError(f"{where}: state_taxes[{state!r}]: {exc}") from None
+    parsed["state_taxes"] = MappingProxyType(schedules)
+    return PlanYearParameters(**parsed)
+
+
+def load_registry(path=PARAMETERS_PATH) -> PlanYearRegistry:
+    """
+    Read and validate a plan-year parameter file.
+
+    :raises ParameterError: If the file is malformed or a value is invalid.
+    """
+    with open(path, "rb") as handle:
+        raw = handle.read()
+    try:
+        data = json.loads(raw)
+    except ValueError as exc:
+        raise ParameterError(f"{path}: not valid JSON ({exc})") from None
+
+    if not isinstance(data, dict) or not isinstance(data.get("years"), dict) or not data["years"]:
+        raise ParameterError(f"{path}: expected a non-empty 'years' object")
+    years = {}
+    for key, values in data["years"].items():
+        try:
+            year = int(key)
+        except ValueError:
+            raise ParameterError(f"{path}: plan year {key!r} is not a number") from None
+        years[year] = _parse_year(year, values)
+
+    plans = {tuple(p.fehb_costs) for p in years.values()}
+    options = {tuple(p.fegli_costs) for p in years.values()}
+    states = {tuple(p.state_taxes) for p in years.values()}
+    if len(plans) > 1 or len(options) > 1 or len(states) > 1:
+        raise ParameterError(
+            f"{path}: every plan year must list the same FEHB plans, FEGLI options and state tax tables")
+
+    default_year = data.get("default_year", max(years))
+    if default_year not in years:
+        raise ParameterError(f"{path}: default_year {default_year} has no parameters")
+    return PlanYearRegistry(MappingProxyType(years), default_year, hashlib.sha256(raw).hexdigest())
+
+
+# --- Process-wide registry ---
+_lock = threading.Lock()
+_registry = None
+
+
+def registry() -> PlanYearRegistry:
+    """The active registry, loading the bundled file on first use."""
+    global _registry
+    if _registry is None:
+        with _lock:
+            if _registry is None:
+                _registry = load_registry()
+    return _registry
+
+
+def use_registry(new_registry: PlanYearRegistry):
+    """
+    Make a registry the active one for every calculation in this process.
+
+    Cached results computed with other parameters (the PDF report) are
+    dropped when the registry actually changes.
+    """
+    global _registry
+    with _lock:
+        if _registry is not None and _registry.version == new_registry.version:
+            return _registry
+        changed = _registry is not None
+        _registry = new_registry
+    if changed:
+        from .report import build_pdf_report
+
+        build_pdf_report.cache_clear()
+    return new_registry
+
+
+def parameters(year=None) -> PlanYearParameters:
+    """Parameters for a plan year (None for the default year)."""
+    return registry().get(year)
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+TSP early-withdrawal penalty rules compiled into a lookup table.
+
+calculate_tsp_penalty_status() in rules.py is an if/elif chain that only
+compares age against 50, 55, 60 and 62 and service against 5, 20, 25 and
+30. Inside each (whole age, service bucket, VERA, public safety) cell the
+answer is therefore constant, so the chain is evaluated once per cell at
+import time and every later query, scalar or array, is an index into the
+table. Answers come back as reason codes; REASONS maps a code to the same
+text the rule function returns.
+
+The table pays off for arrays of queries (the age comparison, optimizer
+and batch runs); a single scalar query is already cheap through the rule
+function itself. Run ``python -m fers_engine.checks`` to compare the table
+with the rule function over the whole input domain.
+"""
+import numpy as np
+
+from .rules import calculate_tsp_penalty_status
+
+# Ages at or above MAX_AGE answer like MAX_AGE; every rule threshold is below it.
+MAX_AGE = 120
+# Service thresholds used by the rules; bucket i covers [SERVICE_BREAKS[i-1], SERVICE_BREAKS[i]).
+SERVICE_BREAKS = (5, 20, 25, 30)
+SERVICE_BUCKET_FLOORS = (0,) + SERVICE_BREAKS
+
+
+def _compile():
+    reasons = []
+    codes = np.empty((MAX_AGE + 1, len(SERVICE_BUCKET_FLOORS), 2, 2), dtype=np.uint8)
+    penalties = {}
+    for age in range(MAX_AGE + 1):
+        for bucket, service in enumerate(SERVICE_BUCKET_FLOORS):
+            for vera in (False, True):
+                for public_safety in (False, True):
+                    penalty, reason = calculate_tsp_penalty_status(age, service, vera, public_safety)
+                    if reason not in penalties:
+                        penalties[reason] = penalty
+                        reasons.append(reason)
+                    codes[age, bucket, int(vera), int(public_safety)] = reasons.index(reason)
+    return codes, tuple(reasons), np.array([penalties[r] for r in reasons], dtype=bool)
+
+
+PENALTY_CODES, REASONS, PENALTY_BY_CODE = _compile()
+_REASON_ARRAY = np.array(REASONS, dtype=object)
+
+
+def service_bucket(years_service):
+    """Index of the service bucket for each value."""
+    return np.searchsorted(SERVICE_BREAKS, years_service, side="right")
+
+
+def penalty_codes(age, years_service, vera_elected=False, public_safety_employee=False):
+    """
+    Reason codes for any broadcastable arrays of queries.
+
+    :return: uint8 array of indexes into REASONS / PENALTY_BY_CODE.
+    :raises ValueError: If an age or years of service is NaN; no cell of the
+        table answers for it.
+    """
+    age = np.asarray(age, dtype=float)
+    years_service = np.asarray(years_service, dtype=float)
+    if np.isnan(age).any() or np.isnan(years_service).any():
+        raise ValueError("TSP penalty lookup needs a number for every age and years of service, got NaN")
+    age_index = np.clip(np.floor(age), 0, MAX_AGE).astype(np.intp)
+    return PENALTY_CODES[
+        age_index,
+        service_bucket(years_service),
+        np.asarray(vera_elected, dtype=bool).astype(np.intp),
+        np.asarray(public_safety_employee, dtype=bool).astype(np.intp),
+    ]
+
+
+def penalty_lookup(age, years_service, vera_elected=False, public_safety_employee=False):
+    """
+    Vectorized calculate_tsp_penalty_status.
+
+    :return: Tuple of (penalty flags, reason codes) arrays.
+    """
+    codes = penalty_codes(age, years_service, vera_elected, public_safety_employee)
+    return PENALTY_BY_CODE[codes], codes
+
+
+def reason_text(codes):
+    """Reason strings for an array of codes."""
+    return _REASON_ARRAY[codes]
+
+
+def check_equivalence(ages=None, services=None):
+    """
+    Compare the table with calculate_tsp_penalty_status over a query grid.
+
+    The default grid covers ages 0-130 and service 0-60 in half-year steps
+    with every VERA / public safety combination, which includes both sides
+    of every threshold.
+
+    :return: Tuple of (number of queries, list of (age, service, vera,
+        public_safety) queries that differ).
+    """
+    ages = np.arange(0, 130.5, 0.5) if ages is None else np.asarray(ages, dtype=float)
+    services = np.arange(0, 60.5, 0.5) if services is None else np.asarray(services, dtype=float)
+    age, service, vera, public_safety = np.meshgrid(ages, services, [False, True], [False, True], indexing="ij")
+    penalty, codes = penalty_lookup(age, service, vera, public_safety)
+    reasons = reason_text(codes)
+
+    mismatches = []
+    for query in zip(age.ravel().tolist(), service.ravel().tolist(), vera.ravel().tolist(),
+                     public_safety.ravel().tolist(), penalty.ravel().tolist(), reasons.ravel().tolist()):
+        expected = calculate_tsp_penalty_status(*query[:4])
+        if expected != (query[4], query[5]):
+            mismatches.append(query[:4])
+    return age.size, mismatches
+
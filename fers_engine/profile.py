@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+Typed inputs and outputs for the retirement calculation engine.
+
+A RetirementProfile holds everything the Streamlit widgets collect; a
+RetirementResult holds everything the app displays, exports or prints
+into the PDF report. Both are frozen so they can be hashed and cached.
+"""
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+# --- TSP withdrawal options ---
+TSP_WITHDRAW_NOW = "withdraw_now"
+TSP_DELAY = "delay"
+TSP_SEPP = "sepp"
+TSP_OPTIONS = (TSP_WITHDRAW_NOW, TSP_DELAY, TSP_SEPP)
+TSP_OPTION_LABELS = {
+    TSP_WITHDRAW_NOW: "Withdraw now (penalty applies if under 59½)",
+    TSP_DELAY: "Delay withdrawal until 59½ (No withdrawal now)",
+    TSP_SEPP: "Set up SEPP plan",
+}
+
+# --- SEPP (72(t)) payment methods ---
+SEPP_RMD = "rmd"
+SEPP_AMORTIZATION = "amortization"
+SEPP_ANNUITIZATION = "annuitization"
+SEPP_METHODS = (SEPP_RMD, SEPP_AMORTIZATION, SEPP_ANNUITIZATION)
+SEPP_METHOD_LABELS = {
+    SEPP_RMD: "Required minimum distribution",
+    SEPP_AMORTIZATION: "Fixed amortization",
+    SEPP_ANNUITIZATION: "Fixed annuitization",
+}
+
+
+@dataclass(frozen=True)
+class RetirementProfile:
+    """Everything a single employee enters into the app."""
+
+    current_age: int = 18
+    years_service: float = 0
+    high3_salary: float = 0
+    tsp_balance: float = 0
+    tsp_contribution_pct: float = 5
+    retirement_eligible: bool = True
+
+    # --- TSP withdrawal ---
+    tsp_option: str = TSP_WITHDRAW_NOW
+    public_safety_employee: bool = False
+    vera_elected: bool = False
+    tax_rate: Optional[float] = None  # flat rate on TSP distributions; None to use the tax tables
+    withdrawal_rate: float = 0.04  # decimal, e.g. 0.04 for 4%
+    sepp_method: str = SEPP_AMORTIZATION
+    sepp_rate: float = 0.05  # decimal interest rate for the SEPP calculation
+    sepp_beneficiary_age: Optional[int] = None  # joint life table when set
+
+    # --- Health / life insurance ---
+    health_coverage: str = "None"  # "None", "FEHB" or "CHAMPVA"
+    fehb_plan: str = "Self Only"
+    tricare: bool = False
+    fegli_option: str = "None"
+
+    # --- Expenses ---
+    monthly_expenses: float = 3000
+    debt_payments: float = 0
+    healthcare_expenses: float = 0
+    additional_taxes: float = 0  # annual property, local or other taxes not computed from income
+
+    # --- Income tax (tax.py) ---
+    filing_status: str = "single"  # "single" or "married_joint"
+    state: str = "None"  # a state_taxes table from the plan year; "None" for no state income tax
+
+    # --- Benefits & separation incentives ---
+    va_monthly: float = 0
+    military_retirement_pay: float = 0  # annual, only once payments have started
+    disability_retirement: bool = False
+    vsip_amount: float = 0
+    drp_elected: bool = False
+    drp_leave_months: int = 4
+    system_type: str = "FERS"  # "FERS" or "CSRS"
+    plan_year: Optional[int] = None  # rules from parameters.py; None for the default year
+
+    # --- Contractor toolkit ---
+    contractor_role: str = "Federal Compliance Consultant"
+    hourly_rate: float = 120
+    hours_per_week: float = 25
+    weekly_overhead: float = 200
+    apply_srs_earnings_test: bool = False
+
+    # --- Career vs. retirement wage ---
+    current_grade: int = 10
+    current_step: int = 5
+    local_wage: float = 60000
+    retirement_wage_multiplier: float = 1.0
+
+
+@dataclass(frozen=True)
+class TspWithdrawal:
+    """Outcome of the TSP withdrawal option for the current age."""
+
+    penalty_applies: bool
+    penalty_charged: bool
+    note: str
+    balance: float
+    annual_income: float
+    sepp_payment: float = 0.0  # annual SEPP payment before tax, when a SEPP plan applies
+    tax: float = 0.0  # income tax on the distribution taken now (lump sum or first year)
+    tax_rate: float = 0.0  # effective income tax rate on the distribution
+
+
+@dataclass(frozen=True)
+class ContractorResult:
+    """Contractor income and its effect on the SRS earnings test."""
+
+    annual_gross: float
+    annual_overhead: float
+    net_income: float
+    srs_offset: float
+    adjusted_srs: float
+    adjusted_retirement_income: float
+    adjusted_net_cash: float
+
+
+@dataclass(frozen=True)
+class RetirementResult:
+    """Everything the app derives from a RetirementProfile."""
+
+    tsp: TspWithdrawal
+    fehb_premium: float
+    fegli_premium: float
+    srs: float
+    srs_annual: float
+    total_admin_leave_income: float
+    fers_regular: float
+    fers_disability: float
+    monthly_regular: float
+    monthly_disability: float
+    selected_fers_income: float
+    selected_monthly_income: float
+    pension_label: str
+    income_items: Tuple[Tuple[str, float], ...]
+    total_preretirement_income: float
+    base_expenses: float
+    total_expenses: float
+    net_cash: float
+    contractor: ContractorResult
+    estimated_retirement_wage: float
+    projected_career_wage: float
+    federal_tax: float = 0.0  # annual income tax on the income items (TSP tax is netted in tsp)
+    state_tax: float = 0.0
+    income_tax: float = 0.0  # federal_tax + state_tax, included in total_expenses
+    marginal_tax_rate: float = 0.0  # federal + state, on the next dollar of retirement income
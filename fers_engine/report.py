@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""
+PDF retirement report.
+
+The report is a pure function of the profile, so it is built only when
+someone asks for it and kept in a small in-memory LRU keyed by the
+profile's hash; downloading an unchanged scenario again costs nothing.
+reportlab is imported on first use so the engine stays importable without it.
+"""
+import io
+from functools import lru_cache
+
+from .calculator import evaluate
+from .profile import TSP_OPTION_LABELS, RetirementProfile
+from .tax import FILING_STATUS_LABELS
+
+REPORT_CACHE_SIZE = 32
+
+
+@lru_cache(maxsize=REPORT_CACHE_SIZE)
+def build_pdf_report(profile: RetirementProfile) -> bytes:
+    """Render the personalized retirement report for a profile as PDF bytes."""
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
+    result = evaluate(profile)
+
+    buffer = io.BytesIO()
+    p = canvas.Canvas(buffer, pagesize=letter)
+    p.setFont("Helvetica-Bold", 16)
+    p.drawString(50, 750, "Retirement Summary Report")
+    p.line(50, 747, 550, 747)
+    p.setFont("Helvetica", 12)
+    y = 720
+    user_info = [
+        f"Current Age: {profile.current_age}",
+        f"Years of Federal Service: {profile.years_service}",
+        f"High-3 Salary: ${profile.high3_salary:,.2f}",
+        f"TSP Balance: ${profile.tsp_balance:,.2f}",
+        f"TSP Contribution Rate: {profile.tsp_contribution_pct}%",
+        f"FEHB Plan: {profile.health_coverage} (${result.fehb_premium}/mo)",
+        f"FEGLI Option: {profile.fegli_option} (${result.fegli_premium}/mo)",
+        f"Living Expenses: ${profile.monthly_expenses:,.2f}/mo",
+        f"VA Disability: ${profile.va_monthly}/mo",
+        f"Pension Type: {result.pension_label}",
+        f"Tax Filing Status: {FILING_STATUS_LABELS[profile.filing_status]} (State: {profile.state})",
+    ]
+    for item in user_info:
+        p.drawString(50, y, item)
+        y -= 20
+    y -= 10
+    p.setFont("Helvetica-Bold", 12)
+    p.drawString(50, y, "TSP Withdrawal Details:")
+    p.setFont("Helvetica", 12)
+    y -= 20
+    tsp_details = [
+        f"TSP Withdrawal Option: {TSP_OPTION_LABELS[profile.tsp_option]}",
+        f"Penalty Note: {result.tsp.note}",
+        f"Accessible TSP Balance: ${result.tsp.balance:,.2f}",
+        f"Estimated Annual TSP Income: ${result.tsp.annual_income:,.2f}",
+        f"Estimated Income Tax on Distributions: {result.tsp.tax_rate:.1%}",
+    ]
+    for detail in tsp_details:
+        p.drawString(50, y, detail)
+        y -= 20
+    y -= 10
+    p.setFont("Helvetica-Bold", 12)
+    p.drawString(50, y, "Income Summary:")
+    p.setFont("Helvetica", 12)
+    y -= 20
+    if profile.vsip_amount > 0:
+        p.drawString(50, y, f"- VSIP Lump Sum: ${profile.vsip_amount:,.2f}")
+        y -= 20
+    p.drawString(50, y, f"- FERS Pension: ${result.selected_fers_income:,.2f}")
+    y -= 20
+    if not profile.disability_retirement and result.srs_annual > 0:
+        p.drawString(
+            50, y, f"- SRS (Special Retirement Supplement): ${result.srs_annual:,.2f}")
+        y -= 20
+    if profile.va_monthly > 0:
+        p.drawString(50, y, f"- Annual VA Disability: ${profile.va_monthly * 12:,.2f}")
+        y -= 30
+    if profile.military_retirement_pay > 0:
+        p.drawString(50, y, f"- Military Retirement Pay: ${profile.military_retirement_pay:,.2f}")
+        y -= 20
+    p.setFont("Helvetica-Bold", 12)
+    p.drawString(
+        50, y, f"📊 Total Pre-Retirement Income: ${result.total_preretirement_income:,.2f}")
+    y -= 20
+    p.drawString(
+        50, y, f"🧾 Income Tax: ${result.income_tax:,.2f} "
+               f"(Federal ${result.federal_tax:,.2f}, State ${result.state_tax:,.2f})")
+    y -= 20
+    p.drawString(50, y, f"🧾 Annual Expenses: ${result.base_expenses:,.2f}")
+    y -= 20
+    p.drawString(50, y, f"💰 Net Cash Flow: ${result.net_cash:,.2f}")
+    y -= 30
+    if y < 300:  # the contractor and wage sections need about 300 points
+        p.showPage()
+        y = 750
+    p.setFont("Helvetica-Bold", 12)
+    p.drawString(50, y, "Contractor Income Analysis")
+    y -= 20
+    p.setFont("Helvetica", 12)
+    if profile.contractor_role:
+        contractor = result.contractor
+        p.drawString(50, y, f"Role: {profile.contractor_role}")
+        y -= 20
+        p.drawString(50, y, f"Gross Income: ${contractor.annual_gross:,.2f}")
+        y -= 20
+        p.drawString(50, y, f"Overhead: ${contractor.annual_overhead:,.2f}")
+        y -= 20
+        p.drawString(50, y, f"Contractor Net Income: ${contractor.net_income:,.2f}")
+        y -= 20
+        p.drawString(
+            50, y, f"SRS Reduction from Contractor Income: ${contractor.srs_offset:,.2f}")
+        y -= 20
+        p.drawString(50, y, f"Adjusted SRS: ${contractor.adjusted_srs:,.2f}")
+        y -= 20
+        p.drawString(
+            50, y, f"Adj. Retirement Net Cash Flow: ${contractor.adjusted_net_cash:,.2f}")
+        y -= 30
+    else:
+        p.drawString(50, y, "No Contractor Data Available")
+        y -= 20
+
+    # --- Career vs. Retirement Wage Analysis ---
+    p.setFont("Helvetica-Bold", 12)
+    p.drawString(50, y, "Career vs. Retirement Wage Analysis")
+    y -= 20
+    p.setFont("Helvetica", 12)
+    p.drawString(
+        50, y, f"Estimated Retirement Wage: ${result.estimated_retirement_wage:,.2f}")
+    y -= 20
+    p.drawString(
+        50, y, f"Projected Continued Career Wage: ${result.projected_career_wage:,.2f}")
+    y -= 20
+    difference = result.projected_career_wage - result.estimated_retirement_wage
+    p.drawString(50, y, f"Difference: ${difference:,.2f}")
+    y -= 30
+
+    # --- Pro/Con Analysis for Retirement Scenarios ---
+    p.setFont("Helvetica-Bold", 12)
+    p.drawString(50, y, "Pro/Con Analysis for Retirement Scenarios")
+    y -= 20
+    p.setFont("Helvetica", 12)
+    # For brevity, we print a summary note.
+    p.drawString(
+        50,
+        y,
+        "Review the app's interactive table for detailed pros and cons based on your priorities.")
+
+    p.save()
+    return buffer.getvalue()
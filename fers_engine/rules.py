@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""
+FERS / CSRS benefit rules as plain functions.
+
+Nothing in here touches Streamlit; every value the rules need is passed in.
+Premiums, thresholds and pension factors come from a PlanYearParameters
+(see parameters.py); params=None uses the default plan year.
+"""
+from .parameters import parameters
+from .profile import SEPP_AMORTIZATION, SEPP_METHOD_LABELS, SEPP_RMD, TSP_SEPP, TSP_WITHDRAW_NOW, TspWithdrawal
+from .sepp import SEPP_RATE, sepp_payment, sepp_years
+
+
+def calculate_tsp_penalty_status(
+        age,
+        years_service,
+        vera_elected,
+        public_safety_employee):
+    if public_safety_employee and age >= 50:
+        return False, "No penalty – Public safety employee separated at or after age 50."
+
+    if age >= 62 and years_service >= 5:
+        return False, "No penalty – Age 62 or older at separation."
+    elif age >= 60 and years_service >= 20:
+        return False, "No penalty – Age 60+ with 20+ years of service."
+    elif age >= 55:
+        if vera_elected or years_service >= 30:
+            return False, "No penalty – Age 55 Rule applies (VERA or 30+ years)."
+        else:
+            return False, "No penalty – Age 55 Rule applies."
+    elif age >= 50 and vera_elected and years_service >= 25:
+        return True, "10% penalty – VERA retirement under age 55."
+    else:
+        return True, "10% penalty – Not retirement eligible under TSP rules."
+
+
+def tsp_withdrawal(
+        current_age,
+        tsp_balance,
+        tsp_option,
+        years_service,
+        vera_elected,
+        public_safety_employee,
+        tax_rate,
+        withdrawal_rate,
+        params=None,
+        sepp_method=SEPP_AMORTIZATION,
+        sepp_rate=SEPP_RATE,
+        sepp_beneficiary_age=None,
+        tax_on=None) -> TspWithdrawal:
+    """
+    Apply the selected TSP withdrawal option at the current age.
+
+    Under a SEPP plan the annual income is the 72(t) payment for
+    sepp_method (see sepp.py) after tax, instead of withdrawal_rate. The
+    income tax is charged on what is distributed now: the lump sum, the
+    SEPP payment or, from 59½, the first year's withdrawal; the 10%
+    penalty is charged on top of it.
+
+    :param tax_rate: Flat tax rate on distributions as a decimal; used when tax_on is None.
+    :param withdrawal_rate: Annual withdrawal rate as a decimal.
+    :param sepp_rate: SEPP interest rate as a decimal.
+    :param sepp_beneficiary_age: Use the joint life table with this beneficiary; None for single life.
+    :param tax_on: Function of a distribution amount returning the income tax it adds
+        (e.g. tax.distribution_tax over the other retirement income).
+    """
+    params = params or parameters()
+    if tax_on is None:
+        def tax_on(amount):
+            return amount * tax_rate
+    penalty_applies, penalty_note = calculate_tsp_penalty_status(
+        current_age, years_service, vera_elected, public_safety_employee
+    )
+    penalty_charged = False
+    annual_income = None
+    sepp_annual = 0.0
+
+    if current_age < 59.5 and tsp_option == TSP_WITHDRAW_NOW:
+        distribution = tsp_balance
+    elif current_age < 59.5 and tsp_option == TSP_SEPP:
+        sepp_annual = sepp_payment(tsp_balance, current_age, sepp_method, sepp_rate, sepp_beneficiary_age)
+        distribution = sepp_annual
+    else:
+        distribution = tsp_balance * withdrawal_rate
+    tax = float(tax_on(distribution)) if distribution > 0 else 0.0
+    rate = tax / distribution if distribution > 0 else 0.0
+
+    if current_age < 59.5:
+        if tsp_option == TSP_WITHDRAW_NOW:
+            if penalty_applies:
+                tsp_withdrawal_balance = tsp_balance * (1 - params.tsp_early_withdrawal_penalty) - tax
+                penalty_note += " This scenario includes the 10% early withdrawal penalty."
+                penalty_charged = True
+            else:
+                tsp_withdrawal_balance = tsp_balance - tax
+                penalty_note = "No penalty applies, only taxes withheld."
+        elif tsp_option == TSP_SEPP:
+            tsp_withdrawal_balance = tsp_balance * (1 - rate)
+            annual_income = sepp_annual - tax
+            rate_note = "" if sepp_method == SEPP_RMD else f" at {sepp_rate:.2%}"
+            penalty_note = (
+                f"No penalty via SEPP plan: {SEPP_METHOD_LABELS[sepp_method].lower()}{rate_note} pays "
+                f"${sepp_annual:,.2f} in the first year, for at least {sepp_years(current_age)} years; "
+                f"an estimated {rate * 100:.0f}% income tax is withheld.")
+        else:
+            tsp_withdrawal_balance = 0
+            tax = 0.0  # nothing is distributed until 59½; rate estimates the tax then
+            penalty_note = "No withdrawal now. Funds remain untouched until 59½."
+    else:
+        tsp_withdrawal_balance = tsp_balance * (1 - rate)
+        penalty_note = (
+            f"Withdrawal is penalty-free; an estimated "
+            f"{rate * 100:.0f}% income tax is applied on distributions.")
+
+    return TspWithdrawal(
+        penalty_applies=penalty_applies,
+        penalty_charged=penalty_charged,
+        note=penalty_note,
+        balance=tsp_withdrawal_balance,
+        annual_income=tsp_withdrawal_balance * withdrawal_rate if annual_income is None else annual_income,
+        sepp_payment=sepp_annual,
+        tax=tax,
+        tax_rate=rate,
+    )
+
+
+def health_premiums(health_coverage, fehb_plan, fegli_option, tricare=False, params=None):
+    """Return the monthly (FEHB, FEGLI) premiums for the selected coverage."""
+    params = params or parameters()
+    if tricare or health_coverage != "FEHB":
+        fehb_premium = 0  # TRICARE / CHAMPVA / None: no FEHB premium
+    else:
+        fehb_premium = params.fehb_costs[fehb_plan]
+    return fehb_premium, params.fegli_costs[fegli_option]
+
+
+def special_retirement_supplement(current_age, years_service, params=None):
+    """Annual FERS Special Retirement Supplement (stops at 62)."""
+    if current_age < 62 and years_service >= 20:
+        params = params or parameters()
+        return (years_service / 40) * (params.srs_monthly_base * 12)
+    return 0
+
+
+def fers_pensions(high3_salary, years_service, current_age, retirement_eligible=True, params=None):
+    """Return the annual (regular, disability) FERS pensions."""
+    if not retirement_eligible:
+        return 0, 0
+    params = params or parameters()
+    fers_regular = high3_salary * params.fers_multiplier * years_service * params.fers_reduction_factor
+    fers_disability = high3_salary * (
+        params.disability_rate_under_62 if current_age < 62 else params.disability_rate_62_plus)
+    return fers_regular, fers_disability
+
+
+def fers_cola(cpi):
+    """
+    FERS "diet" COLA for a given CPI increase (both as decimals).
+
+    CPI up to 2% is passed through, 2-3% is capped at 2%, and above 3% the
+    COLA is CPI minus one point.
+    """
+    if cpi <= 0.02:
+        return cpi
+    if cpi <= 0.03:
+        return 0.02
+    return cpi - 0.01
+
+
+def csrs_pension(high3_salary, years_service, params=None):
+    """Annual CSRS pension (simplified: a flat multiplier per year of service)."""
+    params = params or parameters()
+    return high3_salary * params.csrs_multiplier * years_service
+
+
+def admin_leave_income(high3_salary, drp_elected, months_of_leave):
+    """Paid administrative leave received under DRP before separation."""
+    if not drp_elected:
+        return 0
+    return months_of_leave * (high3_salary / 12)
+
+
+def career_wages(local_wage, retirement_wage_multiplier, current_grade, current_step):
+    """
+    Hypothetical post-retirement wage vs. continued career wage.
+
+    :return: Tuple of (estimated_retirement_wage, projected_career_wage).
+    """
+    estimated_retirement_wage = local_wage * retirement_wage_multiplier
+    projected_career_wage = local_wage + \
+        (current_grade * current_step * 1000)  # Example formula
+    return estimated_retirement_wage, projected_career_wage
+
+
+def contractor_income(hourly_rate, hours_per_week, weekly_overhead):
+    """
+    Annual contractor income components.
+
+    :return: Tuple of (annual_gross, annual_overhead, net_income).
+    """
+    annual_gross = hourly_rate * hours_per_week * 52
+    annual_overhead = weekly_overhead * 52
+    return annual_gross, annual_overhead, annual_gross - annual_overhead
+
+
+def srs_earnings_test(srs_annual, contractor_net_income, apply_test=True, params=None):
+    """
+    Reduce the SRS by $1 for every $2 of earnings over the threshold.
+
+    :return: Tuple of (srs_offset, adjusted_srs).
+    """
+    srs_offset = 0
+    adjusted_srs = srs_annual  # Start with no offset.
+    if apply_test and srs_annual > 0:
+        threshold = (params or parameters()).earnings_test_threshold
+        if contractor_net_income > threshold:
+            over_threshold = contractor_net_income - threshold
+            # For every $2 over the threshold, reduce SRS by $1.
+            srs_offset = over_threshold / 2
+        adjusted_srs = max(0, srs_annual - srs_offset)
+    return srs_offset, adjusted_srs
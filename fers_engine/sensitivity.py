@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+Vectorized sensitivity grid for the simplified net cash flow model.
+
+sensitivity_net_cash() in calculator.py traces one line: net cash for each
+number of service years at a single pension multiplier and expense factor.
+sensitivity_grid() evaluates the same formula over every combination of
+High-3 salary, pension multiplier, expense factor and service years in a
+single broadcast, so the whole decision surface is available at once.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+from .parameters import parameters
+from .profile import RetirementProfile
+from .rules import health_premiums
+
+# --- Default grid axes ---
+DEFAULT_YEARS = np.arange(0, 51)
+DEFAULT_MULTIPLIERS = np.round(np.linspace(0.005, 0.02, 31), 4)
+DEFAULT_EXPENSE_FACTORS = np.round(np.linspace(0.8, 1.25, 10), 3)
+
+
+@dataclass(frozen=True)
+class SensitivityGrid:
+    """Net cash flow over High-3 x multiplier x expense factor x service years."""
+
+    high3_salaries: np.ndarray
+    pension_multipliers: np.ndarray
+    expense_factors: np.ndarray
+    years_service: np.ndarray
+    net_cash: np.ndarray  # (high3, multipliers, expense factors, years)
+
+    def surface(self, high3_index=0, factor_index=0):
+        """(multipliers, years) slice for one High-3 salary and expense factor."""
+        return self.net_cash[high3_index, :, factor_index, :]
+
+    def to_columns(self):
+        """Flatten the grid into one row per combination, ready for pd.DataFrame."""
+        high3, multiplier, factor, years = np.meshgrid(
+            self.high3_salaries, self.pension_multipliers, self.expense_factors,
+            self.years_service, indexing="ij")
+        return {
+            "High-3 Salary": high3.ravel(),
+            "Pension Multiplier": multiplier.ravel(),
+            "Expense Factor": factor.ravel(),
+            "Years of Service": years.ravel(),
+            "Net Cash Flow": self.net_cash.ravel(),
+        }
+
+
+def sensitivity_grid(
+        profile: RetirementProfile,
+        years_range=DEFAULT_YEARS,
+        pension_multipliers=DEFAULT_MULTIPLIERS,
+        expense_factors=DEFAULT_EXPENSE_FACTORS,
+        high3_salaries=None):
+    """
+    Vectorized sensitivity_net_cash over every combination of its inputs.
+
+    :param years_range: Service years to evaluate.
+    :param pension_multipliers: Pension multipliers to evaluate.
+    :param expense_factors: Factors applied to annual base expenses.
+    :param high3_salaries: High-3 salaries to evaluate; defaults to the profile's.
+    :return: SensitivityGrid with a (high3, multipliers, factors, years) net cash array.
+    """
+    params = parameters(profile.plan_year)
+    fehb_premium, fegli_premium = health_premiums(
+        profile.health_coverage, profile.fehb_plan, profile.fegli_option, profile.tricare, params
+    )
+    base_expenses = (fegli_premium + fehb_premium + profile.monthly_expenses) * 12
+
+    if high3_salaries is None:
+        high3_salaries = [profile.high3_salary]
+    high3 = np.asarray(high3_salaries, dtype=float)
+    multipliers = np.asarray(pension_multipliers, dtype=float)
+    factors = np.asarray(expense_factors, dtype=float)
+    years = np.asarray(years_range, dtype=float)
+
+    # The reduction factor of the simplified pension stays constant.
+    pension = (high3[:, None, None, None] * multipliers[None, :, None, None]
+               * years[None, None, None, :] * params.fers_reduction_factor)
+    total_exp = base_expenses * factors[None, None, :, None]
+    net_cash = profile.vsip_amount + pension - total_exp
+
+    return SensitivityGrid(high3, multipliers, factors, years, net_cash)
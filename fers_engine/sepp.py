@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+"""
+Substantially equal periodic payments (IRS 72(t), Notice 2022-6).
+
+A SEPP plan avoids the 10% early-withdrawal penalty before 59½ as long as
+the annual payment follows one of three methods and continues for 5 years
+or until 59½, whichever is later:
+
+- required minimum distribution: each year's balance divided by the life
+  expectancy at that year's age (the payment changes every year),
+- fixed amortization: the balance amortized in level payments over the
+  life expectancy at the chosen interest rate,
+- fixed annuitization: the balance divided by a life annuity factor at the
+  chosen interest rate.
+
+data/life_expectancy.json bundles the IRS Single Life Table, a joint and
+last survivor table for a plan with a beneficiary (looked up by both ages),
+the IRS Uniform Lifetime Table and the mortality rates behind them; they
+are read once per process into arrays indexed by age. The annuity factors
+come from the same mortality rates, so every method shares one basis.
+check_life_tables() confirms the tables agree with each other and with
+every published Uniform Lifetime entry. Every function takes arrays of ages,
+interest rates and beneficiary ages that broadcast together, so the three
+methods over a grid of ages and rates are a single call.
+"""
+import hashlib
+import json
+import math
+import os
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+
+from .parameters import ParameterError
+from .profile import SEPP_AMORTIZATION, SEPP_ANNUITIZATION, SEPP_METHOD_LABELS, SEPP_METHODS, SEPP_RMD
+
+LIFE_TABLES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "life_expectancy.json")
+MAX_AGE = 120  # the last table entry covers this age and older
+SEPP_END_AGE = 59.5
+SEPP_MIN_YEARS = 5
+# Notice 2022-6 allows any rate up to the greater of 5% and 120% of the federal mid-term rate.
+SEPP_RATE = 0.05
+
+
+@dataclass(frozen=True)
+class LifeTables:
+    """Life expectancy tables and the survival curve behind them, indexed by age."""
+
+    single: np.ndarray  # (MAX_AGE + 1,) single life expectancy in years
+    joint: np.ndarray  # (MAX_AGE + 1, MAX_AGE + 1) joint and last survivor expectancy, [owner, beneficiary]
+    uniform: np.ndarray  # (MAX_AGE + 1,) Uniform Lifetime Table; nan below its first age
+    survival: np.ndarray  # (MAX_AGE + 2,) l(x) with l(0) = 1 and l(MAX_AGE + 1) = 0
+    version: str
+
+    def life_expectancy(self, ages, beneficiary_ages=None):
+        """Single (or, with beneficiary ages, joint and last survivor) life expectancy."""
+        if beneficiary_ages is None:
+            return self.single[_age_index(ages)]
+        return self.joint[_age_index(ages), _age_index(beneficiary_ages)]
+
+    def survival_paths(self, ages, beneficiary_ages=None):
+        """
+        Probability that the owner (or either of owner and beneficiary) is alive k years on.
+
+        :return: Array of shape ages.shape + (MAX_AGE + 1,) for k = 1 .. MAX_AGE + 1.
+        """
+        owner = _paths(self.survival, _age_index(ages))
+        if beneficiary_ages is None:
+            return owner
+        beneficiary = _paths(self.survival, _age_index(beneficiary_ages))
+        return owner + beneficiary - owner * beneficiary
+
+    def annuity_factors(self, ages, rates, beneficiary_ages=None):
+        """Present value of 1 a year, paid at each year end for life, at each interest rate."""
+        if beneficiary_ages is None:
+            ages, rates = np.broadcast_arrays(ages, rates)
+            paths = self.survival_paths(ages)
+        else:
+            ages, rates, beneficiary_ages = np.broadcast_arrays(ages, rates, beneficiary_ages)
+            paths = self.survival_paths(ages, beneficiary_ages)
+        k = np.arange(1, MAX_AGE + 2)
+        discount = (1 + np.asarray(rates, dtype=float)[..., None]) ** -k
+        return (paths * discount).sum(axis=-1)
+
+
+def _age_index(ages):
+    return np.clip(np.floor(np.asarray(ages, dtype=float)), 0, MAX_AGE).astype(np.intp)
+
+
+def _paths(survival, index):
+    k = np.arange(1, MAX_AGE + 2)
+    return survival[np.minimum(index[..., None] + k, MAX_AGE + 1)] / survival[index][..., None]
+
+
+def _table(path, data, name, shape, min_age=0):
+    try:
+        table = data[name]
+        values = np.asarray(table["values"], dtype=float)
+        first = int(table.get("min_age", 0))
+    except (ValueError, KeyError, TypeError) as exc:
+        raise ParameterError(f"{path}: expected a {name!r} table with numeric 'values' ({exc})") from None
+    if first != min_age or values.shape != shape:
+        raise ParameterError(f"{path}: {name} must list ages {min_age} through {MAX_AGE}")
+    if not np.all(np.isfinite(values)):
+        raise ParameterError(f"{path}: {name} must hold finite numbers")
+    return values
+
+
+def load_life_tables(path=LIFE_TABLES_PATH) -> LifeTables:
+    """
+    Read the bundled life expectancy tables and mortality rates.
+
+    :raises ParameterError: If the file is malformed or a table does not cover every age.
+    """
+    with open(path, "rb") as handle:
+        raw = handle.read()
+    try:
+        data = json.loads(raw)
+    except ValueError as exc:
+        raise ParameterError(f"{path}: {exc}") from None
+    ages = MAX_AGE + 1
+    single = _table(path, data, "single_life", (ages,))
+    joint = _table(path, data, "joint_last_survivor", (ages, ages))
+    uniform_from = int((data.get("uniform_lifetime") or {}).get("min_age", 0))
+    uniform = _table(path, data, "uniform_lifetime", (ages - uniform_from,), uniform_from)
+    mortality = _table(path, data, "mortality", (ages,))
+    for name, table in (("single_life", single), ("joint_last_survivor", joint), ("uniform_lifetime", uniform)):
+        if np.any(table < 1):
+            raise ParameterError(f"{path}: {name} life expectancies must be at least 1")
+    if np.any(np.diff(single) > 0) or np.any(np.diff(joint, axis=0) > 0) or np.any(np.diff(joint, axis=1) > 0):
+        raise ParameterError(f"{path}: life expectancies must never rise with age")
+    if np.any(mortality < 0) or np.any(mortality > 1) or mortality[-1] != 1:
+        raise ParameterError(f"{path}: mortality rates must be between 0 and 1, reaching 1 at {MAX_AGE}")
+
+    survival = np.concatenate([[1.0], np.cumprod(1 - mortality)])
+    uniform = np.concatenate([np.full(uniform_from, np.nan), uniform])
+    return LifeTables(single, joint, uniform, survival, hashlib.sha256(raw).hexdigest())
+
+
+def check_life_tables(tables=None):
+    """
+    Check the bundled tables against each other and the published values.
+
+    Each Uniform Lifetime entry must equal the joint expectancy with a
+    beneficiary 10 years younger, and the single and joint expectancies the
+    mortality rates imply (rounded to 0.1) must equal the tables (age 120,
+    which the IRS tables floor at 1.0, excepted).
+
+    :return: Tuple of (number of entries checked, list of (table, ages, bundled, expected) that differ).
+    """
+    tables = tables or life_tables()
+    mismatches = []
+    ages = np.flatnonzero(~np.isnan(tables.uniform))
+    for age, joint, uniform in zip(ages, tables.joint[ages, ages - 10], tables.uniform[ages]):
+        if joint != uniform:
+            mismatches.append(("joint_last_survivor", (int(age), int(age) - 10), float(joint), float(uniform)))
+
+    below = np.arange(MAX_AGE)
+    owner = _paths(tables.survival, np.arange(MAX_AGE + 1))
+    single = np.round(owner.sum(axis=-1) + 0.5 + 1e-9, 1)
+    for age in below[single[below] != tables.single[below]]:
+        mismatches.append(("single_life", (int(age),), float(tables.single[age]), float(single[age])))
+    either = owner[:, None, :] + owner[None, :, :] - owner[:, None, :] * owner[None, :, :]
+    joint = np.round(either.sum(axis=-1) + 0.5 + 1e-9, 1)
+    joint = np.maximum(joint, np.maximum(tables.single[:, None], tables.single[None, :]))
+    for owner_age, beneficiary_age in zip(*np.nonzero(joint != tables.joint)):
+        mismatches.append(("joint_last_survivor", (int(owner_age), int(beneficiary_age)),
+                           float(tables.joint[owner_age, beneficiary_age]), float(joint[owner_age, beneficiary_age])))
+    return len(ages) + len(below) + joint.size, mismatches
+
+
+# --- Process-wide tables ---
+_lock = threading.Lock()
+_tables = None
+
+
+def life_tables() -> LifeTables:
+    """The bundled tables, loaded on first use."""
+    global _tables
+    if _tables is None:
+        with _lock:
+            if _tables is None:
+                _tables = load_life_tables()
+    return _tables
+
+
+def sepp_payments(balance, ages, rates, beneficiary_ages=None, tables=None):
+    """
+    Annual payment under each SEPP method for any broadcastable inputs.
+
+    :param balance: Account balance at the start of the plan.
+    :param ages: Age attained in the first distribution year.
+    :param rates: Interest rates as decimals (ignored by the RMD method).
+    :param beneficiary_ages: Beneficiary ages for the joint life table; None for single life.
+    :return: {method: payment array} for every method in SEPP_METHODS.
+    """
+    tables = tables or life_tables()
+    balance = np.asarray(balance, dtype=float)
+    rates = np.asarray(rates, dtype=float)
+    years = tables.life_expectancy(ages, beneficiary_ages)
+    amortized = np.where(
+        rates > 0, rates / -np.expm1(-years * np.log1p(np.maximum(rates, 1e-12))), 1 / years)
+    shape = np.broadcast_shapes(balance.shape, np.shape(ages), rates.shape, np.shape(beneficiary_ages))
+    return {
+        SEPP_RMD: np.broadcast_to(balance / years, shape),
+        SEPP_AMORTIZATION: np.broadcast_to(balance * amortized, shape),
+        SEPP_ANNUITIZATION: np.broadcast_to(
+            balance / tables.annuity_factors(ages, rates, beneficiary_ages), shape),
+    }
+
+
+def sepp_payment(balance, age, method=SEPP_AMORTIZATION, rate=SEPP_RATE, beneficiary_age=None):
+    """
+    First-year SEPP payment for one plan.
+
+    :raises ValueError: If method is not one of SEPP_METHODS.
+    """
+    if method not in SEPP_METHODS:
+        raise ValueError(f"unknown sepp_method {method!r}; expected one of {list(SEPP_METHODS)}")
+    return float(sepp_payments(balance, age, rate, beneficiary_age)[method])
+
+
+def sepp_years(age):
+    """Years of payments required: 5, or until 59½ if that is later."""
+    return max(SEPP_MIN_YEARS, math.ceil(SEPP_END_AGE - age))
+
+
+@dataclass(frozen=True)
+class SeppSchedule:
+    """Year-by-year payments and end-of-year balances for every SEPP method."""
+
+    ages: np.ndarray  # age attained in each distribution year
+    payments: dict  # method -> (years,) annual payment
+    balances: dict  # method -> (years,) balance after the year's payment
+
+    def to_columns(self):
+        """One row per distribution year, ready for pd.DataFrame."""
+        columns = {"Year": np.arange(1, len(self.ages) + 1), "Age": self.ages}
+        for method in SEPP_METHODS:
+            columns[f"{SEPP_METHOD_LABELS[method]} Payment"] = self.payments[method]
+        for method in SEPP_METHODS:
+            columns[f"{SEPP_METHOD_LABELS[method]} Balance"] = self.balances[method]
+        return columns
+
+
+def sepp_schedule(balance, age, rate=SEPP_RATE, growth=None, beneficiary_age=None, tables=None):
+    """
+    Payments under each method until the plan may end (sepp_years()).
+
+    Payments are taken at each year end and the balance grows at growth
+    (default: the SEPP interest rate). The RMD payment is recomputed every
+    year from that year's starting balance and age; the other two methods
+    keep the first year's payment.
+    """
+    tables = tables or life_tables()
+    growth = rate if growth is None else growth
+    t = np.arange(sepp_years(age))
+    ages = age + t
+    g = 1 + growth
+    first = sepp_payments(balance, age, rate, beneficiary_age, tables)
+
+    years = tables.life_expectancy(ages, None if beneficiary_age is None else beneficiary_age + t)
+    kept = g - 1 / years  # the RMD leaves this multiple of the starting balance
+    start = balance * np.concatenate([[1.0], np.cumprod(kept[:-1])])
+    payments = {SEPP_RMD: start / years}
+    balances = {SEPP_RMD: start * kept}
+    compound = g ** (t + 1)
+    for method in (SEPP_AMORTIZATION, SEPP_ANNUITIZATION):
+        payment = float(first[method])
+        paid = payment * (t + 1) if growth == 0 else payment * (compound - 1) / growth
+        end = balance * compound - paid
+        payments[method] = np.where(end >= 0, payment, np.maximum(end + payment, 0.0))
+        balances[method] = np.maximum(end, 0.0)
+    return SeppSchedule(ages, payments, balances)
@@ -0,0 +1,329 @@
+# -*- coding: utf-8 -*-
+"""
+Local JSON HTTP API over the calculation engine.
+
+Other tools can get the same pension, SRS, TSP penalty and net-cash results
+the app shows without a UI. The service uses only the standard library
+(http.server), so it runs on one machine with no external services::
+
+    python -m fers_engine.server --port 8765
+
+Endpoints:
+
+- ``POST /evaluate``: the body is one profile object or an array of them,
+  with the same field names and aliases as batch.py columns. A single
+  object returns ``{"result": {...}}``, an array returns ``{"results":
+  [...]}`` in input order. Every profile in a request is evaluated in one
+  batch (the Normal/VERA/DRP age surface is computed for all of them in
+  a single vectorized pass). ``?ages=55,60,62`` overrides the comparison
+  ages.
+- ``POST /export?table=cash_flow&format=parquet``: one profile in the body;
+  streams a full projection table (see export.py) chunk by chunk without
+  holding the whole file. Cash flow assumptions can be added to the query.
+  An error while encoding the first block still gets a 500; one after that
+  drops the connection before the final chunk of the chunked transfer.
+- ``GET /health``: liveness and the plan-year parameter version.
+- ``GET /stats``: request, profile and error counts plus latency
+  percentiles over recent requests.
+
+Every response carries the request's server-side latency, both as
+``elapsed_ms`` in the body and in a ``Server-Timing`` header (for an export,
+the header gives the time until its first block). Invalid input
+gets a 400 with ``{"error": ...}`` naming the offending profile; that
+includes a field that is neither a profile field nor an alias and a number
+that is not finite (NaN or Infinity are not JSON and are never returned).
+"""
+import argparse
+import itertools
+import json
+import sys
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from .batch import COMPARE_AGES, PROFILE_COLUMNS, check_profile, evaluate_rows, profile_from_row
+from .export import EXPORT_FORMATS, EXPORT_TABLES, stream_export, table_chunks
+from .parameters import registry
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MAX_BATCH = 10_000
+MAX_BODY_BYTES = 16 * 1024 * 1024
+RECENT_REQUESTS = 1000
+
+
+class RequestError(ValueError):
+    """A request the service cannot evaluate; reported as an HTTP 4xx."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _check_fields(row, where):
+    unknown = set(row) - PROFILE_COLUMNS
+    if unknown:
+        raise RequestError(f"{where}: unknown fields {', '.join(sorted(map(str, unknown)))}")
+
+
+def _reject_constant(name):
+    raise RequestError(f"Request body contains {name}; only finite numbers are accepted")
+
+
+def evaluate_payload(payload, compare_ages=COMPARE_AGES):
+    """
+    Evaluate a decoded request body.
+
+    :param payload: One profile dict, or a list of them.
+    :return: The response body (without elapsed_ms) and the number of profiles.
+    :raises RequestError: If the payload or one of its profiles is invalid.
+    """
+    single = isinstance(payload, dict)
+    rows = [payload] if single else payload
+    if not isinstance(rows, list) or not rows:
+        raise RequestError("Expected a profile object or a non-empty array of profiles")
+    if len(rows) > MAX_BATCH:
+        raise RequestError(f"At most {MAX_BATCH:,} profiles per request", status=413)
+    profiles = []
+    for i, row in enumerate(rows):
+        where = "profile" if single else f"profile {i}"
+        if not isinstance(row, dict):
+            raise RequestError(f"{where}: expected an object")
+        _check_fields(row, where)
+        try:
+            profiles.append(profile_from_row(row))
+            check_profile(profiles[-1])
+        except (TypeError, ValueError) as exc:
+            raise RequestError(f"{where}: {exc}") from None
+
+    results = evaluate_rows(rows, compare_ages, profiles)
+    for i, result in enumerate(results):
+        error = result.pop("error")
+        if error:
+            raise RequestError(f"{'profile' if single else f'profile {i}'}: {error}")
+    body = {"result": results[0]} if single else {"count": len(results), "results": results}
+    return body, len(rows)
+
+
+def export_payload(payload, query):
+    """
+    Validate an export request: one profile in the body, table and format in the query.
+
+    Cash flow assumptions (inflation, fehb_growth, tsp_return) may be given
+    as query parameters too.
+
+    :return: The MIME type and a generator of encoded blocks.
+    :raises RequestError: If the profile, table, format or an assumption is invalid.
+    """
+    if not isinstance(payload, dict):
+        raise RequestError("Expected one profile object")
+    _check_fields(payload, "profile")
+    params = {key: values[-1] for key, values in parse_qs(query).items()}
+    table, fmt = params.pop("table", "cash_flow"), params.pop("format", "csv")
+    if table not in EXPORT_TABLES:
+        raise RequestError(f"table must be one of {list(EXPORT_TABLES)}")
+    if fmt not in EXPORT_FORMATS:
+        raise RequestError(f"format must be one of {list(EXPORT_FORMATS)}")
+    try:
+        profile = profile_from_row(payload)
+        check_profile(profile)
+    except (TypeError, ValueError) as exc:
+        raise RequestError(f"profile: {exc}") from None
+    assumptions = {}
+    for key in ("inflation", "fehb_growth", "tsp_return"):
+        if key in params:
+            try:
+                assumptions[key] = float(params[key])
+                if not np.isfinite(assumptions[key]):
+                    raise ValueError(key)
+            except ValueError:
+                raise RequestError(f"{key} must be an annual rate such as 0.025") from None
+    return EXPORT_FORMATS[fmt][0], stream_export(table_chunks(table, profile, **assumptions), fmt)
+
+
+def _parse_ages(query):
+    values = parse_qs(query).get("ages")
+    if not values:
+        return COMPARE_AGES
+    try:
+        ages = tuple(int(age) for age in values[-1].split(",") if age.strip())
+    except ValueError:
+        raise RequestError("ages must be a comma-separated list of whole years") from None
+    if not ages:
+        raise RequestError("ages must list at least one age")
+    return ages
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class ServerStats:
+    """Thread-safe request counters and recent latencies."""
+
+    def __init__(self, recent=RECENT_REQUESTS):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=recent)
+        self.requests = 0
+        self.profiles = 0
+        self.errors = 0
+
+    def record(self, elapsed_ms, profiles=0, error=False):
+        with self._lock:
+            self.requests += 1
+            self.profiles += profiles
+            self.errors += bool(error)
+            self._latencies.append(elapsed_ms)
+
+    def summary(self):
+        with self._lock:
+            latencies = np.array(self._latencies, dtype=float)
+            summary = {"requests": self.requests, "profiles": self.profiles, "errors": self.errors}
+        if len(latencies):
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+            summary["latency_ms"] = {
+                "recent": len(latencies),
+                "mean": round(float(latencies.mean()), 3),
+                "p50": round(float(p50), 3),
+                "p95": round(float(p95), 3),
+                "p99": round(float(p99), 3),
+                "max": round(float(latencies.max()), 3),
+            }
+        return summary
+
+
+class EngineRequestHandler(BaseHTTPRequestHandler):
+    server_version = "fers-engine/1"
+    quiet = False
+
+    def do_GET(self):
+        start = time.perf_counter()
+        path = urlsplit(self.path).path
+        if path == "/health":
+            self._respond(start, 200, {"status": "ok", "parameters_version": registry().version})
+        elif path == "/stats":
+            self._respond(start, 200, self.server.stats.summary())
+        else:
+            self._respond(start, 404, {"error": f"No such endpoint: GET {path}"}, error=True)
+
+    def do_POST(self):
+        start = time.perf_counter()
+        url = urlsplit(self.path)
+        if url.path not in ("/evaluate", "/export"):
+            self._respond(start, 404, {"error": f"No such endpoint: POST {url.path}"}, error=True)
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            if length > MAX_BODY_BYTES:
+                raise RequestError(f"Request body is larger than {MAX_BODY_BYTES:,} bytes", status=413)
+            try:
+                payload = json.loads(self.rfile.read(length) or b"null", parse_constant=_reject_constant)
+            except RequestError:
+                raise
+            except ValueError:
+                raise RequestError("Request body is not valid JSON") from None
+            if url.path == "/export":
+                mime, blocks = export_payload(payload, url.query)
+            else:
+                body, profiles = evaluate_payload(payload, _parse_ages(url.query))
+        except RequestError as exc:
+            self._respond(start, exc.status, {"error": str(exc)}, error=True)
+        else:
+            if url.path == "/export":
+                self._stream(start, mime, blocks)
+            else:
+                self._respond(start, 200, body, profiles=profiles)
+
+    def _stream(self, start, mime, blocks):
+        # The first block is encoded before the headers go out, so a failure there still gets an error
+        # status. The rest is sent with chunked encoding: a failure later on drops the connection before
+        # the final empty chunk, and the client sees a truncated transfer instead of a complete file.
+        blocks = iter(blocks)
+        try:
+            first = next(blocks, b"")
+        except (ArithmeticError, KeyError, TypeError, ValueError) as exc:
+            self._respond(start, 500, {"error": f"{type(exc).__name__}: {exc}"}, profiles=1, error=True)
+            return
+        first_ms = (time.perf_counter() - start) * 1000
+        self.protocol_version = "HTTP/1.1"  # chunked transfer encoding needs HTTP/1.1
+        self.send_response(200)
+        self.send_header("Content-Type", mime)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.send_header("Connection", "close")
+        self.send_header("Server-Timing", f'export;dur={first_ms:.3f};desc="until the first block"')
+        self.end_headers()
+        sent, status = 0, 200
+        try:
+            for block in itertools.chain([first], blocks):
+                if block:
+                    self.wfile.write(b"%X\r\n%s\r\n" % (len(block), block))
+                    sent += len(block)
+            self.wfile.write(b"0\r\n\r\n")
+        except (ArithmeticError, KeyError, TypeError, ValueError, OSError) as exc:
+            status = 500  # headers are gone; closing without the last chunk is the only signal left
+            self.close_connection = True
+            if not self.quiet:
+                sys.stderr.write(f"{self.command} {self.path} aborted after {sent:,} bytes: {exc}\n")
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.server.stats.record(elapsed_ms, 1, error=status != 200)
+        if not self.quiet:
+            sys.stderr.write(f"{self.command} {self.path} {status} {sent:,} bytes {elapsed_ms:.1f} ms\n")
+
+    def _respond(self, start, status, body, profiles=0, error=False):
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        body = {**body, "elapsed_ms": round(elapsed_ms, 3)}
+        try:
+            data = json.dumps(body, default=_json_default, allow_nan=False).encode("utf-8")
+        except ValueError:
+            status, error = 500, True
+            body = {"error": "The result is not a finite number", "elapsed_ms": body["elapsed_ms"]}
+            data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("Server-Timing", f"evaluate;dur={elapsed_ms:.3f}")
+        self.end_headers()
+        self.wfile.write(data)
+        self.server.stats.record(elapsed_ms, profiles, error)
+        if not self.quiet:
+            sys.stderr.write(f"{self.command} {self.path} {status} {profiles} profiles {elapsed_ms:.1f} ms\n")
+
+    def log_message(self, format, *args):
+        pass  # _respond logs one line per request, with its latency
+
+
+def make_server(host=DEFAULT_HOST, port=DEFAULT_PORT, quiet=False):
+    """A ThreadingHTTPServer serving the API; port 0 picks a free port."""
+    handler = type("Handler", (EngineRequestHandler,), {"quiet": quiet})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.stats = ServerStats()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the retirement calculations as a local JSON HTTP API.")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="interface to bind (default: localhost only)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="port to listen on")
+    parser.add_argument("--quiet", action="store_true", help="do not log each request")
+    args = parser.parse_args(argv)
+
+    registry()  # load and validate the plan-year parameters before accepting requests
+    server = make_server(args.host, args.port, args.quiet)
+    print(f"Serving on http://{args.host}:{server.server_address[1]}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""
+Progressive federal and state income tax.
+
+Each plan year in data/plan_years.json carries a federal schedule and
+optional state schedules: brackets per filing status, the standard
+deduction, the additional deduction at 65 and the income kinds a
+jurisdiction excludes (VA disability everywhere, retirement income in some
+states). They are compiled on load into a TaxSchedule of (filing status,
+bracket) arrays holding each bracket's lower bound, its rate and the
+cumulative tax owed below it, so the tax on any amount is one bracket
+lookup plus one multiply.
+
+income_tax() takes each income kind as an array and broadcasts, so the tax
+on a whole multi-year projection or a cohort is a single call. Passing a
+cumulative CPI factor as index scales the brackets and deductions with
+inflation, as the IRS does every year. distribution_tax() is the tax a TSP
+distribution adds on top of the other income, which is what the TSP
+withdrawal options pay.
+"""
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Mapping, NamedTuple
+
+import numpy as np
+
+FILING_STATUSES = ("single", "married_joint")
+FILING_STATUS_LABELS = {"single": "Single", "married_joint": "Married filing jointly"}
+# wages: VSIP and paid leave; pension: FERS/CSRS annuity and the SRS; tsp: traditional TSP distributions.
+INCOME_KINDS = ("wages", "pension", "tsp", "military", "va")
+NO_STATE = "None"
+
+
+class IncomeTax(NamedTuple):
+    """Tax owed and the combined marginal rate, as arrays shaped like the income."""
+
+    federal: np.ndarray
+    state: np.ndarray
+    total: np.ndarray
+    marginal_rate: np.ndarray  # federal + state rate on the next dollar of fully taxable income
+
+
+@dataclass(frozen=True, eq=False)
+class TaxSchedule:
+    """One jurisdiction's brackets for every filing status, as lookup arrays."""
+
+    thresholds: np.ndarray  # (statuses, brackets) lower bound of each bracket; unused slots are inf
+    rates: np.ndarray  # (statuses, brackets)
+    base: np.ndarray  # (statuses, brackets) tax owed on income up to each lower bound
+    standard_deduction: np.ndarray  # (statuses,)
+    additional_deduction_65: np.ndarray  # (statuses,) for a filer 65 or older
+    exclusions: Mapping[str, float]  # income kind -> amount excluded (inf: fully exempt)
+
+    def taxable_income(self, income, status, age=None, index=1.0):
+        """Income after exclusions and deductions, in the brackets' dollars."""
+        total = 0.0
+        for kind, amount in income.items():
+            total = total + np.maximum(np.asarray(amount, dtype=float) / index - self.exclusions.get(kind, 0.0), 0.0)
+        deduction = self.standard_deduction[status]
+        if age is not None:
+            deduction = deduction + np.where(np.asarray(age) >= 65, self.additional_deduction_65[status], 0.0)
+        return np.maximum(total - deduction, 0.0)
+
+    def tax(self, taxable, status):
+        """
+        Tax on taxable income (in the brackets' dollars).
+
+        :return: Tuple of (tax, marginal rate) arrays.
+        """
+        taxable = np.asarray(taxable, dtype=float)
+        status = np.broadcast_to(status, taxable.shape)
+        bracket = (taxable[..., None] >= self.thresholds[status]).sum(axis=-1) - 1
+        lower = self.thresholds[status, bracket]
+        rate = self.rates[status, bracket]
+        return self.base[status, bracket] + (taxable - lower) * rate, rate
+
+
+def _amounts(values, name):
+    values = values or {}
+    if not isinstance(values, dict) or set(values) - set(FILING_STATUSES):
+        raise ValueError(f"{name} must map filing statuses {list(FILING_STATUSES)} to amounts")
+    amounts = np.array([values.get(status, 0) for status in FILING_STATUSES], dtype=float)
+    if np.any(amounts < 0):
+        raise ValueError(f"{name} must not be negative")
+    return amounts
+
+
+def compile_schedule(values) -> TaxSchedule:
+    """
+    Build a TaxSchedule from its plan-year entry.
+
+    :param values: ``{"brackets": {status: [[lower bound, rate], ...]},
+        "standard_deduction": {status: amount}, "additional_deduction_65":
+        {status: amount}, "exclusions": {kind: amount or "all"}}``; only
+        brackets is required.
+    :raises ValueError: If a bracket, amount or income kind is invalid.
+    """
+    if not isinstance(values, dict) or not isinstance(values.get("brackets"), dict):
+        raise ValueError("expected an object with 'brackets' per filing status")
+    unknown = set(values) - {"brackets", "standard_deduction", "additional_deduction_65", "exclusions", "notes"}
+    if unknown:
+        raise ValueError(f"unknown keys {', '.join(sorted(unknown))}")
+    brackets = values["brackets"]
+    if set(brackets) != set(FILING_STATUSES):
+        raise ValueError(f"brackets must list exactly {list(FILING_STATUSES)}")
+
+    width = max(len(rows) for rows in brackets.values())
+    thresholds = np.full((len(FILING_STATUSES), width), np.inf)
+    rates = np.zeros((len(FILING_STATUSES), width))
+    for s, status in enumerate(FILING_STATUSES):
+        try:
+            rows = np.array(brackets[status], dtype=float).reshape(-1, 2)
+        except (TypeError, ValueError):
+            raise ValueError(f"brackets[{status!r}] must be a list of [lower bound, rate] pairs") from None
+        if not len(rows) or rows[0, 0] != 0 or np.any(np.diff(rows[:, 0]) <= 0):
+            raise ValueError(f"brackets[{status!r}] must start at 0 and rise strictly")
+        if np.any(rows[:, 1] < 0) or np.any(rows[:, 1] > 1):
+            raise ValueError(f"brackets[{status!r}] rates must be between 0 and 1")
+        thresholds[s, :len(rows)] = rows[:, 0]
+        rates[s, :len(rows)] = rows[:, 1]
+        rates[s, len(rows):] = rows[-1, 1]
+    widths = np.nan_to_num(np.diff(thresholds, axis=1), posinf=0.0)
+    base = np.concatenate([np.zeros((len(FILING_STATUSES), 1)), np.cumsum(widths * rates[:, :-1], axis=1)], axis=1)
+
+    exclusions = {}
+    for kind, amount in (values.get("exclusions") or {}).items():
+        if kind not in INCOME_KINDS:
+            raise ValueError(f"exclusions: unknown income kind {kind!r}; expected one of {list(INCOME_KINDS)}")
+        if amount == "all":
+            amount = np.inf
+        if not isinstance(amount, (int, float)) or isinstance(amount, bool) or amount < 0:
+            raise ValueError(f"exclusions[{kind!r}] must be a non-negative amount or \"all\"")
+        exclusions[kind] = float(amount)
+    return TaxSchedule(
+        thresholds, rates, base,
+        _amounts(values.get("standard_deduction"), "standard_deduction"),
+        _amounts(values.get("additional_deduction_65"), "additional_deduction_65"),
+        MappingProxyType(exclusions),
+    )
+
+
+def status_index(filing_status):
+    """Index into FILING_STATUSES for a status name or an array of them."""
+    statuses = np.asarray(filing_status)
+    if not np.isin(statuses, FILING_STATUSES).all():
+        raise ValueError(f"unknown filing_status; expected one of {list(FILING_STATUSES)}")
+    index = np.zeros(statuses.shape, dtype=np.intp)
+    for i, status in enumerate(FILING_STATUSES):
+        index[statuses == status] = i
+    return index
+
+
+def income_tax(income, params=None, filing_status="single", state=NO_STATE, age=None, index=1.0) -> IncomeTax:
+    """
+    Federal and state income tax for any broadcastable income arrays.
+
+    :param income: {kind: amount} for kinds in INCOME_KINDS, annual and before tax.
+    :param params: PlanYearParameters with the schedules; None for the default year.
+    :param filing_status: One of FILING_STATUSES, or an array of them.
+    :param state: A key of params.state_taxes (NO_STATE for none).
+    :param age: Age in the tax year, for the additional deduction at 65.
+    :param index: Bracket indexation factor (e.g. cumulative CPI since the plan year).
+    :raises ValueError: If the filing status or an income kind is unknown.
+    :raises KeyError: If the plan year has no table for state.
+    """
+    if params is None:
+        from .parameters import parameters
+
+        params = parameters()
+    unknown = set(income) - set(INCOME_KINDS)
+    if unknown:
+        raise ValueError(f"unknown income kinds {sorted(unknown)}; expected {list(INCOME_KINDS)}")
+    if state not in params.state_taxes:
+        raise KeyError(f"No state tax table for {state!r} in plan year {params.year}; "
+                       f"available: {sorted(params.state_taxes)}")
+    status = status_index(filing_status)
+    index = np.asarray(index, dtype=float)
+
+    federal, federal_rate = params.federal_tax.tax(
+        params.federal_tax.taxable_income(income, status, age, index), status)
+    schedule = params.state_taxes[state]
+    state_tax, state_rate = schedule.tax(schedule.taxable_income(income, status, age, index), status)
+    federal, state_tax = federal * index, state_tax * index
+    return IncomeTax(federal, state_tax, federal + state_tax, federal_rate + state_rate)
+
+
+def distribution_tax(amount, income=None, params=None, filing_status="single", state=NO_STATE, age=None,
+                     index=1.0):
+    """
+    Income tax a TSP distribution adds on top of the other income.
+
+    :param amount: Distribution amount(s) before tax.
+    :param income: The other income, as for income_tax(); none by default.
+    """
+    income = dict(income or {})
+    with_distribution = {**income, "tsp": np.asarray(income.get("tsp", 0.0), dtype=float) + amount}
+    return (income_tax(with_distribution, params, filing_status, state, age, index).total
+            - income_tax(income, params, filing_status, state, age, index).total)
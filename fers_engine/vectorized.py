@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+"""
+NumPy versions of the age-comparison rules.
+
+Every function broadcasts its arguments against each other, so a
+(profiles, 1) column of inputs against a (1, ages) row of retirement ages
+yields the whole (profiles, ages) income surface in one pass. The scalar
+functions in calculator.py and rules.py remain the reference implementation.
+"""
+import numpy as np
+
+from .parameters import parameters, registry
+from .penalty_table import penalty_lookup
+from .profile import RetirementProfile
+from .rules import admin_leave_income
+
+# --- Assumptions used by the age comparison ---
+ANNUAL_GROWTH_RATE = 0.05
+WITHDRAWAL_RATE = 0.04
+
+
+def tsp_penalty_applies(age, years_service, vera_elected=False, public_safety_employee=False):
+    """
+    Vectorized calculate_tsp_penalty_status (penalty flag only).
+
+    Answered from the precompiled decision table in penalty_table.py; use
+    penalty_lookup() there when the reason codes are needed as well.
+    """
+    penalty, _ = penalty_lookup(age, years_service, vera_elected, public_safety_employee)
+    return penalty
+
+
+def annuity_start_age(separation_age, years_service, vera=False, mra=57):
+    """
+    Age at which a FERS annuity starts for a given separation (simplified).
+
+    Immediate and unreduced at MRA+30, 60+20, 62+5, or under VERA (50+20 or
+    any age with 25 years); otherwise deferred to 62 with at least 5 years.
+    MRA+10 reduced annuities are not modelled.
+
+    :return: Start age, np.inf where no annuity is payable.
+    """
+    age = np.asarray(separation_age, dtype=float)
+    service = np.asarray(years_service, dtype=float)
+    vera = np.asarray(vera, dtype=bool)
+    immediate = (
+        ((age >= mra) & (service >= 30))
+        | ((age >= 60) & (service >= 20))
+        | ((age >= 62) & (service >= 5))
+        | (vera & (((age >= 50) & (service >= 20)) | (service >= 25)))
+    )
+    return np.where(immediate, age, np.where(service >= 5, np.maximum(age, 62.0), np.inf))
+
+
+def special_retirement_supplement(current_age, years_service, params=None):
+    """
+    Vectorized rules.special_retirement_supplement.
+
+    :param params: PlanYearParameters, or ParameterArrays for one plan year per row.
+    """
+    params = params or parameters()
+    current_age = np.asarray(current_age)
+    years_service = np.asarray(years_service, dtype=float)
+    eligible = (current_age < 62) & (years_service >= 20)
+    return np.where(eligible, (years_service / 40) * (params.srs_monthly_base * 12), 0.0)
+
+
+def retirement_income_surface(
+        ages,
+        current_age,
+        years_service,
+        high3_salary,
+        tsp_balance,
+        va_monthly=0,
+        admin_leave_income=0,
+        with_vera=False,
+        with_drp=False,
+        separation_age=50,
+        csrs=False,
+        annual_growth_rate=ANNUAL_GROWTH_RATE,
+        withdrawal_rate=WITHDRAWAL_RATE,
+        params=None):
+    """
+    Vectorized calc_retirement_income over any broadcastable inputs.
+
+    :param ages: Retirement ages to evaluate.
+    :param current_age: Each profile's current age.
+    :param years_service: Each profile's years of federal service.
+    :param admin_leave_income: DRP paid-leave income, 0 where DRP is not elected.
+    :param with_vera: Whether VERA is applied.
+    :param with_drp: Whether DRP is applied.
+    :param separation_age: The age at which DRP lump sum is applied.
+    :param csrs: True for CSRS, False for FERS.
+    :param params: PlanYearParameters, or ParameterArrays for one plan year per row.
+    :return: Annual retirement income with the broadcast shape of the inputs.
+    """
+    params = params or parameters()
+    ages = np.asarray(ages, dtype=float)
+    current_age = np.asarray(current_age, dtype=float)
+    years_service = np.asarray(years_service, dtype=float)
+    high3_salary = np.asarray(high3_salary, dtype=float)
+    with_vera = np.asarray(with_vera, dtype=bool)
+    with_drp = np.asarray(with_drp, dtype=bool)
+    csrs = np.asarray(csrs, dtype=bool)
+
+    # VERA = fixed service at separation, otherwise keep working until `age`
+    years_until_retirement = np.where(with_vera, 0.0, np.maximum(0.0, ages - current_age))
+    hypothetical_service = years_service + years_until_retirement
+
+    # Basic pension
+    pension = np.where(
+        csrs,
+        high3_salary * params.csrs_multiplier * hypothetical_service,
+        high3_salary * params.fers_multiplier * hypothetical_service * params.fers_reduction_factor,
+    )
+
+    # SRS (FERS only if <62 & service >= 20)
+    srs_amt = np.where(
+        ~csrs & (ages < 62) & (hypothetical_service >= 20),
+        special_retirement_supplement(current_age, years_service, params),
+        0.0,
+    )
+
+    # --- TSP Approximate ---
+    projected_tsp_balance = np.asarray(tsp_balance, dtype=float) * (
+        (1 + annual_growth_rate) ** years_until_retirement)
+    estimated_tsp_withdrawal = projected_tsp_balance * withdrawal_rate
+    penalty = tsp_penalty_applies(ages, years_service, with_vera)
+    estimated_tsp_withdrawal = np.where(
+        penalty, estimated_tsp_withdrawal * (1 - params.tsp_early_withdrawal_penalty), estimated_tsp_withdrawal)
+
+    # DRP lump sum
+    lumpsum_drp = np.where(with_drp & (ages >= separation_age), admin_leave_income, 0.0)
+
+    return pension + srs_amt + estimated_tsp_withdrawal + lumpsum_drp + np.asarray(va_monthly) * 12
+
+
+def profile_arrays(profiles):
+    """
+    Stack the fields the age comparison needs into (N, 1) column arrays,
+    with each profile's plan-year parameters as ParameterArrays.
+
+    :param profiles: A sequence of RetirementProfile.
+    :return: Dict of keyword arguments for retirement_income_surface().
+    """
+    def column(values, dtype=float):
+        return np.fromiter(values, dtype=dtype, count=len(profiles))[:, None]
+
+    return {
+        "current_age": column(p.current_age for p in profiles),
+        "years_service": column(p.years_service for p in profiles),
+        "high3_salary": column(p.high3_salary for p in profiles),
+        "tsp_balance": column(p.tsp_balance for p in profiles),
+        "va_monthly": column(p.va_monthly for p in profiles),
+        "admin_leave_income": column(
+            admin_leave_income(p.high3_salary, p.drp_elected, p.drp_leave_months) for p in profiles),
+        "csrs": column((p.system_type == "CSRS" for p in profiles), dtype=bool),
+        "params": registry().stack(p.plan_year for p in profiles),
+    }
+
+
+def compare_ages_surface(profiles, ages, simulate_drp=False, separation_age=52):
+    """
+    Normal / VERA / DRP income for every profile at every age.
+
+    :param profiles: A sequence of RetirementProfile.
+    :param ages: Retirement ages to evaluate.
+    :return: Dict with "Normal", "VERA" and "DRP" arrays of shape (len(profiles), len(ages)).
+    """
+    ages = np.asarray(ages, dtype=float)[None, :]
+    columns = profile_arrays(profiles)
+    normal = retirement_income_surface(ages, **columns)
+    vera = retirement_income_surface(ages, with_vera=True, **columns)
+    if simulate_drp:
+        drp = retirement_income_surface(
+            ages, with_drp=True, separation_age=separation_age, **columns)
+    else:
+        drp = np.zeros_like(normal)
+    return {"Normal": normal, "VERA": vera, "DRP": drp}
+
+
+def compare_retirement_ages(profile: RetirementProfile, min_age, max_age, simulate_drp=False):
+    """
+    Build the Normal / VERA / DRP retirement income columns for each age.
+
+    :return: Dict of Age, Normal, VERA and DRP arrays, ready for pd.DataFrame.
+    """
+    ages = np.arange(int(min_age), int(max_age) + 1)
+    surface = compare_ages_surface([profile], ages, simulate_drp)
+    return {"Age": ages, **{name: values[0] for name, values in surface.items()}}
@@ -1,16 +1,151 @@
 # -*- coding: utf-8 -*-
 import streamlit as st
 from datetime import datetime
-import matplotlib.pyplot as plt
-import pandas as pd
+import numpy as np
+import os
 import urllib.parse
-import io
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
+from dataclasses import replace
+from functools import partial, wraps
+
+from fers_engine import (
+    EXPORT_FORMATS,
+    EXPORT_TABLES,
+    FILING_STATUS_LABELS,
+    FILING_STATUSES,
+    OBJECTIVES,
+    PARAMETERS_PATH,
+    SEPP_AMORTIZATION,
+    SEPP_END_AGE,
+    SEPP_METHOD_LABELS,
+    SEPP_METHODS,
+    SEPP_RATE,
+    TSP_OPTION_LABELS,
+    TSP_SEPP,
+    RetirementProfile,
+    admin_leave_income,
+    build_pdf_report,
+    career_wages,
+    cash_flow_ledger,
+    compare_retirement_ages,
+    contractor_income,
+    evaluate,
+    export_file,
+    fers_pensions,
+    health_premiums,
+    load_registry,
+    monte_carlo_age_comparison,
+    optimize_plans,
+    sensitivity_grid,
+    sensitivity_net_cash,
+    sepp_payments,
+    sepp_schedule,
+    sepp_years,
+    special_retirement_supplement,
+    table_chunks,
+    use_registry,
+)
+from fers_app.charts import chart_cache, chart_mode, chart_spec, vega_lite
+from fers_app.lazy import import_times, lazy_import
+from fers_app.ledger import IncomeLedger
+from fers_app.share import QUERY_PARAM, ShareTokenError, decode_inputs, encode_inputs, result_cache
+from fers_app.timing import SectionTimer, section_stats, timing_enabled
+from fers_app.usage import UsageCounters
+from fers_app.workspace import ScenarioWorkspace
+
+# pandas is first used by the comparison table, so the inputs above it draw before it loads.
+pd = lazy_import("pandas")
+
+# --- Section Timing (off unless FERS_DEBUG_TIMING=1 or ?debug=timing) ---
+timer = SectionTimer(timing_enabled(st.query_params))
+timer.start("inputs")
+
+# --- Chart Mode (client-side Vega-Lite unless FERS_CHART_MODE=png or ?charts=png) ---
+charts_mode = chart_mode(st.query_params)
+
+
+def show_chart(spec):
+    if charts_mode == "png":
+        st.image(chart_cache.png(spec))
+    else:
+        st.vega_lite_chart(vega_lite(spec), use_container_width=True)
+
 
-# --- Setup & Session State ---
-st.session_state.setdefault("visits", 1336)
-st.session_state.visits += 1
+# --- Fragments (independent sections rerun alone when one of their widgets changes) ---
+script_finished = False  # set at the end of every full run; fragment-only reruns see True
+
+
+def sync_share_link():
+    share_token = encode_inputs(st.session_state)
+    if st.query_params.get(QUERY_PARAM) != share_token:
+        st.query_params[QUERY_PARAM] = share_token
+    return share_token
+
+
+def fragment(name):
+    """
+    st.fragment for a section that takes everything it reads as arguments.
+
+    A rerun of the fragment alone is timed as the section "<name> (fragment)"
+    and refreshes the share link, since the share section does not run.
+    """
+    def decorate(body):
+        @st.fragment
+        @wraps(body)
+        def section(*args, **kwargs):
+            if not script_finished:
+                return body(*args, **kwargs)
+            fragment_timer = SectionTimer(timer.enabled)
+            fragment_timer.start(f"{name} (fragment)")
+            body(*args, **kwargs)
+            fragment_timer.stop()
+            section_stats.record(fragment_timer)
+            usage.hit(f"fragment:{name}")
+            sync_share_link()
+        return section
+    return decorate
+
+
+# --- Plan-Year Parameters (reloaded when the data file changes) ---
+@st.cache_resource
+def plan_year_registry(mtime):
+    return load_registry()
+
+
+plan_years = use_registry(plan_year_registry(os.path.getmtime(PARAMETERS_PATH)))
+
+
+def restore_inputs(token):
+    """Write a scenario token's inputs into the session, warning about any a widget would reject."""
+    rejected = []
+    default_params = plan_years.get()
+    st.session_state.update(decode_inputs(token, {
+        "plan_year": tuple(plan_years.years),
+        "fegli_option": tuple(default_params.fegli_costs),
+        "state_tax": tuple(default_params.state_taxes),
+    }, rejected))
+    if rejected:
+        st.warning(f"⚠️ The scenario has invalid values for {', '.join(rejected)}; those inputs use their defaults.")
+
+
+# --- Shared Scenario Link (hydrates every keyed widget on a session's first run) ---
+if QUERY_PARAM in st.query_params and "scenario_hydrated" not in st.session_state:
+    try:
+        restore_inputs(st.query_params[QUERY_PARAM])
+    except ShareTokenError as exc:
+        st.warning(f"⚠️ {exc}. Starting from the default inputs.")
+st.session_state.scenario_hydrated = True
+
+# --- Usage Counters (shared by all sessions, flushed to SQLite in batches) ---
+@st.cache_resource(on_release=UsageCounters.close)
+def usage_counters():
+    return UsageCounters().start()
+
+
+usage = usage_counters()
+if "visit_counted" not in st.session_state:
+    st.session_state.visit_counted = True
+    usage.hit("visits")
+usage.hit("reruns")
 
 st.markdown(
     """
@@ -24,14 +159,13 @@ st.markdown(
 )
 
 # --- Visit Counter ---
-st.write(f"You have visited this page {st.session_state.visits} times.")
-
-# --- Initialize session state income trackers if missing ---
-if "income_labels" not in st.session_state:
-    st.session_state.income_labels = []
+st.write(f"This page has been visited {usage.count('visits'):,} times.")
 
-if "income_values" not in st.session_state:
-    st.session_state.income_values = []
+# --- Initialize the session income ledger if missing ---
+if "income_ledger" not in st.session_state:
+    st.session_state.income_ledger = IncomeLedger()
+if "scenario_workspace" not in st.session_state:
+    st.session_state.scenario_workspace = ScenarioWorkspace()
 
 st.markdown(
     """
@@ -81,17 +215,19 @@ with st.expander("ℹ️ How to Use This Tool"):
 #st.markdown("### Military Benefits")
 
 # --- Military Benefits Option ---
-show_military_benefits = st.checkbox("Add Military Benefits (TRICARE / Military Retirement)?")
+show_military_benefits = st.checkbox("Add Military Benefits (TRICARE / Military Retirement)?", key="show_military_benefits")
+tricare_selected = False
+included_military_pay = 0
 if show_military_benefits:
     # --- TRICARE ---
     tricare_selected = st.checkbox(
         "Covered under TRICARE (instead of FEHB/CHAMPVA)?",
         value=False,
-        help="This overrides FEHB/CHAMPVA costs with TRICARE (assumed $0 premium)."
+        help="This overrides FEHB/CHAMPVA costs with TRICARE (assumed $0 premium).",
+        key="tricare_selected"
     )
 
     if tricare_selected:
-        fehb_premium = 0
         st.markdown("✅ **TRICARE selected:** No monthly health premium included in cost model.")
 
     # --- Military Retirement Pay Inputs ---
@@ -99,7 +235,8 @@ if show_military_benefits:
         "Annual Military Retirement Pay ($)",
         min_value=0,
         value=0,
-        help="Enter your gross annual income from military retirement."
+        help="Enter your gross annual income from military retirement.",
+        key="military_retirement_pay"
     )
 
     military_retirement_start_year = st.number_input(
@@ -107,55 +244,66 @@ if show_military_benefits:
         min_value=1900,
         max_value=datetime.now().year + 20,
         value=datetime.now().year,
-        help="Enter the year when military retirement pay begins. Useful for reservists."
+        help="Enter the year when military retirement pay begins. Useful for reservists.",
+        key="military_retirement_start_year"
     )
 
        # ✅ Safe to reference these now
     include_military_pay = datetime.now().year >= military_retirement_start_year
 
-    # 🧠 Ensure session keys exist
-    if "income_labels" not in st.session_state:
-        st.session_state.income_labels = []
-    if "income_values" not in st.session_state:
-        st.session_state.income_values = []
-
-    # ⬇ Append if valid
+    # ⬇ Include if valid
     if include_military_pay and military_retirement_pay > 0:
-        st.session_state.income_labels.append("Military Retirement Pay")
-        st.session_state.income_values.append(military_retirement_pay)
+        included_military_pay = military_retirement_pay
         st.markdown(f"✅ **Military Retirement Pay added:** {military_retirement_pay:,.2f} starting in {military_retirement_start_year}.")
     elif military_retirement_pay > 0:
         st.warning(f"⚠️ Military retirement pay starts in {military_retirement_start_year}. Not included in current year projection.")
 
+# --- Plan Year Rules ---
+plan_year = st.selectbox(
+    "Plan Year Rules",
+    sorted(plan_years.years),
+    index=sorted(plan_years.years).index(plan_years.default_year),
+    help="Premiums, thresholds and pension factors used for every calculation. Years are maintained in fers_engine/data/plan_years.json.",
+    key="plan_year"
+)
+params = plan_years.get(plan_year)
+if params.notes:
+    st.caption(params.notes)
+
 # --- Inputs with Enhanced Tooltips ---
 current_age = st.number_input(
     "Current Age",
     min_value=18,
     max_value=80,
-    help="Enter your current age in years (must be between 18 and 80)."
+    help="Enter your current age in years (must be between 18 and 80).",
+    key="current_age"
 )
 years_service = st.number_input(
     "Years of Federal Service",
     min_value=0,
     max_value=50,
-    help="Enter the total number of years you have worked in federal service."
+    help="Enter the total number of years you have worked in federal service.",
+    key="years_service"
 )
 high3_salary = st.number_input(
     "High-3 Average Salary ($)",
     min_value=0,
-    help="Enter your average salary over your three highest consecutive years of service."
+    help="Enter your average salary over your three highest consecutive years of service.",
+    key="high3_salary"
 )
 tsp_balance = st.number_input(
     "Current TSP Balance ($)",
     min_value=0,
-    help="Enter your current Thrift Savings Plan balance."
+    help="Enter your current Thrift Savings Plan balance.",
+    key="tsp_balance"
 )
 tsp_contribution_pct = st.slider(
     "TSP Contribution (% of Salary)",
     0,
     100,
     5,
-    help="Select the percentage of your salary that you contribute to your TSP."
+    help="Select the percentage of your salary that you contribute to your TSP.",
+    key="tsp_contribution_pct"
 )
 tsp_contribution_annual = high3_salary * (tsp_contribution_pct / 100)
 
@@ -163,7 +311,8 @@ tsp_contribution_annual = high3_salary * (tsp_contribution_pct / 100)
 retirement_eligibility = st.radio(
     "Are you eligible for federal retirement?",
     ("Eligible", "Not Eligible"),
-    help="Select 'Eligible' if you meet the service requirements for federal retirement benefits. Select 'Not Eligible' if you left federal service before qualifying for retirement benefits. In the 'Not Eligible' scenario, your federal pension values will be set to $0."
+    help="Select 'Eligible' if you meet the service requirements for federal retirement benefits. Select 'Not Eligible' if you left federal service before qualifying for retirement benefits. In the 'Not Eligible' scenario, your federal pension values will be set to $0.",
+    key="retirement_eligibility"
 )
 
 # --- TSP Withdrawal Calculation (For VERA Retirement) ---
@@ -171,12 +320,10 @@ st.markdown("### TSP Withdrawal Calculation (For VERA Retirement)")
 
 tsp_option = st.radio(
     "Select TSP Withdrawal Option (Note: Early withdrawals may incur penalties and tax withholdings):",
-    (
-        "Withdraw now (penalty applies if under 59½)",
-        "Delay withdrawal until 59½ (No withdrawal now)",
-        "Set up SEPP plan",
-    ),
-    help="Choose 'Withdraw now' for immediate funds (subject to a 10% early withdrawal penalty and tax withholding if under 59½), 'Set up SEPP plan' to avoid the penalty (but taxes still apply), or 'Delay withdrawal' to defer until 59½."
+    tuple(TSP_OPTION_LABELS),
+    format_func=TSP_OPTION_LABELS.get,
+    help="Choose 'Withdraw now' for immediate funds (subject to a 10% early withdrawal penalty and tax withholding if under 59½), 'Set up SEPP plan' to avoid the penalty (but taxes still apply), or 'Delay withdrawal' to defer until 59½.",
+    key="tsp_option"
 )
 
 # --- TSP Penalty and Tax Logic (Enhanced by Age, Service, VERA Eligibility) ---
@@ -185,44 +332,18 @@ tsp_option = st.radio(
 public_safety_employee = st.checkbox(
     "I am a public safety employee (LEO, Firefighter, Air Traffic Controller)",
     value=False,
-    help="Check if you are covered under special retirement provisions for public safety employees. TSP early withdrawal penalties may not apply if you separate at age 50 or later."
+    help="Check if you are covered under special retirement provisions for public safety employees. TSP early withdrawal penalties may not apply if you separate at age 50 or later.",
+    key="public_safety_employee"
 )
 
 vera_elected = st.checkbox(
     "I am retiring under a VERA (Voluntary Early Retirement Authority)",
     value=False,
-    help="Check this if you are separating under the VERA program (typically 25+ years of service and at least age 50)."
+    help="Check this if you are separating under the VERA program (typically 25+ years of service and at least age 50).",
+    key="vera_elected"
 )
 
 
-def calculate_tsp_penalty_status(
-        age,
-        years_service,
-        vera_elected,
-        public_safety_employee):
-    if public_safety_employee and age >= 50:
-        return False, "No penalty – Public safety employee separated at or after age 50."
-
-    if age >= 62 and years_service >= 5:
-        return False, "No penalty – Age 62 or older at separation."
-    elif age >= 60 and years_service >= 20:
-        return False, "No penalty – Age 60+ with 20+ years of service."
-    elif age >= 55:
-        if vera_elected or years_service >= 30:
-            return False, "No penalty – Age 55 Rule applies (VERA or 30+ years)."
-        else:
-            return False, "No penalty – Age 55 Rule applies."
-    elif age >= 50 and vera_elected and years_service >= 25:
-        return True, "10% penalty – VERA retirement under age 55."
-    else:
-        return True, "10% penalty – Not retirement eligible under TSP rules."
-
-
-# Apply rule
-tsp_penalty_applies, penalty_note = calculate_tsp_penalty_status(
-    current_age, years_service, vera_elected, public_safety_employee
-)
-
 
 # --- TSP Withdrawal Rule Reference (Collapsible) ---
 with st.expander("📘 TSP Early Withdrawal Rules Explained"):
@@ -249,66 +370,101 @@ with st.expander("📘 TSP Early Withdrawal Rules Explained"):
     """)
 
 
-# Slider for estimated federal tax rate on TSP distributions (as a percentage)
-tax_rate = st.slider(
-    "Estimated Federal Income Tax Rate (%) for TSP Distribution",
-    min_value=0,
-    max_value=50,
-    value=22,
-    help="Estimate your marginal tax rate for TSP distributions. This percentage will be applied to early withdrawals."
-) / 100.0  # convert to decimal
+# Income tax comes from the plan year's federal and state brackets (fers_engine/tax.py).
+filing_status = st.radio(
+    "Tax Filing Status",
+    FILING_STATUSES,
+    format_func=FILING_STATUS_LABELS.get,
+    horizontal=True,
+    help="Sets the federal brackets and standard deduction used for your pension, SRS, military pay, VSIP and TSP distributions. VA disability is never taxed.",
+    key="filing_status"
+)
+state_tax = st.selectbox(
+    "State Income Tax",
+    list(params.state_taxes),
+    help="State brackets and retirement-income exclusions for the selected plan year. Choose 'None' if your state has no income tax.",
+    key="state_tax"
+)
 
 withdrawal_rate = st.slider(
     "Estimated Annual Withdrawal Rate (%)",
     min_value=1,
     max_value=10,
     value=4,
-    help="Select the annual percentage of the accessible TSP balance you plan to withdraw."
+    help="Select the annual percentage of the accessible TSP balance you plan to withdraw.",
+    key="withdrawal_rate"
 )
 
-if current_age < 59.5:
-    if tsp_option == "Withdraw now (penalty applies if under 59½)":
-        if tsp_penalty_applies:
-            base_balance = tsp_balance * 0.90  # Apply 10% penalty
-            net_balance = base_balance * (1 - tax_rate)
-            penalty_note += " This scenario includes the 10% early withdrawal penalty."
-            st.warning(
-                "⚠️ You will incur a 10% early withdrawal penalty based on your current age and retirement type.")
-        else:
-            net_balance = tsp_balance * (1 - tax_rate)
-            penalty_note = "No penalty applies, only taxes withheld."
-        tsp_withdrawal_balance = net_balance
-    elif tsp_option == "Set up SEPP plan":
-        net_balance = tsp_balance * (1 - tax_rate)
-        tsp_withdrawal_balance = net_balance
-        penalty_note = f"No penalty via SEPP plan; an estimated {
-            tax_rate * 100:.0f}% tax is withheld."
-    else:
-        tsp_withdrawal_balance = 0
-        penalty_note = "No withdrawal now. Funds remain untouched until 59½."
-
-else:
-    net_balance = tsp_balance * (1 - tax_rate)
-    tsp_withdrawal_balance = tsp_balance
-    penalty_note = f"Withdrawal is penalty-free; an estimated {
-        tax_rate * 100:.0f}% tax is applied on distributions."
-
-
-st.info(penalty_note)
-tsp_annual_income = tsp_withdrawal_balance * (withdrawal_rate / 100)
-st.markdown(f"**Estimated Annual TSP Income:** ${tsp_annual_income:,.2f}")
-tsp_annual_income = tsp_withdrawal_balance * (withdrawal_rate / 100)
+# --- SEPP (72(t)) Plan ---
+sepp_method, sepp_rate, sepp_beneficiary_age = SEPP_AMORTIZATION, SEPP_RATE, None
+sepp_plan = tsp_option == TSP_SEPP and current_age < SEPP_END_AGE
+if sepp_plan:
+    sepp_method = st.radio(
+        "SEPP Payment Method",
+        SEPP_METHODS,
+        index=SEPP_METHODS.index(SEPP_AMORTIZATION),
+        format_func=SEPP_METHOD_LABELS.get,
+        horizontal=True,
+        help="The IRS 72(t) method that sets your annual payment. The RMD method recalculates the payment every year; fixed amortization and fixed annuitization keep the first year's payment.",
+        key="sepp_method"
+    )
+    sepp_rate = st.number_input(
+        "SEPP Interest Rate (%)",
+        min_value=0.0,
+        max_value=10.0,
+        value=SEPP_RATE * 100,
+        step=0.1,
+        help="Any rate up to the greater of 5% or 120% of the federal mid-term rate for either of the two months before the first payment (IRS Notice 2022-6).",
+        key="sepp_rate"
+    ) / 100.0
+    if st.checkbox(
+            "Use the joint life table with a beneficiary",
+            value=False,
+            help="Joint and last survivor life expectancy lengthens the payout period and lowers the payment.",
+            key="sepp_joint"):
+        sepp_beneficiary_age = st.number_input(
+            "Beneficiary Age",
+            min_value=0,
+            max_value=120,
+            value=50,
+            step=1,
+            key="sepp_beneficiary_age"
+        )
+
+timer.start("tsp_penalty")
+# The TSP tax depends on the rest of your retirement income; filled in once the profile is evaluated below.
+tsp_section = st.container()
+
+if sepp_plan:
+    sepp_options = sepp_payments(tsp_balance, current_age, sepp_rate, sepp_beneficiary_age)
+    st.markdown("**SEPP Payment by Method (before tax):**")
+    st.dataframe(pd.DataFrame({
+        "Method": [SEPP_METHOD_LABELS[m] for m in SEPP_METHODS],
+        "Annual Payment": [float(sepp_options[m]) for m in SEPP_METHODS],
+        "Monthly Payment": [float(sepp_options[m]) / 12 for m in SEPP_METHODS],
+    }).style.format({"Annual Payment": "${:,.2f}", "Monthly Payment": "${:,.2f}"}), hide_index=True)
+
+    with st.expander(f"📅 SEPP Payment Schedule ({sepp_years(current_age)} years, until 59½ or for at least 5 years)"):
+        st.caption("Payments are taken at each year end and the balance is assumed to earn the SEPP interest rate. "
+                   "Changing the payments before the plan ends applies the 10% penalty, with interest, to every "
+                   "earlier payment.")
+        df_sepp = pd.DataFrame(sepp_schedule(
+            tsp_balance, current_age, sepp_rate, beneficiary_age=sepp_beneficiary_age).to_columns())
+        st.dataframe(df_sepp.style.format(
+            {column: "${:,.2f}" for column in df_sepp.columns if column not in ("Year", "Age")}), hide_index=True)
 
 # --- FEHB / CHAMPVA & FEGLI Selection ---
+timer.start("inputs")
 st.markdown("### FEHB / CHAMPVA & FEGLI Selection")
 health_coverage_choice = st.radio(
     "Select your primary health coverage:",
     ("None", "FEHB", "CHAMPVA"),
-    help="Choose 'None' if you do not have primary coverage, 'FEHB' if you are enrolled in the Federal Employees Health Benefits program, or 'CHAMPVA' if you're covered under the CHAMPVA program."
+    help="Choose 'None' if you do not have primary coverage, 'FEHB' if you are enrolled in the Federal Employees Health Benefits program, or 'CHAMPVA' if you're covered under the CHAMPVA program.",
+    key="health_coverage_choice"
 )
 
+fehb_plan = "Self Only"
 if health_coverage_choice == "None":
-    fehb_premium = 0
     st.markdown(
         "No primary coverage selected. Make sure this matches your real situation.")
 elif health_coverage_choice == "FEHB":
@@ -316,14 +472,13 @@ elif health_coverage_choice == "FEHB":
     fehb_plan = st.selectbox(
         "FEHB Plan Type",
         ["Self Only", "Self + One", "Family"],
-        help="Select the plan type for FEHB. 'Self Only' covers you alone, 'Self + One' covers you and one dependent, and 'Family' covers your entire family."
+        help="Select the plan type for FEHB. 'Self Only' covers you alone, 'Self + One' covers you and one dependent, and 'Family' covers your entire family.",
+        key="fehb_plan"
     )
-    fehb_costs = {"Self Only": 300, "Self + One": 550, "Family": 750}
-    fehb_premium = fehb_costs[fehb_plan]
     st.markdown(
-        f"**Selected FEHB Plan:** {fehb_plan}, Monthly Premium = ${fehb_premium}")
+        f"**Selected FEHB Plan:** {fehb_plan}, Monthly Premium = ${params.fehb_costs[fehb_plan]}")
 elif health_coverage_choice == "CHAMPVA":
-    fehb_premium = 0  # For simulation: No FEHB cost if using CHAMPVA
+    # For simulation: No FEHB cost if using CHAMPVA
     st.markdown(
         """
     **CHAMPVA** (Civilian Health and Medical Program of the Department of Veterans Affairs)
@@ -338,21 +493,19 @@ elif health_coverage_choice == "CHAMPVA":
 
 fegli_option = st.selectbox(
     "FEGLI Option",
-    ["None", "Basic", "Basic + Option A", "Basic + Option B"],
-    help="Select your FEGLI option. 'Basic' is the standard coverage, while 'Basic + Option A' and 'Basic + Option B' offer additional benefits at higher premiums."
+    list(params.fegli_costs),
+    help="Select your FEGLI option. 'Basic' is the standard coverage, while 'Basic + Option A' and 'Basic + Option B' offer additional benefits at higher premiums.",
+    key="fegli_option"
 )
-fegli_costs = {
-    "None": 0,
-    "Basic": 50,
-    "Basic + Option A": 70,
-    "Basic + Option B": 90}
-fegli_premium = fegli_costs[fegli_option]
+fehb_premium, fegli_premium = health_premiums(
+    health_coverage_choice, fehb_plan, fegli_option, tricare_selected, params)
 
 monthly_expenses = st.number_input(
     "Other Monthly Living Expenses ($)",
     min_value=0,
     value=3000,
-    help="Enter your average monthly living expenses (e.g., housing, food, utilities, etc.)."
+    help="Enter your average monthly living expenses (e.g., housing, food, utilities, etc.).",
+    key="monthly_expenses"
 )
 
 # --- VA Disability & Disability Retirement Option ---
@@ -361,49 +514,53 @@ va_monthly = st.number_input(
     "Monthly VA Disability Payment ($)",
     min_value=0,
     value=0,
-    help="Enter the monthly VA disability payment amount. Use 0 if not applicable."
+    help="Enter the monthly VA disability payment amount. Use 0 if not applicable.",
+    key="va_monthly"
 )
 
 st.markdown("### Disability Retirement")
 disability_retirement = st.checkbox(
     "Apply FERS Disability Retirement Calculation Instead?",
-    help="Check this box if you plan to retire on disability, which uses a different pension calculation."
+    help="Check this box if you plan to retire on disability, which uses a different pension calculation.",
+    key="disability_retirement"
 )
 
 # --- SRS Calculation ---
-srs = (years_service / 40) * \
-    (1800 * 12) if current_age < 62 and years_service >= 20 else 0
+srs = special_retirement_supplement(current_age, years_service, params)
 srs_annual = srs if current_age < 62 else 0
 
 
 # --- Separation Incentives: VERA / VSIP / DRP Options ---
 st.markdown("### Separation Incentives")
-vera_elected = st.checkbox(
+vera_incentive_elected = st.checkbox(
     "Elect Voluntary Early Retirement Authority (VERA)?",
-    help="Check this if you're eligible for VERA retirement (e.g., 20 years at age 50 or 25 years at any age)."
+    help="Check this if you're eligible for VERA retirement (e.g., 20 years at age 50 or 25 years at any age).",
+    key="vera_incentive_elected"
 )
 vsip_amount = st.number_input(
     "VSIP Offer Amount ($, if applicable)",
     min_value=0,
-    help="Enter the lump sum offered under the VSIP program, if applicable."
+    help="Enter the lump sum offered under the VSIP program, if applicable.",
+    key="vsip_amount"
 )
 drp_elected = st.checkbox(
     "Participating in DoD Deferred Resignation Program (DRP)?",
-    help="Check this if you're participating in DRP, which may include paid administrative leave."
+    help="Check this if you're participating in DRP, which may include paid administrative leave.",
+    key="drp_elected"
 )
 
-total_admin_leave_income = 0  # default if DRP not selected
+months_of_leave = 4  # default if DRP not selected
 
-if vera_elected:
+if vera_incentive_elected:
     st.info("You have selected VERA: early retirement available with 20 years at age 50 or 25 years at any age.")
 if drp_elected:
-    st.info("You have elected the DRP. You may enter paid administrative leave beginning May 1, 2025.")
+    st.info(
+        f"You have elected the DRP. You may enter paid administrative leave beginning {params.drp_leave_start:%B %-d, %Y}.")
     st.warning(
-        "⚠️ You must separate from federal service by September 30, 2025 under DRP rules.")
+        f"⚠️ You must separate from federal service by {params.drp_separation_deadline:%B %-d, %Y} under DRP rules.")
 if vsip_amount > 0:
     st.success(
-        f"VSIP Lump Sum: ${
-            vsip_amount:,.2f} will be added to your cash flow model.")
+        f"VSIP Lump Sum: ${vsip_amount:,.2f} will be added to your cash flow model.")
 
 # --- DRP Admin Leave Simulation ---
 if drp_elected:
@@ -413,44 +570,30 @@ if drp_elected:
         min_value=1,
         max_value=5,
         value=4,
-        help="Select the number of months you will receive paid leave if participating in DRP."
+        help="Select the number of months you will receive paid leave if participating in DRP.",
+        key="months_of_leave"
     )
-    monthly_salary = high3_salary / 12
-    total_admin_leave_income = months_of_leave * monthly_salary
+    total_admin_leave_income = admin_leave_income(high3_salary, drp_elected, months_of_leave)
     st.write(
-        f"**Estimated Admin Leave Income (Before Final Separation):** ${
-            total_admin_leave_income:,.2f}")
+        f"**Estimated Admin Leave Income (Before Final Separation):** ${total_admin_leave_income:,.2f}")
 
 # --- Pension Calculations & Scenario Selection ---
-if retirement_eligibility == "Not Eligible":
-    fers_regular = 0
-    fers_disability = 0
-    monthly_regular = 0
-    monthly_disability = 0
-else:
-    fers_regular = high3_salary * 0.01 * years_service * 0.9
-    fers_disability = high3_salary * (0.6 if current_age < 62 else 0.4)
-    monthly_regular = round(fers_regular / 12, 2)
-    monthly_disability = round(fers_disability / 12, 2)
-
-if disability_retirement:
-    selected_fers_income = fers_disability
-    selected_monthly_income = monthly_disability
-    pension_label = "Disability Retirement"
-else:
-    selected_fers_income = fers_regular
-    selected_monthly_income = monthly_regular
-    pension_label = "Regular FERS Retirement"
+timer.start("pension_breakdown")
+fers_regular, fers_disability = fers_pensions(
+    high3_salary, years_service, current_age, retirement_eligibility == "Eligible", params)
+monthly_regular = round(fers_regular / 12, 2)
+monthly_disability = round(fers_disability / 12, 2)
 
 with st.expander("🔎 Pension Calculation Breakdown"):
     st.markdown("**Regular FERS Pension Calculation:**")
     st.markdown(
-        f"High-3 Salary * 1% * Years of Service * 0.9 = {high3_salary} * 0.01 * {years_service} * 0.9 = ${
-            fers_regular:,.2f}")
+        f"High-3 Salary * {params.fers_multiplier:.0%} * Years of Service * {params.fers_reduction_factor:g} = "
+        f"{high3_salary} * {params.fers_multiplier:g} * {years_service} * {params.fers_reduction_factor:g} = ${fers_regular:,.2f}")
     st.markdown("**Disability FERS Pension Calculation:**")
+    disability_rate = params.disability_rate_under_62 if current_age < 62 else params.disability_rate_62_plus
     st.markdown(
-        f"High-3 Salary * (0.6 if {current_age} < 62 else 0.4) = {high3_salary} * (0.6) = ${
-            fers_disability:,.2f}")
+        f"High-3 Salary * ({params.disability_rate_under_62:g} if {current_age} < 62 else "
+        f"{params.disability_rate_62_plus:g}) = {high3_salary} * {disability_rate:g} = ${fers_disability:,.2f}")
 
 # --- What-if Comparison: Disability vs. Regular Retirement (Enhanced) ---
 st.markdown("### 🧮 What-if Comparison: Disability vs. Regular Retirement")
@@ -459,7 +602,7 @@ st.markdown("### 🧮 What-if Comparison: Disability vs. Regular Retirement")
 show_diff = st.checkbox(
     "Show Percentage Difference between Scenarios",
     value=True,
-    help="Toggle to display the percentage difference in annual pension between Disability and Regular FERS scenarios.")
+    help="Toggle to display the percentage difference in annual pension between Disability and Regular FERS scenarios.", key="show_diff")
 
 comparison_data = {
     "Scenario": ["Regular FERS Retirement", "Disability Retirement"],
@@ -496,47 +639,56 @@ df_compare = df_compare.style.format({
 st.dataframe(df_compare, use_container_width=True)
 
 # --- Pro/Con Analysis for Retirement Scenarios ---
-st.markdown("### Pro/Con Analysis for Retirement Scenarios")
-st.markdown("Define your priorities for retirement decisions below:")
-priority_income = st.slider(
-    "Importance of Immediate Income (1-10)",
-    min_value=1, max_value=10, value=5,
-    help="How important is having immediate cash flow after retirement?"
-)
-priority_security = st.slider(
-    "Importance of Long-Term Security (1-10)",
-    min_value=1, max_value=10, value=5,
-    help="How important is a stable, long-term pension benefit?"
-)
-priority_flexibility = st.slider(
-    "Importance of Flexibility (1-10)",
-    min_value=1, max_value=10, value=5,
-    help="How important is having flexibility in retirement options?"
-)
+@fragment("pro_con")
+def pro_con_analysis():
+    st.markdown("### Pro/Con Analysis for Retirement Scenarios")
+    st.markdown("Define your priorities for retirement decisions below:")
+    priority_income = st.slider(
+        "Importance of Immediate Income (1-10)",
+        min_value=1, max_value=10, value=5,
+        help="How important is having immediate cash flow after retirement?",
+        key="priority_income"
+    )
+    priority_security = st.slider(
+        "Importance of Long-Term Security (1-10)",
+        min_value=1, max_value=10, value=5,
+        help="How important is a stable, long-term pension benefit?",
+        key="priority_security"
+    )
+    priority_flexibility = st.slider(
+        "Importance of Flexibility (1-10)",
+        min_value=1, max_value=10, value=5,
+        help="How important is having flexibility in retirement options?",
+        key="priority_flexibility"
+    )
+
+    # Create sample pro/con data for demonstration
+    pro_con_data = {
+        "Scenario": [
+            "Regular FERS Retirement",
+            "Disability Retirement",
+            "VERA",
+            "DRP"
+        ],
+        "Pros": [
+            f"Steady pension; meets long-term security (Income Score: {priority_income})",
+            f"Higher initial payout and potential SRS boost (Income Score: {priority_income + 1})",
+            f"Early retirement with strong benefits (Flexibility Score: {priority_flexibility})",
+            f"Additional lump sum and admin leave income (Security Score: {priority_security})"
+        ],
+        "Cons": [
+            f"Lower early payout; slower growth (Risk Score: {10 - priority_income})",
+            f"Reduced pension multiplier if under 62 (Risk Score: {10 - priority_security})",
+            f"Requires strict service criteria; uncertain outcomes (Flexibility Risk: {10 - priority_flexibility})",
+            f"Complex rules and potential short-term income gap (Overall Risk: {10 - (priority_income + priority_security) // 2})"
+        ]
+    }
+    df_pro_con = pd.DataFrame(pro_con_data)
+    st.dataframe(df_pro_con, use_container_width=True)
 
-# Create sample pro/con data for demonstration
-pro_con_data = {
-    "Scenario": [
-        "Regular FERS Retirement",
-        "Disability Retirement",
-        "VERA",
-        "DRP"
-    ],
-    "Pros": [
-        f"Steady pension; meets long-term security (Income Score: {priority_income})",
-        f"Higher initial payout and potential SRS boost (Income Score: {priority_income + 1})",
-        f"Early retirement with strong benefits (Flexibility Score: {priority_flexibility})",
-        f"Additional lump sum and admin leave income (Security Score: {priority_security})"
-    ],
-    "Cons": [
-        f"Lower early payout; slower growth (Risk Score: {10 - priority_income})",
-        f"Reduced pension multiplier if under 62 (Risk Score: {10 - priority_security})",
-        f"Requires strict service criteria; uncertain outcomes (Flexibility Risk: {10 - priority_flexibility})",
-        f"Complex rules and potential short-term income gap (Overall Risk: {10 - (priority_income + priority_security) // 2})"
-    ]
-}
-df_pro_con = pd.DataFrame(pro_con_data)
-st.dataframe(df_pro_con, use_container_width=True)
+
+timer.start("pro_con_and_wages")
+pro_con_analysis()
 
 # --- Career Continuation vs. Retirement Wage Analysis ---
 st.markdown("### Career Continuation vs. Retirement Wage Analysis")
@@ -545,36 +697,41 @@ st.markdown("Enter your current career details to compare potential continued wa
 current_grade = st.number_input(
     "Enter your current grade",
     min_value=1, max_value=20, value=10,
-    help="Your current federal grade level."
+    help="Your current federal grade level.",
+    key="current_grade"
 )
 current_step = st.number_input(
     "Enter your current step",
     min_value=1, max_value=10, value=5,
-    help="Your current step within your grade."
+    help="Your current step within your grade.",
+    key="current_step"
 )
 local_wage = st.number_input(
     "Enter your current annual local wage ($)",
     min_value=0, value=60000,
-    help="Your current annual salary based on local cost of living."
+    help="Your current annual salary based on local cost of living.",
+    key="local_wage"
 )
 
 show_retirement_wage_section = st.checkbox(
     "Do you plan to earn income after retirement?",
     value=True,
-    help="Check this if you plan to earn wages after retirement. This section will calculate projected income."
+    help="Check this if you plan to earn wages after retirement. This section will calculate projected income.",
+    key="show_retirement_wage_section"
 )
 
+expected_retirement_multiplier = 0.0  # no post-retirement wage
 if show_retirement_wage_section:
     expected_retirement_multiplier = st.slider(
         "Expected Retirement Wage Multiplier",
         min_value=0.0, max_value=2.0, value=1.0, step=0.1,
-        help="A multiplier for estimating retirement wage vs. current wage. Set to 0 to simulate no post-retirement wage."
+        help="A multiplier for estimating retirement wage vs. current wage. Set to 0 to simulate no post-retirement wage.",
+        key="expected_retirement_multiplier"
     )
 
     # Hypothetical formulas (adjust these as needed)
-    estimated_retirement_wage = local_wage * expected_retirement_multiplier
-    projected_career_wage = local_wage + \
-        (current_grade * current_step * 1000)  # Example formula
+    estimated_retirement_wage, projected_career_wage = career_wages(
+        local_wage, expected_retirement_multiplier, current_grade, current_step)
 
     wage_comparison = {
         "Category": [
@@ -597,23 +754,27 @@ if show_retirement_wage_section:
 
 
 # --- Additional Expense Inputs (Enhanced) ---
+timer.start("inputs")
 debt_payments = st.number_input(
     "Monthly Debt Payments ($)",
     min_value=0,
     value=0,
-    help="Enter your total monthly debt payments (e.g., loans, credit card payments)."
+    help="Enter your total monthly debt payments (e.g., loans, credit card payments).",
+    key="debt_payments"
 )
 healthcare_expenses = st.number_input(
     "Monthly Healthcare Expenses ($)",
     min_value=0,
     value=0,
-    help="Enter your estimated monthly healthcare costs not covered by insurance."
+    help="Enter your estimated monthly healthcare costs not covered by insurance.",
+    key="healthcare_expenses"
 )
 additional_taxes = st.number_input(
-    "Estimated Annual Additional Taxes ($)",
+    "Other Annual Taxes ($)",
     min_value=0,
     value=0,
-    help="Enter any additional annual taxes not included in your regular expense calculations."
+    help="Property, local or other annual taxes. Federal and state income taxes are calculated from your filing status and state.",
+    key="additional_taxes"
 )
 
 # --- Currency Selection ---
@@ -621,42 +782,70 @@ currency_symbol = st.selectbox(
     "Select Currency Symbol",
     options=["$", "€", "£", "¥"],
     index=0,
-    help="Choose your currency symbol for displaying amounts."
+    help="Choose your currency symbol for displaying amounts.",
+    key="currency_symbol"
 )
 
 # --- Enhanced Financial Summary & Net Cash Flow ---
+timer.start("income_summary")
 st.markdown("### 📋 Total Pre-Retirement Income Summary")
 
-income_labels = ["VSIP Lump Sum"]
-income_values = [vsip_amount]
-
-if disability_retirement:
-    income_labels.append("Annual FERS Pension (Disability Retirement)")
-    income_values.append(fers_disability)
-else:
-    income_labels.append("Annual FERS Pension (Regular FERS Retirement)")
-    income_values.append(fers_regular)
-    if srs_annual > 0:
-        income_labels.append("Special Retirement Supplement (SRS)")
-        income_values.append(srs_annual)
+profile = RetirementProfile(
+    current_age=current_age,
+    years_service=years_service,
+    high3_salary=high3_salary,
+    tsp_balance=tsp_balance,
+    tsp_contribution_pct=tsp_contribution_pct,
+    retirement_eligible=retirement_eligibility == "Eligible",
+    tsp_option=tsp_option,
+    public_safety_employee=public_safety_employee,
+    vera_elected=vera_elected,
+    withdrawal_rate=withdrawal_rate / 100,
+    sepp_method=sepp_method,
+    sepp_rate=sepp_rate,
+    sepp_beneficiary_age=sepp_beneficiary_age,
+    health_coverage=health_coverage_choice,
+    fehb_plan=fehb_plan,
+    tricare=tricare_selected,
+    fegli_option=fegli_option,
+    monthly_expenses=monthly_expenses,
+    debt_payments=debt_payments,
+    healthcare_expenses=healthcare_expenses,
+    additional_taxes=additional_taxes,
+    filing_status=filing_status,
+    state=state_tax,
+    va_monthly=va_monthly,
+    military_retirement_pay=included_military_pay,
+    disability_retirement=disability_retirement,
+    vsip_amount=vsip_amount,
+    drp_elected=drp_elected,
+    drp_leave_months=months_of_leave,
+    current_grade=current_grade,
+    current_step=current_step,
+    local_wage=local_wage,
+    retirement_wage_multiplier=expected_retirement_multiplier,
+    plan_year=plan_year,
+)
+result = result_cache.get(plan_years.version, evaluate, profile)
 
-if va_monthly > 0:
-    income_labels.append("Annual VA Disability")
-    income_values.append(va_monthly * 12)
+with tsp_section:
+    if result.tsp.penalty_charged:
+        st.warning(
+            f"⚠️ You will incur a {params.tsp_early_withdrawal_penalty:.0%} early withdrawal penalty based on your current age and retirement type.")
 
-# Recalculate total
-total_preretirement_income = sum(income_values)
+    st.info(result.tsp.note)
+    st.markdown(f"**Estimated Annual TSP Income:** ${result.tsp.annual_income:,.2f} "
+                f"(after an estimated {result.tsp.tax_rate:.1%} income tax on distributions)")
 
-# Optional: Reset Button to Clear Income Sources
-if st.button("🔄 Reset Income Sources"):
-    st.session_state.income_labels = []
-    st.session_state.income_values = []
-    st.experimental_rerun()
+# Upsert this run's sources by name; reruns never grow the ledger.
+income_ledger = st.session_state.income_ledger
+income_ledger.sync(result.income_items)
+total_preretirement_income = result.total_preretirement_income
 
 # Display summary
 summary_data = {
-    "Income Type": st.session_state.income_labels,
-    "Amount": st.session_state.income_values,
+    "Income Type": [name for name, _ in income_ledger.items()],
+    "Amount": [amount for _, amount in income_ledger.items()],
 }
 
 summary_df = pd.DataFrame(summary_data)
@@ -666,141 +855,163 @@ st.dataframe(summary_df.style.format(
 st.success(
     f"**Combined Pre-Retirement Income:** {currency_symbol}{total_preretirement_income:,.2f}")
 
-# Update total expenses to include additional categories
-base_expenses = (fegli_premium + fehb_premium + monthly_expenses) * 12
-debt_expenses = debt_payments * 12
-healthcare_total = healthcare_expenses * 12
-total_expenses = base_expenses + debt_expenses + \
-    healthcare_total + additional_taxes
-
-net_cash = total_preretirement_income - total_expenses
+total_expenses = result.total_expenses
+net_cash = result.net_cash
 
 st.markdown("### 💰 Net Cash After Expenses")
+st.markdown(
+    f"**Estimated Income Tax:** {currency_symbol}{result.income_tax:,.2f} "
+    f"(Federal {currency_symbol}{result.federal_tax:,.2f}, State {currency_symbol}{result.state_tax:,.2f}; "
+    f"marginal rate {result.marginal_tax_rate:.1%})")
 st.info(
-    f"**Annual Expenses (Insurance + Living + Debt + Healthcare + Taxes):** {currency_symbol}{
-        total_expenses:,.2f}")
+    f"**Annual Expenses (Insurance + Living + Debt + Healthcare + Taxes):** {currency_symbol}{total_expenses:,.2f}")
 if net_cash >= 0:
     st.success(f"**Net Cash Flow:** {currency_symbol}{net_cash:,.2f}")
 else:
     st.error(f"**Net Cash Flow:** {currency_symbol}{net_cash:,.2f}")
 
+# --- Plan Year Comparison ---
+if len(plan_years.years) > 1:
+    with st.expander("📅 Compare Plan Years"):
+        st.markdown("The same inputs evaluated under each plan year's premiums, thresholds and factors.")
+        year_results = {year: result_cache.get(plan_years.version, evaluate, replace(profile, plan_year=year)) for year in sorted(plan_years.years)}
+        df_years = pd.DataFrame({
+            "Plan Year": list(year_results),
+            "FEHB Premium (Monthly)": [r.fehb_premium for r in year_results.values()],
+            "FEGLI Premium (Monthly)": [r.fegli_premium for r in year_results.values()],
+            "Annual Pension": [r.selected_fers_income for r in year_results.values()],
+            "SRS (Annual)": [r.srs_annual for r in year_results.values()],
+            "Total Income": [r.total_preretirement_income for r in year_results.values()],
+            "Income Tax": [r.income_tax for r in year_results.values()],
+            "Total Expenses": [r.total_expenses for r in year_results.values()],
+            "Net Cash Flow": [r.net_cash for r in year_results.values()],
+        })
+        df_years["Change vs. Selected"] = df_years["Net Cash Flow"] - net_cash
+        st.dataframe(df_years.style.format(
+            {c: f"{currency_symbol}{{:,.2f}}" for c in df_years.columns if c != "Plan Year"}),
+            hide_index=True, use_container_width=True)
+
 # --- Graphical Visualization: Income vs. Expenses ---
 st.markdown("### 📊 Income vs. Expenses Comparison")
-fig_income, ax_income = plt.subplots()
 categories = ['Total Income', 'Total Expenses']
 values = [total_preretirement_income, total_expenses]
 colors = ['green', 'red']
-ax_income.bar(categories, values, color=colors)
-ax_income.set_title("Total Income vs. Total Expenses")
-ax_income.set_ylabel(f"Amount ({currency_symbol})")
-st.pyplot(fig_income)
+show_chart(chart_spec(
+    "Total Income vs. Total Expenses",
+    ylabel=f"Amount ({currency_symbol})",
+    bars={"x": categories, "height": values, "color": colors},
+))
 
 
 # --- Contractor Toolkit Section with SRS Earnings Test ---
-with st.expander("🛠 Contractor Toolkit (SRS Impact)"):
-    st.markdown("### Contractor Income Analysis & SRS Earnings Test")
-
-    contractor_role = st.text_input(
-        "Contractor Role",
-        "Federal Compliance Consultant",
-        help="Enter your role as a contractor (e.g., Federal Compliance Consultant).")
-    hourly_rate = st.number_input(
-        "Hourly Rate ($)",
-        min_value=0,
-        value=120,
-        help="Enter your hourly rate as a contractor."
-    )
-    hours_per_week = st.number_input(
-        "Hours per Week",
-        min_value=0,
-        value=25,
-        help="Enter the number of hours you work per week as a contractor."
-    )
-    weekly_overhead = st.number_input(
-        "Weekly Overhead Costs ($)",
-        min_value=0,
-        value=200,
-        help="Enter your estimated weekly overhead costs (e.g., equipment, travel, etc.)."
-    )
+# The toolkit's inputs are kept in this session dict rather than read back from its widgets,
+# so downloads generated on click see changes made by fragment-only reruns.
+contractor_inputs = st.session_state.setdefault("contractor_inputs", {})
 
-    # Calculate annual contractor income components
-    annual_gross = hourly_rate * hours_per_week * 52
-    annual_overhead = weekly_overhead * 52
-    contractor_net_income = annual_gross - annual_overhead
 
-    st.markdown(f"**Annual Gross Contractor Income:** ${annual_gross:,.2f}")
-    st.markdown(f"**Annual Overhead Costs:** ${annual_overhead:,.2f}")
-    if contractor_net_income >= 0:
-        st.success(f"**Net Contractor Income:** ${contractor_net_income:,.2f}")
-    else:
-        st.error(f"**Net Contractor Income:** ${contractor_net_income:,.2f}")
-
-    # SRS Earnings Test: Option to apply the test
-    apply_srs_earnings_test = st.checkbox(
-        "Apply FERS SRS earnings test to contractor income?",
-        help="Check this if you want to see how contractor income may reduce your SRS benefit.")
-    earnings_test_threshold = 21240  # This threshold can be updated as needed.
-
-    srs_offset = 0
-    adjusted_srs = srs_annual  # Start with no offset.
-    if apply_srs_earnings_test and srs_annual > 0:
-        if contractor_net_income > earnings_test_threshold:
-            over_threshold = contractor_net_income - earnings_test_threshold
-            # For every $2 over the threshold, reduce SRS by $1.
-            srs_offset = over_threshold / 2
-        adjusted_srs = max(0, srs_annual - srs_offset)
-
-        st.markdown("---")
-        st.markdown(f"**Original SRS:** ${srs_annual:,.2f}")
-        st.markdown(
-            f"**Earnings Test Threshold:** ${earnings_test_threshold:,.2f}")
-        st.markdown(
-            f"**SRS Reduction Due to Contractor Income:** ${srs_offset:,.2f}")
-        st.markdown(f"**Adjusted SRS:** ${adjusted_srs:,.2f}")
-
-    # Calculate adjusted retirement income and net cash flow with SRS
-    # modification
-    srs_delta = adjusted_srs - srs_annual
-    adjusted_retirement_income = total_preretirement_income + srs_delta
-    adjusted_net_cash = adjusted_retirement_income - total_expenses
-
-    if apply_srs_earnings_test and srs_offset > 0:
-        st.info(
-            f"**Adjusted Retirement Net Cash Flow (with SRS reduction): ${adjusted_net_cash:,.2f}**")
-    else:
-        st.info(
-            f"**Retirement Net Cash Flow (unchanged): ${adjusted_net_cash:,.2f}**")
-
-    # Comparison Chart: Adjusted Retirement vs. Contractor Income
-    st.markdown("### Comparison: Adjusted Retirement vs. Contractor Income")
-    incomes = {
-        "Retirement Net Cash (Adj.)": adjusted_net_cash,
-        "Contractor Net Income": contractor_net_income,
-    }
-    comp_df2 = pd.DataFrame(
-        list(
-            incomes.items()),
-        columns=[
-            "Income Source",
-            "Amount"])
-
-    fig3, ax3 = plt.subplots()
-    colors = ["green" if adjusted_net_cash >= 0 else "red", "blue"]
-    ax3.bar(comp_df2["Income Source"], comp_df2["Amount"], color=colors)
-    ax3.set_ylabel("Amount ($)")
-    ax3.set_title("Income Comparison: Adjusted Retirement vs. Contractor")
-    st.pyplot(fig3)
-
-    # Save contractor data to session state for later exports (CSV/PDF)
-    st.session_state["contractor_role"] = contractor_role
-    st.session_state["contractor_net_income"] = contractor_net_income
-    st.session_state["contractor_gross_income"] = annual_gross
-    st.session_state["contractor_overhead"] = annual_overhead
-    st.session_state["srs_offset"] = srs_offset
-    st.session_state["adjusted_srs"] = adjusted_srs
-    st.session_state["adjusted_retirement_income"] = adjusted_retirement_income
-    st.session_state["adjusted_net_cash"] = adjusted_net_cash
+def contractor_profile(profile):
+    return replace(profile, **contractor_inputs)
+
+
+@fragment("contractor_toolkit")
+def contractor_toolkit(profile, srs_annual, params):
+    with st.expander("🛠 Contractor Toolkit (SRS Impact)"):
+        st.markdown("### Contractor Income Analysis & SRS Earnings Test")
 
+        contractor_role = st.text_input(
+            "Contractor Role",
+            "Federal Compliance Consultant",
+            help="Enter your role as a contractor (e.g., Federal Compliance Consultant).", key="contractor_role")
+        hourly_rate = st.number_input(
+            "Hourly Rate ($)",
+            min_value=0,
+            value=120,
+            help="Enter your hourly rate as a contractor.",
+            key="hourly_rate"
+        )
+        hours_per_week = st.number_input(
+            "Hours per Week",
+            min_value=0,
+            value=25,
+            help="Enter the number of hours you work per week as a contractor.",
+            key="hours_per_week"
+        )
+        weekly_overhead = st.number_input(
+            "Weekly Overhead Costs ($)",
+            min_value=0,
+            value=200,
+            help="Enter your estimated weekly overhead costs (e.g., equipment, travel, etc.).",
+            key="weekly_overhead"
+        )
+
+        # Calculate annual contractor income components
+        annual_gross, annual_overhead, contractor_net_income = contractor_income(
+            hourly_rate, hours_per_week, weekly_overhead)
+
+        st.markdown(f"**Annual Gross Contractor Income:** ${annual_gross:,.2f}")
+        st.markdown(f"**Annual Overhead Costs:** ${annual_overhead:,.2f}")
+        if contractor_net_income >= 0:
+            st.success(f"**Net Contractor Income:** ${contractor_net_income:,.2f}")
+        else:
+            st.error(f"**Net Contractor Income:** ${contractor_net_income:,.2f}")
+
+        # SRS Earnings Test: Option to apply the test
+        apply_srs_earnings_test = st.checkbox(
+            "Apply FERS SRS earnings test to contractor income?",
+            help="Check this if you want to see how contractor income may reduce your SRS benefit.", key="apply_srs_earnings_test")
+
+        contractor_inputs.update(
+            hourly_rate=hourly_rate,
+            hours_per_week=hours_per_week,
+            weekly_overhead=weekly_overhead,
+            apply_srs_earnings_test=apply_srs_earnings_test,
+            contractor_role=contractor_role,
+        )
+        result = result_cache.get(plan_years.version, evaluate, contractor_profile(profile))
+        srs_offset = result.contractor.srs_offset
+        adjusted_srs = result.contractor.adjusted_srs
+        adjusted_net_cash = result.contractor.adjusted_net_cash
+
+        if apply_srs_earnings_test and srs_annual > 0:
+            st.markdown("---")
+            st.markdown(f"**Original SRS:** ${srs_annual:,.2f}")
+            st.markdown(
+                f"**Earnings Test Threshold:** ${params.earnings_test_threshold:,.2f}")
+            st.markdown(
+                f"**SRS Reduction Due to Contractor Income:** ${srs_offset:,.2f}")
+            st.markdown(f"**Adjusted SRS:** ${adjusted_srs:,.2f}")
+
+        if apply_srs_earnings_test and srs_offset > 0:
+            st.info(
+                f"**Adjusted Retirement Net Cash Flow (with SRS reduction): ${adjusted_net_cash:,.2f}**")
+        else:
+            st.info(
+                f"**Retirement Net Cash Flow (unchanged): ${adjusted_net_cash:,.2f}**")
+
+        # Comparison Chart: Adjusted Retirement vs. Contractor Income
+        st.markdown("### Comparison: Adjusted Retirement vs. Contractor Income")
+        incomes = {
+            "Retirement Net Cash (Adj.)": adjusted_net_cash,
+            "Contractor Net Income": contractor_net_income,
+        }
+        comp_df2 = pd.DataFrame(
+            list(
+                incomes.items()),
+            columns=[
+                "Income Source",
+                "Amount"])
+
+        colors = ["green" if adjusted_net_cash >= 0 else "red", "blue"]
+        show_chart(chart_spec(
+            "Income Comparison: Adjusted Retirement vs. Contractor",
+            ylabel="Amount ($)",
+            bars={"x": comp_df2["Income Source"], "height": comp_df2["Amount"], "color": colors},
+        ))
+
+
+timer.start("contractor_toolkit")
+contractor_toolkit(profile, srs_annual, params)
+profile = contractor_profile(profile)
 
 # --- Federal Independent Contractor Steps (Enhanced) ---
 with st.expander("🧷 Federal Independent Contractor Steps"):
@@ -851,8 +1062,13 @@ Select a question below to get detailed advice or insights through our GPT assis
     )
     st.markdown(f"**Selected Prompt for GPT:** {selected_prompt}")
 
+
 # --- Export Detailed Calculation Data as CSV ---
-with st.expander("📤 Export Detailed Calculation Data"):
+def detailed_csv(profile):
+    # Built when the button is clicked, with the contractor inputs current at that moment.
+    usage.hit("download:summary_csv")
+    profile = contractor_profile(profile)
+    result = result_cache.get(plan_years.version, evaluate, profile)
     data = {
         "Metric": [
             "Current Age",
@@ -880,406 +1096,611 @@ with st.expander("📤 Export Detailed Calculation Data"):
             "Adjusted Retirement Net Cash",
         ],
         "Value": [
-            current_age,
-            years_service,
-            high3_salary,
-            tsp_balance,
-            tsp_contribution_pct,
-            fers_regular,
-            fers_disability,
-            selected_fers_income,
-            srs_annual,
-            va_monthly * 12,
-            vsip_amount,
-            total_preretirement_income,
-            total_expenses,
-            net_cash,
-            tsp_withdrawal_balance,
-            tsp_annual_income,
-            st.session_state.get("contractor_role", "N/A"),
-            st.session_state.get("contractor_gross_income", 0),
-            st.session_state.get("contractor_overhead", 0),
-            st.session_state.get("contractor_net_income", 0),
-            st.session_state.get("srs_offset", 0),
-            st.session_state.get("adjusted_srs", 0),
-            st.session_state.get("adjusted_net_cash", net_cash),
+            profile.current_age,
+            profile.years_service,
+            profile.high3_salary,
+            profile.tsp_balance,
+            profile.tsp_contribution_pct,
+            result.fers_regular,
+            result.fers_disability,
+            result.selected_fers_income,
+            result.srs_annual,
+            profile.va_monthly * 12,
+            profile.vsip_amount,
+            result.total_preretirement_income,
+            result.total_expenses,
+            result.net_cash,
+            result.tsp.balance,
+            result.tsp.annual_income,
+            profile.contractor_role or "N/A",
+            result.contractor.annual_gross,
+            result.contractor.annual_overhead,
+            result.contractor.net_income,
+            result.contractor.srs_offset,
+            result.contractor.adjusted_srs,
+            result.contractor.adjusted_net_cash,
         ],
     }
-    export_df = pd.DataFrame(data)
-    csv = export_df.to_csv(index=False).encode("utf-8")
+    return pd.DataFrame(data).to_csv(index=False).encode("utf-8")
+
+
+timer.start("csv_export")
+with st.expander("📤 Export Detailed Calculation Data"):
     st.download_button(
         "Download Detailed Data as CSV",
-        data=csv,
+        data=partial(detailed_csv, profile),
         file_name="detailed_calculation_data.csv",
         mime="text/csv",
     )
 
 
 # --- Sensitivity Analysis: Net Cash Flow vs. Years of Federal Service (Enhanced) ---
-with st.expander("🔍 Sensitivity Analysis: Net Cash Flow vs. Years of Federal Service (Enhanced)"):
-    st.markdown("This analysis uses a simplified pension calculation. Adjust the parameters below to see how changes in assumptions impact your net cash flow over different years of federal service.")
-
-    pension_multiplier = st.slider(
-        "Pension Multiplier",
-        min_value=0.005,
-        max_value=0.02,
-        value=0.01,
-        step=0.001,
-        help="Adjust the percentage multiplier used in the pension calculation (default is 1%)."
-    )
-
-    expense_factor = st.slider(
-        "Expense Adjustment Factor",
-        min_value=0.8,
-        max_value=1.2,
-        value=1.0,
-        step=0.05,
-        help="Adjust overall expense estimates by this factor to simulate variations in living costs."
-    )
-
-    years_range = list(range(0, 51))
-    net_cash_sensitivity = []
-    for y in years_range:
-        # Recalculate pension using the adjustable multiplier.
-        # 0.9 factor remains constant.
-        pension_value = high3_salary * pension_multiplier * y * 0.9
-        total_income = vsip_amount + pension_value
-        base_expenses = (fegli_premium + fehb_premium + monthly_expenses) * 12
-        total_exp = base_expenses * expense_factor
-        net_cash_sensitivity.append(total_income - total_exp)
-
-    fig, ax = plt.subplots()
-    ax.plot(years_range, net_cash_sensitivity, marker="o")
-    ax.set_title("Net Cash Flow vs. Years of Federal Service (Enhanced)")
-    ax.set_xlabel("Years of Federal Service")
-    ax.set_ylabel("Net Cash Flow ($)")
-    st.pyplot(fig)
+@fragment("sensitivity")
+def sensitivity_analysis(profile):
+    with st.expander("🔍 Sensitivity Analysis: Net Cash Flow vs. Years of Federal Service (Enhanced)"):
+        st.markdown("This analysis uses a simplified pension calculation. Adjust the parameters below to see how changes in assumptions impact your net cash flow over different years of federal service.")
+
+        pension_multiplier = st.slider(
+            "Pension Multiplier",
+            min_value=0.005,
+            max_value=0.02,
+            value=0.01,
+            step=0.001,
+            help="Adjust the percentage multiplier used in the pension calculation (default is 1%).",
+            key="pension_multiplier"
+        )
+
+        expense_factor = st.slider(
+            "Expense Adjustment Factor",
+            min_value=0.8,
+            max_value=1.2,
+            value=1.0,
+            step=0.05,
+            help="Adjust overall expense estimates by this factor to simulate variations in living costs.",
+            key="expense_factor"
+        )
+
+        years_range = list(range(0, 51))
+        net_cash_sensitivity = result_cache.get(
+            plan_years.version, sensitivity_net_cash, profile, pension_multiplier, expense_factor, years_range)
+
+        show_chart(chart_spec(
+            "Net Cash Flow vs. Years of Federal Service (Enhanced)",
+            xlabel="Years of Federal Service",
+            ylabel="Net Cash Flow ($)",
+            lines=[{"x": years_range, "y": net_cash_sensitivity, "marker": "o"}],
+        ))
+
+        # --- Decision Surface: every service year x multiplier x expense factor ---
+        st.markdown("#### Decision Surface")
+        st.markdown("Net cash flow for every combination of service years, pension multiplier and expense factor, computed in one pass. The black contour marks break-even.")
+        vary_high3 = st.checkbox(
+            "Also vary High-3 salary (±20%)",
+            value=False,
+            help="Add High-3 salary as a fourth dimension of the grid, from 80% to 120% of your High-3.",
+            key="vary_high3"
+        )
+        grid = result_cache.get(
+            plan_years.version, sensitivity_grid, profile,
+            high3_salaries=np.round(profile.high3_salary * np.linspace(0.8, 1.2, 5), -2) if vary_high3 else None)
+
+        if st.session_state.get("heatmap_factor") not in grid.expense_factors.tolist():
+            st.session_state.pop("heatmap_factor", None)  # e.g. restored from a link with other grid options
+        heatmap_factor = st.select_slider(
+            "Expense Factor Shown in Heatmap",
+            options=grid.expense_factors.tolist(),
+            value=grid.expense_factors[np.abs(grid.expense_factors - expense_factor).argmin()].item(),
+            help="The heatmap shows one expense factor at a time; the table below covers all of them.",
+            key="heatmap_factor"
+        )
+        high3_index = 0
+        if vary_high3:
+            if st.session_state.get("heatmap_high3") not in grid.high3_salaries.tolist():
+                st.session_state.pop("heatmap_high3", None)  # the options follow the High-3 entered above
+            heatmap_high3 = st.select_slider(
+                "High-3 Salary Shown in Heatmap ($)",
+                options=grid.high3_salaries.tolist(),
+                value=grid.high3_salaries[len(grid.high3_salaries) // 2].item(),
+                format_func="{:,.0f}".format,
+                key="heatmap_high3"
+            )
+            high3_index = grid.high3_salaries.tolist().index(heatmap_high3)
+
+        show_chart(chart_spec(
+            f"Net Cash Flow: Service Years x Pension Multiplier (Expense Factor {heatmap_factor:.2f})",
+            xlabel="Years of Federal Service",
+            ylabel="Pension Multiplier",
+            heatmap={
+                "x": grid.years_service,
+                "y": grid.pension_multipliers,
+                "z": grid.surface(high3_index, grid.expense_factors.tolist().index(heatmap_factor)),
+                "label": "Net Cash Flow ($)",
+            },
+        ))
+
+        min_grid_net_cash = st.number_input(
+            "Show combinations with a net cash flow of at least ($)",
+            value=0,
+            step=1000,
+            help="Filter the full grid, e.g. 0 to list every break-even combination.",
+            key="min_grid_net_cash"
+        )
+        df_grid = pd.DataFrame(grid.to_columns())
+        df_grid_matches = df_grid[df_grid["Net Cash Flow"] >= min_grid_net_cash].sort_values(
+            ["Years of Service", "Net Cash Flow"], ascending=[True, False])
+        st.markdown(f"**{len(df_grid_matches):,} of {len(df_grid):,} combinations** meet the threshold.")
+        st.dataframe(
+            df_grid_matches,
+            hide_index=True,
+            use_container_width=True,
+            column_config={
+                "High-3 Salary": st.column_config.NumberColumn(format="$%.0f"),
+                "Pension Multiplier": st.column_config.NumberColumn(format="%.4f"),
+                "Expense Factor": st.column_config.NumberColumn(format="%.2f"),
+                "Years of Service": st.column_config.NumberColumn(format="%d"),
+                "Net Cash Flow": st.column_config.NumberColumn(format="$%.0f"),
+            },
+        )
+
+
+timer.start("sensitivity")
+sensitivity_analysis(profile)
 
 
 # --- Cash Flow Projection Over Time (Enhanced) ---
-with st.expander("🔍 Cash Flow Projection Over Time"):
-    st.markdown("This projection uses a fixed annual growth rate to simulate how your net cash flow could evolve over time. Adjust the growth rate as needed.")
-
-    projection_years = list(range(0, 21))
-    growth_rate = st.slider(
-        "Annual Growth Rate (%)",
-        min_value=0.0,
-        max_value=10.0,
-        value=2.0,
-        step=0.1,
-        help="Select the annual growth rate (e.g., due to investments, inflation adjustments, or other factors) to apply to your net cash flow."
-    ) / 100.0  # Convert percentage to decimal
-
-    projected_cash_flows = [net_cash *
-                            ((1 + growth_rate) ** i) for i in projection_years]
-
-    fig2, ax2 = plt.subplots()
-    ax2.plot(projection_years, projected_cash_flows, marker="o", color="blue")
-    ax2.set_title("Projected Net Cash Flow Over 20 Years")
-    ax2.set_xlabel("Years After Retirement")
-    ax2.set_ylabel("Projected Net Cash Flow ($)")
-    st.pyplot(fig2)
+# Assumptions are kept in a session dict, like the contractor inputs, for exports built on click.
+projection_inputs = st.session_state.setdefault("projection_inputs", {})
+
+
+@fragment("projection")
+def cash_flow_projection(profile, currency_symbol):
+    with st.expander("🔍 Cash Flow Projection Over Time"):
+        st.markdown("This projection runs month by month from separation to age 95: DRP leave is paid first, the VSIP lands in year one, the SRS stops at 62, COLAs and FEHB premium growth are applied each year, and the TSP is drawn down until it runs out. Adjust the assumptions as needed.")
+
+        col_cpi, col_fehb, col_return = st.columns(3)
+        inflation_rate = col_cpi.slider(
+            "Inflation / CPI (%)",
+            min_value=0.0,
+            max_value=8.0,
+            value=2.5,
+            step=0.1,
+            help="Annual CPI increase, used for COLAs (FERS diet COLA, full COLA for VA and military pay) and living costs.",
+            key="inflation_rate"
+        ) / 100.0
+        fehb_growth_rate = col_fehb.slider(
+            "FEHB Premium Growth (%)",
+            min_value=0.0,
+            max_value=12.0,
+            value=6.0,
+            step=0.5,
+            help="Annual increase of the FEHB premium.",
+            key="fehb_growth_rate"
+        ) / 100.0
+        tsp_return_rate = col_return.slider(
+            "TSP Return During Drawdown (%)",
+            min_value=0.0,
+            max_value=10.0,
+            value=5.0,
+            step=0.1,
+            help="Annual return earned on the remaining TSP balance.",
+            key="tsp_return_rate"
+        ) / 100.0
+        projection_inputs.update(inflation=inflation_rate, fehb_growth=fehb_growth_rate, tsp_return=tsp_return_rate)
+
+        cash_flow = result_cache.get(
+            plan_years.version, cash_flow_ledger, profile, inflation=inflation_rate, fehb_growth=fehb_growth_rate, tsp_return=tsp_return_rate)
+        df_cash_flow = pd.DataFrame(cash_flow.annual())
+        first_ten = df_cash_flow.head(10)
+
+        show_chart(chart_spec(
+            "10-Year Surplus / Deficit",
+            xlabel="Age",
+            ylabel=f"Annual Net Cash Flow ({currency_symbol})",
+            bars={"x": first_ten["Age"], "height": first_ten["Net Cash"],
+                  "color": ["green" if v >= 0 else "red" for v in first_ten["Net Cash"]]},
+            lines=[{"x": first_ten["Age"], "y": first_ten["Net Cash"].cumsum(), "color": "blue",
+                    "marker": "o", "label": "Cumulative"}],
+            legend=True,
+        ))
+
+        show_chart(chart_spec(
+            "Income, Expenses and TSP Balance to Age 95",
+            xlabel="Age",
+            ylabel=f"Amount ({currency_symbol})",
+            lines=[
+                {"x": df_cash_flow["Age"], "y": df_cash_flow["Total Income"], "color": "green", "label": "Total Income"},
+                {"x": df_cash_flow["Age"], "y": df_cash_flow["Total Expenses"], "color": "red", "label": "Total Expenses"},
+                {"x": df_cash_flow["Age"], "y": df_cash_flow["TSP Balance"], "color": "blue", "linestyle": "--",
+                 "label": "TSP Balance (year end)"},
+            ],
+            vlines=[{"x": 62, "color": "gray", "linestyle": ":", "label": "Age 62 – SRS ends"}],
+            legend=True,
+        ))
+
+        st.dataframe(
+            df_cash_flow.style.format({c: "{:,.0f}" for c in df_cash_flow.columns if c not in ("Year", "Age")}),
+            hide_index=True,
+            use_container_width=True)
+
+
+timer.start("projection")
+cash_flow_projection(profile, currency_symbol)
+# Read back for the optimizer and workspace; a change made while the projection reruns
+# alone reaches them on the next full rerun.
+inflation_rate = projection_inputs["inflation"]
+fehb_growth_rate = projection_inputs["fehb_growth"]
+tsp_return_rate = projection_inputs["tsp_return"]
 
 ##########################
 # FERS vs CSRS Input
 ##########################
+timer.start("age_comparison")
 st.markdown("### Retirement System Type")
 system_type = st.radio(
     "Select Your Retirement System:",
     ("FERS", "CSRS"),
-    help="Choose 'FERS' if you are covered under the Federal Employees Retirement System, which generally provides a defined benefit plus a TSP, or 'CSRS' if you are under the older Civil Service Retirement System. [Learn more about FERS vs. CSRS](https://www.opm.gov/retirement-services/retirement-planning/fers-vs-csrs/)"
+    help="Choose 'FERS' if you are covered under the Federal Employees Retirement System, which generally provides a defined benefit plus a TSP, or 'CSRS' if you are under the older Civil Service Retirement System. [Learn more about FERS vs. CSRS](https://www.opm.gov/retirement-services/retirement-planning/fers-vs-csrs/)",
+    key="system_type"
 )
 
 # --- Compare Retirement Income Over Different Ages (VERA/DRP) ---
 
-# Define the function for calculating retirement income
+profile = replace(profile, system_type=system_type)
 
-def calc_retirement_income(age: int, base_service: float, with_vera=False, with_drp=False, separation_age=50) -> float:
-    """
-    Calculate annual retirement income for a given age, base service,
-    and scenario (VERA, DRP).
-
-    :param age: The retirement age to calculate for.
-    :param base_service: The user's years of federal service.
-    :param with_vera: Whether VERA is applied.
-    :param with_drp: Whether DRP is applied.
-    :param separation_age: The age at which DRP lump sum is applied.
-    :return: The annual retirement income for the given scenario.
-    """
-    # Determine hypothetical service based on scenario
-    if with_vera:
-        hypothetical_service = base_service  # VERA = fixed service at separation
-    else:
-        hypothetical_service = base_service + max(0, age - current_age)
 
-    # Basic pension
-    if system_type == "CSRS":
-        pension = high3_salary * 0.0185 * hypothetical_service
-    else:
-        pension = high3_salary * 0.01 * hypothetical_service * 0.9
+@st.cache_data(max_entries=32, show_spinner="Simulating TSP return paths...")
+def run_monte_carlo(profile, min_age, max_age, depletion_age, n_paths, seed, volatility, parameters_version):
+    # parameters_version only keys the cache: edited plan-year values invalidate it.
+    return monte_carlo_age_comparison(
+        profile, min_age, max_age, depletion_age, n_paths, seed, volatility=volatility)
 
-    # SRS (FERS only if <62 & service >= 20)
-    srs_amt = 0
-    if system_type == "FERS" and age < 62 and hypothetical_service >= 20:
-        srs_amt = srs_annual
 
-    # --- TSP Approximate ---
-    withdrawal_rate = 0.04
-    annual_growth_rate = 0.05
+@fragment("age_comparison")
+def age_comparison(profile, drp_elected):
+    # Now, generate the retirement income comparison data
+    min_compare_age = st.number_input(
+        "Minimum age to compare",
+        min_value=40,
+        max_value=80,
+        value=50, key="min_compare_age")
+    max_compare_age = st.number_input(
+        "Maximum age to compare",
+        min_value=40,
+        max_value=80,
+        value=62, key="max_compare_age")
 
-    if with_vera:
-        years_until_retirement = 0
+    if min_compare_age > max_compare_age:
+        st.error("Error: Minimum age can't exceed maximum age.")
     else:
-        years_until_retirement = max(0, age - current_age)
-
-    projected_tsp_balance = tsp_balance * ((1 + annual_growth_rate) ** years_until_retirement)
-    estimated_tsp_withdrawal = projected_tsp_balance * withdrawal_rate
-
-    penalty_applies, _ = calculate_tsp_penalty_status(
-        age,
-        years_service,
-        vera_elected=with_vera,
-        public_safety_employee=False
+        simulate_drp = drp_elected
+        results = result_cache.get(
+            plan_years.version, compare_retirement_ages, profile, min_compare_age, max_compare_age, simulate_drp)
+
+        df_compare = pd.DataFrame(results)
+        st.dataframe(df_compare.style.format("{:,.0f}"), use_container_width=True)
+
+        # Create the chart with the vertical line at age 62
+        compare_lines = [
+            {"x": df_compare["Age"], "y": df_compare["Normal"], "label": "Normal", "marker": "o"},
+            {"x": df_compare["Age"], "y": df_compare["VERA"], "label": "VERA", "marker": "s",
+             "linestyle": "--"},
+        ]
+        if simulate_drp:
+            compare_lines.append(
+                {"x": df_compare["Age"], "y": df_compare["DRP"], "label": "DRP", "marker": "^",
+                 "linestyle": ":"})
+
+        show_chart(chart_spec(
+            f"Retirement Income vs Age: {profile.system_type} Normal / VERA / DRP",
+            xlabel="Retirement Age",
+            ylabel="Approx. Annual Income ($)",
+            lines=compare_lines,
+            # Add vertical line at age 62
+            vlines=[{"x": 62, "color": "gray", "linestyle": "--",
+                     "label": "Age 62 – Social Security starts / SRS ends"}],
+            legend=True,
+        ))
+
+        # --- Monte Carlo TSP Projection (replaces the fixed 5% growth) ---
+        use_monte_carlo = st.checkbox(
+            "Use Monte Carlo TSP projection instead of fixed 5% growth",
+            value=False,
+            help="Simulate thousands of random market return paths and show P10/P50/P90 income bands and the probability your TSP runs out.",
+            key="use_monte_carlo"
+        )
+        if use_monte_carlo:
+            mc_paths = st.select_slider(
+                "Simulated Return Paths",
+                options=[10_000, 25_000, 50_000, 100_000],
+                value=10_000,
+                help="More paths give smoother percentiles but take longer to compute.",
+                key="mc_paths"
+            )
+            mc_volatility = st.slider(
+                "Annual Return Volatility (%)",
+                min_value=0.0,
+                max_value=30.0,
+                value=12.0,
+                step=0.5,
+                help="Standard deviation of annual TSP returns around the 5% average.",
+                key="mc_volatility"
+            ) / 100.0
+            mc_depletion_age = st.number_input(
+                "Probability the TSP Runs Out By Age",
+                min_value=60,
+                max_value=100,
+                value=90,
+                help="Age used for the TSP depletion probability.",
+                key="mc_depletion_age"
+            )
+            mc_seed = st.number_input(
+                "Random Seed",
+                min_value=0,
+                value=0,
+                help="The same seed always reproduces the same simulation.",
+                key="mc_seed"
+            )
+
+            df_mc = pd.DataFrame(run_monte_carlo(
+                profile, min_compare_age, max_compare_age,
+                mc_depletion_age, mc_paths, mc_seed, mc_volatility, plan_years.version))
+            depletion_columns = [c for c in df_mc.columns if c.endswith("P(depleted)")]
+            st.dataframe(df_mc.style.format(
+                {**{c: "{:,.0f}" for c in df_mc.columns if c not in depletion_columns},
+                 **{c: "{:.1%}" for c in depletion_columns}}),
+                use_container_width=True)
+
+            mc_bands, mc_lines = [], []
+            for scenario, color in (("Normal", "tab:blue"), ("VERA", "tab:orange")):
+                mc_bands.append({"x": df_mc["Age"], "low": df_mc[f"{scenario} P10"],
+                                 "high": df_mc[f"{scenario} P90"], "color": color,
+                                 "label": f"{scenario} P10–P90"})
+                mc_lines.append({"x": df_mc["Age"], "y": df_mc[f"{scenario} P50"], "color": color,
+                                 "label": f"{scenario} P50"})
+            show_chart(chart_spec(
+                f"Monte Carlo Retirement Income ({mc_paths:,} paths)",
+                xlabel="Retirement Age",
+                ylabel="Approx. Annual Income ($)",
+                lines=mc_lines,
+                bands=mc_bands,
+                vlines=[{"x": 62, "color": "gray", "linestyle": "--"}],
+                legend=True,
+            ))
+
+
+age_comparison(profile, drp_elected)
+
+
+# --- Export Full Projections (built on click, encoded chunk by chunk) ---
+def projection_export(table, export_format, profile):
+    usage.hit(f"download:{table}.{export_format}")
+    return export_file(table_chunks(table, profile, **projection_inputs), export_format)
+
+
+timer.start("projection_export")
+with st.expander("📦 Export Full Projections"):
+    st.markdown("Download the complete age comparison, sensitivity grid or monthly cash flow schedule behind the charts above, "
+                "as CSV, Parquet or Arrow with typed columns. The file is generated only when you click download.")
+    col_table, col_format = st.columns([2, 1])
+    export_table = col_table.selectbox("Table", list(EXPORT_TABLES), format_func=EXPORT_TABLES.get, key="export_table")
+    export_format = col_format.radio("Format", list(EXPORT_FORMATS), format_func=str.upper, horizontal=True,
+                                     key="export_format")
+    export_mime, export_extension = EXPORT_FORMATS[export_format]
+    st.download_button(
+        f"Download {EXPORT_TABLES[export_table]}",
+        data=partial(projection_export, export_table, export_format, profile),
+        file_name=f"{export_table}{export_extension}",
+        mime=export_mime,
     )
 
-    if penalty_applies:
-        estimated_tsp_withdrawal *= 0.90  # Apply 10% early withdrawal penalty
-
-    hypothetical_tsp = estimated_tsp_withdrawal
-
-    # DRP lump sum
-    lumpsum_drp = 0
-    if with_drp and age >= separation_age:
-        lumpsum_drp = total_admin_leave_income
-
-    # VA disability income
-    va_annual = va_monthly * 12
-
-    # Total annual income
-    total_annual = pension + srs_amt + hypothetical_tsp + lumpsum_drp + va_annual
-    return total_annual
-
-# Now, generate the retirement income comparison data
-min_compare_age = st.number_input(
-    "Minimum age to compare",
-    min_value=40,
-    max_value=80,
-    value=50)
-max_compare_age = st.number_input(
-    "Maximum age to compare",
-    min_value=40,
-    max_value=80,
-    value=62)
+# --- Plan Optimizer: separation age x VERA/DRP x TSP option x withdrawal rate ---
+timer.start("optimizer")
+with st.expander("🧭 Plan Optimizer"):
+    st.markdown("Searches every separation age, separation type (Normal / VERA / DRP), TSP option and withdrawal rate, and lists the best plans that are not beaten on all three of lifetime after-tax income, worst-year surplus and the TSP balance left at 95. Pay continues until the separation age; a DRP plan stops work at that age and stays on paid leave for the DRP leave months before separating. Withdrawing the TSP now before 59½ takes it as a lump sum, as in the calculator above; expenses grow as in the cash flow projection.")
+    optimizer_age_bounds = (int(current_age), max(int(current_age) + 1, 70))
+    stored_ages = st.session_state.get("optimizer_ages")
+    if stored_ages is not None and not (
+            optimizer_age_bounds[0] <= stored_ages[0] <= stored_ages[1] <= optimizer_age_bounds[1]):
+        del st.session_state["optimizer_ages"]  # e.g. restored from a link made at a lower age
+    optimizer_ages = st.slider(
+        "Separation Ages to Search",
+        min_value=optimizer_age_bounds[0],
+        max_value=optimizer_age_bounds[1],
+        value=(int(current_age), max(int(current_age), 62)),
+        help="Range of ages at which you could separate from federal service.",
+        key="optimizer_ages"
+    )
+    optimizer_objective = st.selectbox(
+        "Optimize For",
+        list(OBJECTIVES),
+        format_func=OBJECTIVES.get,
+        help="Lifetime after-tax income from separation to 95, the worst retired year's surplus, or the TSP balance left at 95. Wages before separation are not counted, so every separation age is scored the same way.",
+        key="optimizer_objective"
+    )
+    col_deficit, col_last, col_drp = st.columns(3)
+    optimizer_no_deficit = col_deficit.checkbox("Never run a yearly deficit", value=False, key="optimizer_no_deficit")
+    optimizer_tsp_must_last = col_last.checkbox("TSP must last to 95", value=False, key="optimizer_tsp_must_last")
+    optimizer_include_drp = col_drp.checkbox("Include DRP plans", value=True, key="optimizer_include_drp")
+    optimizer_top_n = st.slider("Plans to Show", min_value=3, max_value=25, value=10, key="optimizer_top_n")
+
+    st.caption(f"Expenses grow with {inflation_rate:.1%} inflation and {fehb_growth_rate:.1%} FEHB premium growth; "
+               f"the TSP earns {tsp_return_rate:.1%} (set in the cash flow projection).")
+    search = result_cache.get(
+        plan_years.version, optimize_plans, profile,
+        min_age=optimizer_ages[0],
+        max_age=optimizer_ages[1],
+        objective=optimizer_objective,
+        no_deficit=optimizer_no_deficit,
+        tsp_must_last=optimizer_tsp_must_last,
+        include_drp=optimizer_include_drp,
+        top_n=optimizer_top_n,
+        inflation=inflation_rate,
+        fehb_growth=fehb_growth_rate,
+        tsp_return=tsp_return_rate,
+    )
+    st.caption(
+        f"{search.candidates:,} plans considered, {search.evaluated:,} evaluated after pruning equivalent "
+        f"or ineligible branches, {search.feasible:,} meet the constraints, {search.efficient:,} are not dominated.")
+    if not len(search.plans["Separation Age"]):
+        st.warning("No plan meets these constraints. Try relaxing them or widening the age range.")
+    else:
+        df_plans = pd.DataFrame(search.plans)
+        never = ["TSP Runs Out At", "First Deficit At"]
+        st.dataframe(df_plans.style.format({
+            "Withdrawal Rate": "{:.1%}",
+            "Pension Starts At": lambda v: "None" if v == float("inf") else f"{v:g}",
+            "Annual TSP Income (After Tax)": "${:,.0f}",
+            "TSP Lump Sum (After Tax)": "${:,.0f}",
+            OBJECTIVES["lifetime_income"]: "${:,.0f}",
+            OBJECTIVES["min_surplus"]: "${:,.0f}",
+            OBJECTIVES["end_balance"]: "${:,.0f}",
+        }, na_rep="—").format("{:.0f}", subset=never, na_rep="Never"), hide_index=True, use_container_width=True)
+
+# --- Scenario Workspace ---
+timer.start("workspace")
+
+
+def load_scenario(token):
+    # Runs as a button callback, before the widgets of the next rerun exist.
+    try:
+        restore_inputs(token)
+    except ShareTokenError as exc:
+        st.warning(f"⚠️ {exc}.")
+
+
+workspace = st.session_state.scenario_workspace
+with st.expander("🗂 Scenario Workspace"):
+    st.markdown(
+        "Save the current inputs as a named scenario, load one back to edit it, and compare scenarios side by side. "
+        "Saving over an existing name recomputes only that scenario.")
+    col_name, col_save = st.columns([3, 1])
+    scenario_name = col_name.text_input(
+        "Scenario Name",
+        value=f"Scenario {len(workspace) + 1}",
+        help="Save under an existing name to update that scenario.",
+        key="scenario_name"
+    ).strip()
+    if col_save.button("💾 Save Scenario", disabled=workspace.full and scenario_name not in workspace):
+        try:
+            recomputed = workspace.save(
+                scenario_name, encode_inputs(st.session_state), profile, plan_years.version,
+                inflation_rate, fehb_growth_rate, tsp_return_rate)
+        except ValueError as exc:
+            st.error(str(exc))
+        else:
+            st.success(f"Saved **{scenario_name}**" + ("." if recomputed else " (inputs unchanged, nothing recomputed)."))
+    if workspace.full:
+        st.caption(f"The workspace is full ({workspace.max_scenarios} scenarios); delete one to add another.")
+
+    if len(workspace):
+        df_scenarios = pd.DataFrame(workspace.table()).set_index("Output")
+        st.dataframe(df_scenarios.style.format(
+            lambda v: "None" if pd.isna(v) else f"{currency_symbol}{v:,.0f}").format(
+            lambda v: "None" if pd.isna(v) else f"{v:.0f}", subset=pd.IndexSlice[["First Deficit Age"], :]),
+            use_container_width=True)
+
+        col_pick, col_load, col_delete = st.columns([3, 1, 1])
+        picked = col_pick.selectbox("Scenario", workspace.names(), key="workspace_pick")
+        col_load.button("📂 Load", on_click=load_scenario, args=(workspace.get(picked).token,),
+                        help="Restore this scenario's inputs into the form.")
+        if col_delete.button("🗑 Delete"):
+            workspace.remove(picked)
+            st.rerun()
+
+        if len(workspace) > 1:
+            st.markdown("#### What Changed")
+            col_base, col_other = st.columns(2)
+            diff_base = col_base.selectbox("Compare", workspace.names(), key="diff_base")
+            diff_other = col_other.selectbox(
+                "Against", [n for n in workspace.names() if n != diff_base], key="diff_other")
+            df_diff = pd.DataFrame(workspace.diff(diff_base, diff_other))
+            if df_diff.empty:
+                st.info("These scenarios produce the same outputs.")
+            else:
+                st.dataframe(df_diff.style.format(
+                    {diff_base: "{:,.0f}", diff_other: "{:,.0f}", "Change": "{:+,.0f}", "Change (%)": "{:+.1f}%"},
+                    na_rep="None"), hide_index=True, use_container_width=True)
+        st.caption(f"{len(workspace)} saved scenarios using {workspace.memory_bytes() / 1024:,.1f} KB; "
+                   f"{workspace.recomputed} recomputes this session.")
 
-if min_compare_age > max_compare_age:
-    st.error("Error: Minimum age can't exceed maximum age.")
-else:
-    simulate_drp = drp_elected  # from earlier DRP checkbox
-    results = []
-    for age in range(int(min_compare_age), int(max_compare_age) + 1):
-        normal_inc = calc_retirement_income(
-            age, years_service, with_vera=False, with_drp=False)
-        vera_inc = calc_retirement_income(
-            age, years_service, with_vera=True, with_drp=False)
-        drp_inc = calc_retirement_income(
-            age,
-            years_service,
-            with_vera=False,
-            with_drp=True,
-            separation_age=52) if simulate_drp else 0
-
-        results.append({
-            "Age": age,
-            "Normal": normal_inc,
-            "VERA": vera_inc,
-            "DRP": drp_inc
-        })
+# --- PDF Retirement Report Generator ---
+def pdf_report(profile):
+    usage.hit("download:pdf")
+    return build_pdf_report(contractor_profile(profile))
 
-    df_compare = pd.DataFrame(results)
-    st.dataframe(df_compare.style.format("{:,.0f}"), use_container_width=True)
-
-    # Create the chart with the vertical line at age 62
-    fig, ax = plt.subplots()
-    ax.plot(
-        df_compare["Age"],
-        df_compare["Normal"],
-        label="Normal",
-        marker="o")
-    ax.plot(
-        df_compare["Age"],
-        df_compare["VERA"],
-        label="VERA",
-        marker="s",
-        linestyle="--")
-    if simulate_drp:
-        ax.plot(
-            df_compare["Age"],
-            df_compare["DRP"],
-            label="DRP",
-            marker="^",
-            linestyle=":")
-
-    # Add vertical line at age 62
-    ax.axvline(
-        62,
-        color='gray',
-        linestyle='--',
-        label="Age 62 – Social Security starts / SRS ends")
-
-    ax.set_xlabel("Retirement Age")
-    ax.set_ylabel("Approx. Annual Income ($)")
-    ax.set_title(
-        f"Retirement Income vs Age: {system_type} Normal / VERA / DRP")
-    ax.legend()
-    st.pyplot(fig)
 
-# --- PDF Retirement Report Generator ---
+timer.start("pdf")
 st.markdown("### 🖨️ Download Your Personalized Retirement Report")
-buffer = io.BytesIO()
-p = canvas.Canvas(buffer, pagesize=letter)
-width, height = letter
-p.setFont("Helvetica-Bold", 16)
-p.drawString(50, 750, "Retirement Summary Report")
-p.line(50, 747, 550, 747)
-p.setFont("Helvetica", 12)
-y = 720
-user_info = [
-    f"Current Age: {current_age}",
-    f"Years of Federal Service: {years_service}",
-    f"High-3 Salary: ${high3_salary:,.2f}",
-    f"TSP Balance: ${tsp_balance:,.2f}",
-    f"TSP Contribution Rate: {tsp_contribution_pct}%",
-    f"FEHB Plan: {health_coverage_choice} (${fehb_premium}/mo)",
-    f"FEGLI Option: {fegli_option} (${fegli_premium}/mo)",
-    f"Living Expenses: ${monthly_expenses:,.2f}/mo",
-    f"VA Disability: ${va_monthly}/mo",
-    f"Pension Type: {pension_label}",
-]
-for item in user_info:
-    p.drawString(50, y, item)
-    y -= 20
-y -= 10
-p.setFont("Helvetica-Bold", 12)
-p.drawString(50, y, "TSP Withdrawal Details:")
-p.setFont("Helvetica", 12)
-y -= 20
-tsp_details = [
-    f"TSP Withdrawal Option: {tsp_option}",
-    f"Penalty Note: {penalty_note}",
-    f"Accessible TSP Balance: ${tsp_withdrawal_balance:,.2f}",
-    f"Estimated Annual TSP Income: ${tsp_annual_income:,.2f}",
-]
-for detail in tsp_details:
-    p.drawString(50, y, detail)
-    y -= 20
-y -= 10
-p.setFont("Helvetica-Bold", 12)
-p.drawString(50, y, "Income Summary:")
-p.setFont("Helvetica", 12)
-y -= 20
-if vsip_amount > 0:
-    p.drawString(50, y, f"- VSIP Lump Sum: ${vsip_amount:,.2f}")
-    y -= 20
-p.drawString(50, y, f"- FERS Pension: ${selected_fers_income:,.2f}")
-y -= 20
-if not disability_retirement and srs_annual > 0:
-    p.drawString(
-        50, y, f"- SRS (Special Retirement Supplement): ${srs_annual:,.2f}")
-    y -= 20
-if va_monthly > 0:
-    p.drawString(50, y, f"- Annual VA Disability: ${va_monthly * 12:,.2f}")
-    y -= 30
-p.setFont("Helvetica-Bold", 12)
-p.drawString(
-    50, y, f"📊 Total Pre-Retirement Income: ${total_preretirement_income:,.2f}")
-y -= 20
-p.drawString(
-    50,
-    y,
-    f"🧾 Annual Expenses: ${
-        (
-            fegli_premium +
-            fehb_premium +
-            monthly_expenses) *
-        12:,.2f}")
-y -= 20
-p.drawString(50, y, f"💰 Net Cash Flow: ${net_cash:,.2f}")
-y -= 30
-p.setFont("Helvetica-Bold", 12)
-p.drawString(50, y, "Contractor Income Analysis")
-y -= 20
-p.setFont("Helvetica", 12)
-contractor_role = st.session_state.get("contractor_role", None)
-if contractor_role:
-    contractor_net_income = st.session_state.get("contractor_net_income", 0)
-    contractor_gross_income = st.session_state.get(
-        "contractor_gross_income", 0)
-    contractor_overhead = st.session_state.get("contractor_overhead", 0)
-    srs_offset = st.session_state.get("srs_offset", 0)
-    adjusted_srs = st.session_state.get("adjusted_srs", srs_annual)
-    adjusted_net_cash = st.session_state.get("adjusted_net_cash", net_cash)
-    p.drawString(50, y, f"Role: {contractor_role}")
-    y -= 20
-    p.drawString(50, y, f"Gross Income: ${contractor_gross_income:,.2f}")
-    y -= 20
-    p.drawString(50, y, f"Overhead: ${contractor_overhead:,.2f}")
-    y -= 20
-    p.drawString(
-        50, y, f"Contractor Net Income: ${
-            contractor_net_income:,.2f}")
-    y -= 20
-    p.drawString(
-        50, y, f"SRS Reduction from Contractor Income: ${
-            srs_offset:,.2f}")
-    y -= 20
-    p.drawString(50, y, f"Adjusted SRS: ${adjusted_srs:,.2f}")
-    y -= 20
-    p.drawString(
-        50, y, f"Adj. Retirement Net Cash Flow: ${
-            adjusted_net_cash:,.2f}")
-    y -= 30
-else:
-    p.drawString(50, y, "No Contractor Data Available")
-    y -= 20
-
-# --- Additional PDF Section: Career vs. Retirement Wage Analysis ---
-p.setFont("Helvetica-Bold", 12)
-p.drawString(50, y, "Career vs. Retirement Wage Analysis")
-y -= 20
-p.setFont("Helvetica", 12)
-p.drawString(
-    50, y, f"Estimated Retirement Wage: ${
-        estimated_retirement_wage:,.2f}")
-y -= 20
-p.drawString(
-    50, y, f"Projected Continued Career Wage: ${
-        projected_career_wage:,.2f}")
-y -= 20
-difference = projected_career_wage - estimated_retirement_wage
-p.drawString(50, y, f"Difference: ${difference:,.2f}")
-y -= 30
-
-# --- Additional PDF Section: Pro/Con Analysis for Retirement Scenarios ---
-p.setFont("Helvetica-Bold", 12)
-p.drawString(50, y, "Pro/Con Analysis for Retirement Scenarios")
-y -= 20
-p.setFont("Helvetica", 12)
-# For brevity, we print a summary note.
-p.drawString(
-    50,
-    y,
-    "Review the app's interactive table for detailed pros and cons based on your priorities.")
-y -= 30
-
-p.save()
-buffer.seek(0)
+# Built only when the button is clicked, with the contractor inputs current at that moment;
+# repeat downloads hit the report cache.
 st.download_button(
     label="📄 Download PDF Retirement Report",
-    data=buffer,
+    data=partial(pdf_report, profile),
     file_name="Retirement_Report.pdf",
     mime="application/pdf"
 )
 
+# --- Share This Scenario (every keyed widget above goes into the link) ---
+timer.start("share")
+share_token = sync_share_link()
+st.markdown("### 🔗 Share This Scenario")
+share_url = f"{(st.context.url or '').split('?')[0]}?{urllib.parse.urlencode({QUERY_PARAM: share_token})}"
+st.code(share_url, language=None)
+st.caption("The address bar always holds this link. Opening it restores every input above, "
+           "and results already computed for the scenario are served from the server cache.")
+
+# --- Chart Rendering Stats ---
+with st.expander("📈 Chart Rendering Stats"):
+    chart_stats = chart_cache.stats()
+    col_hits, col_misses, col_entries, col_figs = st.columns(4)
+    col_hits.metric("Cache Hits", chart_stats["hits"])
+    col_misses.metric("Charts Rendered", chart_stats["misses"])
+    col_entries.metric("Cached Charts", f"{chart_stats['entries']} ({chart_stats['bytes'] / 1024:,.0f} KB)")
+    col_figs.metric("Live Figures", chart_stats["live_figures"])
+    if charts_mode == "vega":
+        st.caption("Charts are drawn in the browser from their data (Vega-Lite); open the app with "
+                   "?charts=png to render them as images on the server instead.")
+    result_stats = result_cache.stats()
+    st.caption(f"Result cache: {result_stats['hits']} hits, {result_stats['misses']} computed, "
+               f"{result_stats['entries']} results kept ({result_stats['bytes'] / 1e6:,.1f} MB).")
+
+# --- Debug: Section Timings (only when instrumentation is on) ---
+timer.stop()
+section_stats.record(timer)
+if timer.enabled:
+    with st.expander("🐞 Debug: Section Timings"):
+        run_totals = timer.totals()
+        st.markdown(f"**This rerun:** {sum(run_totals.values()) * 1000:,.1f} ms across {len(run_totals)} sections")
+        st.dataframe(pd.DataFrame(
+            {"Section": list(run_totals), "Time (ms)": [s * 1000 for s in run_totals.values()]}
+        ).style.format({"Time (ms)": "{:,.2f}"}), use_container_width=True)
+        st.markdown(f"**All sessions since start:** {section_stats.runs} instrumented reruns")
+        st.dataframe(pd.DataFrame(section_stats.summary()).style.format(
+            {"mean_ms": "{:,.2f}", "max_ms": "{:,.2f}", "total_ms": "{:,.1f}"}), use_container_width=True)
+        usage_totals = usage.totals()
+        st.markdown(f"**Usage, all sessions** (saved to `{usage.path}` every {usage.flush_interval:.0f} s, "
+                    f"{usage.pending():,} events not saved yet):")
+        st.dataframe(pd.DataFrame({"Event": list(usage_totals), "Count": list(usage_totals.values())}),
+                     hide_index=True, use_container_width=True)
+        if import_times:
+            st.markdown("**Deferred imports** (first load in this process):")
+            st.dataframe(pd.DataFrame(
+                {"Module": list(import_times), "Import (ms)": list(import_times.values())}
+            ).style.format({"Import (ms)": "{:,.1f}"}), use_container_width=True)
+        col_prom, col_jsonl = st.columns(2)
+        col_prom.download_button(
+            "Export Prometheus Metrics",
+            data=lambda: section_stats.prometheus() + usage.prometheus(),
+            file_name="fers_section_timings.prom",
+            mime="text/plain",
+        )
+        col_jsonl.download_button(
+            "Export JSON Lines",
+            data=section_stats.json_lines,
+            file_name="fers_section_timings.jsonl",
+            mime="application/jsonl",
+        )
+
 # --- TSP Advisor GPT Hyperlink & Footer/Disclaimer ---
 st.markdown("### TSP Advisor GPT Link")
 st.info("""
@@ -1313,3 +1734,5 @@ st.markdown(
 """,
     unsafe_allow_html=True
 )
+
+script_finished = True